@@ -2,51 +2,442 @@
 """
 Data Acquisition Script
 
-This script serves as a placeholder for implementing data acquisition logic for your ML project.
-Customize it to download, process, and organize your specific dataset.
+This script acquires raw data from a source location and organizes it into a
+directory that the training pipeline can consume directly.
 
 Key responsibilities:
-1. Download or access raw data from sources (web APIs, databases, local files)
-2. Process data into the format needed for training (resize, normalize, etc.)
-3. Validate data quality and integrity (check completeness, format compliance)
-4. Create train/validation/test splits
-5. Generate CSV indices or other metadata for dataset tracking
-6. Organize data files into a structure that works with your data loaders
+1. Access raw data from a local directory or a ``file://`` URL
+2. Copy (or transcode) each item into the output directory using a bounded thread pool
+3. Validate data integrity by verifying content hashes after every transfer
+4. Create deterministic train/validation/test splits
+5. Generate a CSV index that ``get_dataset`` can read as ``input_dirs``
+6. Keep a manifest so that reruns only fetch new or changed items
 
 Example usage:
-    python {{cookiecutter.project_slug}}/scripts/acquire.py --source <source_type> --output <output_directory>
+    python {{cookiecutter.project_slug}}/scripts/acquire.py --source <source_dir_or_url> --output <output_directory>
+
+Output layout:
+    <output>/data/...        Acquired files, mirroring the source tree
+    <output>/index.csv       One row per item (image_path relative to the index, sha256, size, split)
+    <output>/manifest.json   Per-item state used for incremental syncs
 
 Customize this script by:
-1. Defining your data sources and access methods
-2. Implementing data preprocessing specific to your task
-3. Creating validation logic appropriate for your data
-4. Adding splitting strategies for your dataset
-5. Generating appropriate metadata for your training pipeline
+1. Adding new URL schemes to ``resolve_source``
+2. Extending ``transcode_file`` with data preprocessing specific to your task
+3. Adding columns (e.g. targets or metadata) to the CSV index in ``write_index``
 """
 
 import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from urllib.request import url2pathname
 
+from tqdm import tqdm
 
-def main():
-    """Main function for data acquisition.
+MANIFEST_NAME = "manifest.json"
+INDEX_NAME = "index.csv"
+DATA_DIR_NAME = "data"
+DEFAULT_EXTENSIONS = ("jpg", "jpeg", "png", "tif", "tiff")
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def resolve_source(source: str) -> Path:
+    """Resolve a source argument to a local directory.
+
+    Args:
+        source: Local path or ``file://`` URL
+
+    Returns:
+        Path to the source directory
+    """
+    parsed = urlparse(source)
+    if parsed.scheme == "file":
+        path = Path(url2pathname(parsed.path))
+    elif parsed.scheme == "" or len(parsed.scheme) == 1:
+        # Single-letter schemes are Windows drive letters
+        path = Path(source)
+    else:
+        raise ValueError(f"Unsupported source scheme: {parsed.scheme}")
+
+    if not path.is_dir():
+        raise ValueError(f"Source directory does not exist: {path}")
+    return path
+
+
+def file_sha256(path: Path) -> str:
+    """Compute the SHA-256 digest of a file in fixed-size chunks.
+
+    Args:
+        path: File to hash
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_source_files(source_dir: Path, extensions: Tuple[str, ...]) -> List[str]:
+    """List files under the source directory with matching extensions.
+
+    Args:
+        source_dir: Source directory
+        extensions: Lower-case extensions (without dot) to include
+
+    Returns:
+        Sorted POSIX-style paths relative to ``source_dir``
+    """
+    suffixes = tuple(f".{ext.lower()}" for ext in extensions)
+    files = []
+    for root, _, names in os.walk(source_dir):
+        for name in names:
+            if name.lower().endswith(suffixes):
+                files.append((Path(root) / name).relative_to(source_dir).as_posix())
+    return sorted(files)
+
+
+def load_manifest(output_dir: Path) -> Dict[str, Dict]:
+    """Load the acquisition manifest, or an empty one on first run."""
+    manifest_path = output_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, "r") as f:
+        return json.load(f).get("items", {})
+
+
+def save_manifest(output_dir: Path, source: str, items: Dict[str, Dict]) -> None:
+    """Atomically write the acquisition manifest.
+
+    Args:
+        output_dir: Output directory
+        source: Source the items were acquired from
+        items: Per-item manifest entries keyed by relative source path
+    """
+    manifest_path = output_dir / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"source": source, "items": items}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def output_relpath(rel_path: str, fmt: Optional[str]) -> str:
+    """Get the output path (relative to the data directory) for a source item."""
+    if fmt is None:
+        return rel_path
+    return Path(rel_path).with_suffix(f".{fmt}").as_posix()
+
+
+def check_output_collisions(rel_paths: List[str], fmt: Optional[str]) -> None:
+    """Fail if several source items would be written to the same output path.
+
+    Transcoding replaces the extension, so ``a.jpg`` and ``a.png`` would both
+    become ``a.<fmt>`` and overwrite each other.
+
+    Args:
+        rel_paths: Paths of the items relative to the source directory
+        fmt: Target format for transcoding, or None to copy as-is
+
+    Raises:
+        ValueError: If two or more items share an output path
+    """
+    sources = {}
+    for rel_path in rel_paths:
+        sources.setdefault(output_relpath(rel_path, fmt), []).append(rel_path)
+    collisions = {out: srcs for out, srcs in sources.items() if len(srcs) > 1}
+    if collisions:
+        examples = "; ".join(
+            f"{', '.join(srcs)} -> {out}" for out, srcs in sorted(collisions.items())[:5]
+        )
+        raise ValueError(
+            f"{len(collisions)} output paths would be written by several source items "
+            f"with --format {fmt}: {examples}"
+        )
+
+
+def is_up_to_date(entry: Optional[Dict], stat: os.stat_result, data_dir: Path) -> bool:
+    """Check whether a manifest entry still matches its source and output.
+
+    Args:
+        entry: Manifest entry from a previous run (or None)
+        stat: Current ``os.stat`` of the source file
+        data_dir: Directory holding the acquired files
+
+    Returns:
+        True if the item can be skipped
+    """
+    if entry is None:
+        return False
+    if entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+        return False
+    return (data_dir / entry["output"]).exists()
+
+
+def transcode_file(src_path: Path, dst_path: Path, fmt: str) -> None:
+    """Re-encode an image into another format.
+
+    Args:
+        src_path: Source image
+        dst_path: Destination image
+        fmt: Target format (e.g. png, jpeg, webp)
+    """
+    from PIL import Image
+
+    pil_format = {"jpg": "JPEG", "tif": "TIFF"}.get(fmt.lower(), fmt.upper())
+    with Image.open(src_path) as image:
+        if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(dst_path, format=pil_format)
+
+
+def acquire_file(
+    source_dir: Path, data_dir: Path, rel_path: str, fmt: Optional[str]
+) -> Dict:
+    """Copy or transcode a single item and verify its content hash.
 
-    Implement your data acquisition logic here.
+    The item is first written to a temporary file and only renamed into place
+    once verified, so an interrupted run never leaves partial files behind.
+
+    Args:
+        source_dir: Source directory
+        data_dir: Destination data directory
+        rel_path: Path of the item relative to ``source_dir``
+        fmt: Target format for transcoding, or None to copy as-is
+
+    Returns:
+        Manifest entry for the item
+    """
+    src_path = source_dir / rel_path
+    stat = src_path.stat()
+    out_rel = output_relpath(rel_path, fmt)
+    dst_path = data_dir / out_rel
+    dst_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dst_path.with_name(f".{dst_path.name}.part")
+
+    src_hash = file_sha256(src_path)
+    if fmt is None:
+        shutil.copyfile(src_path, tmp_path)
+        out_hash = file_sha256(tmp_path)
+        if out_hash != src_hash:
+            tmp_path.unlink()
+            raise IOError(f"Checksum mismatch after copying {rel_path}")
+    else:
+        transcode_file(src_path, tmp_path, fmt)
+        out_hash = file_sha256(tmp_path)
+
+    os.replace(tmp_path, dst_path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": src_hash,
+        "output": out_rel,
+        "output_sha256": out_hash,
+    }
+
+
+def assign_split(sha256: str, val_ratio: float, test_ratio: float) -> str:
+    """Deterministically assign an item to a split based on its content hash.
+
+    Hash-based assignment keeps splits stable across reruns and independent of
+    the order in which files are listed.
+    """
+    bucket = int(sha256[:8], 16) / 0xFFFFFFFF
+    if bucket < test_ratio:
+        return "test"
+    if bucket < test_ratio + val_ratio:
+        return "val"
+    return "train"
+
+
+def write_index(
+    output_dir: Path, items: Dict[str, Dict], val_ratio: float, test_ratio: float
+) -> Path:
+    """Write the CSV index of acquired items.
+
+    Image paths are written relative to the index, so the output directory can
+    be moved as a whole (``read_index`` resolves them against its location).
+
+    Args:
+        output_dir: Output directory
+        items: Manifest entries keyed by relative source path
+        val_ratio: Fraction of items assigned to the validation split
+        test_ratio: Fraction of items assigned to the test split
+
+    Returns:
+        Path to the CSV index
     """
+    index_path = output_dir / INDEX_NAME
+    tmp_path = index_path.with_suffix(".csv.tmp")
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["image_path", "sha256", "size", "split"])
+        for rel_path in sorted(items):
+            entry = items[rel_path]
+            writer.writerow([
+                (Path(DATA_DIR_NAME) / entry["output"]).as_posix(),
+                entry["output_sha256"],
+                entry["size"],
+                assign_split(entry["sha256"], val_ratio, test_ratio),
+            ])
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+def sync(
+    source: str,
+    output: str,
+    num_workers: int = 8,
+    fmt: Optional[str] = None,
+    extensions: Tuple[str, ...] = DEFAULT_EXTENSIONS,
+    val_ratio: float = 0.2,
+    test_ratio: float = 0.1,
+    prune: bool = False,
+) -> Dict[str, int]:
+    """Incrementally sync a source directory into the output directory.
+
+    Args:
+        source: Local path or ``file://`` URL of the source directory
+        output: Output directory
+        num_workers: Maximum number of concurrent transfers
+        fmt: Target format for transcoding, or None to copy files as-is
+        extensions: File extensions to acquire
+        val_ratio: Fraction of items assigned to the validation split
+        test_ratio: Fraction of items assigned to the test split
+        prune: Delete acquired files whose source no longer exists
+
+    Returns:
+        Counts of fetched, skipped, failed and removed items
+    """
+    source_dir = resolve_source(source)
+    output_dir = Path(output)
+    data_dir = output_dir / DATA_DIR_NAME
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    source_files = list_source_files(source_dir, extensions)
+    check_output_collisions(source_files, fmt)
+
+    previous = load_manifest(output_dir)
+    items = {}
+    pending = []
+    for rel_path in source_files:
+        entry = previous.get(rel_path)
+        stat = (source_dir / rel_path).stat()
+        if entry is not None and entry["output"] == output_relpath(rel_path, fmt) \
+                and is_up_to_date(entry, stat, data_dir):
+            items[rel_path] = entry
+        else:
+            pending.append(rel_path)
+
+    # Sources that disappeared since the last run
+    removed = sorted(set(previous) - set(items) - set(pending))
+    if prune:
+        for rel_path in removed:
+            stale = data_dir / previous[rel_path]["output"]
+            if stale.exists():
+                stale.unlink()
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor:
+        futures = {
+            executor.submit(acquire_file, source_dir, data_dir, rel_path, fmt): rel_path
+            for rel_path in pending
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Acquiring"):
+            rel_path = futures[future]
+            try:
+                items[rel_path] = future.result()
+            except Exception as e:
+                print(f"Failed to acquire {rel_path}: {e}")
+                failed.append(rel_path)
+
+    save_manifest(output_dir, source, items)
+    write_index(output_dir, items, val_ratio, test_ratio)
+
+    return {
+        "fetched": len(pending) - len(failed),
+        "skipped": len(items) - (len(pending) - len(failed)),
+        "failed": len(failed),
+        "removed": len(removed),
+    }
+
+
+def main():
+    """Main function for data acquisition."""
     parser = argparse.ArgumentParser(description="Data acquisition script")
-    parser.add_argument("--source", type=str, help="Source type for data acquisition")
     parser.add_argument(
-        "--output", type=str, help="Output directory for processed data"
+        "--source",
+        type=str,
+        required=True,
+        help="Source directory or file:// URL to acquire data from"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        required=True,
+        help="Output directory for acquired data, index and manifest"
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=8,
+        help="Maximum number of concurrent transfers"
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        default=None,
+        help="Transcode images to this format (e.g. png, webp) instead of copying"
+    )
+    parser.add_argument(
+        "--extensions",
+        type=str,
+        default=",".join(DEFAULT_EXTENSIONS),
+        help="Comma-separated list of file extensions to acquire"
+    )
+    parser.add_argument(
+        "--val_ratio",
+        type=float,
+        default=0.2,
+        help="Fraction of items assigned to the validation split"
+    )
+    parser.add_argument(
+        "--test_ratio",
+        type=float,
+        default=0.1,
+        help="Fraction of items assigned to the test split"
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Delete acquired files whose source no longer exists"
     )
-
-    # Add your custom arguments here
 
     args = parser.parse_args()
 
-    print("Data acquisition placeholder")
-    print(
-        f"This script would acquire data from {args.source} and save to {args.output}"
+    stats = sync(
+        source=args.source,
+        output=args.output,
+        num_workers=args.num_workers,
+        fmt=args.format,
+        extensions=tuple(ext.strip().lower() for ext in args.extensions.split(",") if ext.strip()),
+        val_ratio=args.val_ratio,
+        test_ratio=args.test_ratio,
+        prune=args.prune,
     )
-    print("Customize this script with your specific data acquisition logic")
+
+    print("\nAcquisition complete:")
+    for key, value in stats.items():
+        print(f"  {key}: {value}")
+    print(f"Index written to: {os.path.join(args.output, INDEX_NAME)}")
 
 
 if __name__ == "__main__":
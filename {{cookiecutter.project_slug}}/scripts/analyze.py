@@ -0,0 +1,109 @@
+"""
+Error analysis script over stored predictions.
+
+This script:
+1. Loads the per-sample outputs written by ``evaluate.py``
+2. Splits samples into slices by path prefix, label or metadata column
+3. Recomputes metrics per slice with bootstrap confidence intervals
+4. Saves the table as CSV
+
+No model is loaded: everything is computed from the stored statistics.
+
+Usage:
+    python analyze.py --predictions evaluation_results/predictions \
+        --by path_prefix label --metadata data/raw/index.csv
+"""
+
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from {{cookiecutter.project_slug}}.analysis import analyze, load_metadata, slice_keys
+from {{cookiecutter.project_slug}}.evaluation import load_predictions
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Analyze stored predictions")
+
+    parser.add_argument(
+        "--predictions",
+        type=str,
+        required=True,
+        help="Directory with the per-sample shards written by evaluate.py"
+    )
+    parser.add_argument(
+        "--by",
+        type=str,
+        nargs="*",
+        default=[],
+        help="Slice by: path_prefix, label, or metadata columns (overall metrics are always reported)"
+    )
+    parser.add_argument(
+        "--metadata",
+        type=str,
+        help="CSV with an image_path column to slice by (e.g. the acquire.py index)"
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=1,
+        help="Directory depth used by --by path_prefix"
+    )
+    parser.add_argument(
+        "--n_boot",
+        type=int,
+        default=1000,
+        help="Number of bootstrap replicates (0 to skip confidence intervals)"
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        help="Confidence level of the intervals"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Random seed of the bootstrap"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="CSV file to save the table to (default: <predictions>/../sliced_metrics.csv)"
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    """Run the analysis."""
+    args = parse_args()
+
+    start_time = time.time()
+    predictions = load_predictions(args.predictions)
+    metadata = load_metadata(args.metadata) if args.metadata else None
+    print(f"Loaded {len(predictions['loss'])} samples in {time.time() - start_time:.1f}s")
+
+    tables = []
+    for by in ["all"] + list(args.by):
+        start_time = time.time()
+        keys = None if by == "all" else slice_keys(predictions, by, metadata, args.depth)
+        table = analyze(predictions, keys, n_boot=args.n_boot, confidence=args.confidence, seed=args.seed)
+        table.insert(0, "slice_by", by)
+        tables.append(table)
+        print(f"Sliced by {by}: {table['slice'].nunique()} slices in {time.time() - start_time:.1f}s")
+
+    results = pd.concat(tables, ignore_index=True)
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(args.predictions)), "sliced_metrics.csv")
+    results.to_csv(output, index=False)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
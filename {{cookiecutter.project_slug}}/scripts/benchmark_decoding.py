@@ -0,0 +1,124 @@
+"""
+Image decoding benchmark.
+
+This script:
+1. Builds the datamodule transforms and image list from a configuration file
+2. Decodes a sample of the images of each format with every available backend,
+   at full size and at the reduced size the transforms allow
+3. Applies the first transform (the resize) to each decoded image
+4. Prints the decode+resize cost per image for each combination
+
+Usage:
+    python benchmark_decoding.py --config configs/0_baselines/00_baseline_default.yaml \
+        --num_images 200 --stage val
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torchvision.transforms as T
+from torchvision.transforms import v2
+import yaml
+
+from {{cookiecutter.project_slug}}.config import TrainerConfig
+from {{cookiecutter.project_slug}}.datamodules import get_datamodule
+from {{cookiecutter.project_slug}}.datasets import get_dataset
+from {{cookiecutter.project_slug}}.decoding import (
+    DECODE_BACKENDS, TURBOJPEG_AVAILABLE, ImageDecoder, image_format, reduced_size
+)
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark image decoding backends")
+
+    parser.add_argument(
+        "--config",
+        type=str,
+        required=True,
+        help="Path to YAML configuration file"
+    )
+    parser.add_argument(
+        "--num_images",
+        type=int,
+        default=200,
+        help="Number of images of each format to decode"
+    )
+    parser.add_argument(
+        "--stage",
+        type=str,
+        default="val",
+        choices=["train", "val", "test"],
+        help="Transform chain whose first transform is benchmarked"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="Random seed for sampling images"
+    )
+
+    return parser.parse_args()
+
+
+def time_decoding(paths, decoder, min_size, resize):
+    """Get the mean decode+resize time per image in seconds."""
+    resize(decoder(paths[0], min_size))
+    start_time = time.perf_counter()
+    for path in paths:
+        resize(decoder(path, min_size))
+    return (time.perf_counter() - start_time) / len(paths)
+
+
+def main():
+    """Run the decoding benchmark."""
+    args = parse_args()
+
+    with open(args.config, "r") as f:
+        config = TrainerConfig(**yaml.safe_load(f))
+
+    datamodule = get_datamodule(config)
+    transforms = {
+        "train": datamodule.train_transforms,
+        "val": datamodule.val_transforms,
+        "test": datamodule.test_transforms,
+    }[args.stage]
+    steps = transforms.transforms if isinstance(transforms, (T.Compose, v2.Compose)) else [transforms]
+    resize = steps[0] if steps else (lambda image: image)
+    min_size = reduced_size(transforms)
+    print(f"First {args.stage} transform: {resize}")
+    print(f"Reduced decoding size (width, height): {min_size or 'none, decoding at full size'}")
+
+    image_paths = get_dataset(config).image_paths
+    by_format = {}
+    for path in image_paths:
+        by_format.setdefault(image_format(path), []).append(path)
+
+    backends = [b for b in DECODE_BACKENDS if b != "auto" and (b != "turbojpeg" or TURBOJPEG_AVAILABLE)]
+    rng = np.random.default_rng(args.seed)
+    print(f"\n{'format':<8} {'backend':<12} {'reduced':<8} {'ms/image':>9} {'images/s':>9}")
+    for fmt, paths in sorted(by_format.items()):
+        if len(paths) > args.num_images:
+            paths = [paths[i] for i in np.sort(rng.choice(len(paths), args.num_images, replace=False))]
+        auto = ImageDecoder("auto").backend_for(paths[0])
+        for backend in backends:
+            if backend == "turbojpeg" and fmt != "jpeg":
+                continue
+            for reduced in ([False, True] if min_size and backend != "torchvision" else [False]):
+                decoder = ImageDecoder(backend, reduced=reduced)
+                try:
+                    seconds = time_decoding(paths, decoder, min_size, resize)
+                except (OSError, RuntimeError) as e:
+                    print(f"{fmt:<8} {backend:<12} {'yes' if reduced else 'no':<8} failed: {e}")
+                    continue
+                marker = " (auto)" if backend == auto and reduced == (bool(min_size) and backend != "torchvision") else ""
+                print(f"{fmt:<8} {backend:<12} {'yes' if reduced else 'no':<8} "
+                      f"{seconds * 1000:>9.2f} {1 / seconds:>9.1f}{marker}")
+
+    if not TURBOJPEG_AVAILABLE:
+        print("\nInstall PyTurboJPEG to also benchmark libjpeg-turbo scaled decoding")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,14 @@ Evaluation script for model assessment.
 
 This script:
 1. Loads a trained model from a checkpoint
-2. Runs inference on test data
-3. Computes and reports metrics
-4. Generates visualizations for error analysis
+2. Runs inference on test data in a single pass, which:
+   - aggregates metrics incrementally
+   - streams per-sample losses and metric statistics to Parquet/NPZ shards
+   - optionally saves raw predictions and renders figures
+3. Reports metrics
+
+Error analysis reads the per-sample shards (see ``evaluation.load_predictions``)
+instead of running inference again.
 
 Usage:
     python evaluate.py --model_path model_runs/experiment/best.ckpt --test_data path/to/test/data
@@ -13,19 +18,18 @@ Usage:
 
 import argparse
 import os
-import json
 from pathlib import Path
 
 import torch
-import numpy as np
-import matplotlib.pyplot as plt
 import lightning.pytorch as pl
 from lightning.pytorch import Trainer
 import yaml
 
+from {{cookiecutter.project_slug}}.checkpoints import load_checkpoint, read_hparams
 from {{cookiecutter.project_slug}}.config import TrainerConfig
 from {{cookiecutter.project_slug}}.models import get_model
 from {{cookiecutter.project_slug}}.datamodules import get_datamodule
+from {{cookiecutter.project_slug}}.evaluation import evaluate_task
 from {{cookiecutter.project_slug}}.trainers import get_task
 
 
@@ -70,7 +74,15 @@ def parse_args():
     parser.add_argument(
         "--save_predictions",
         action="store_true",
-        help="Save model predictions to disk"
+        help="Save raw model predictions and prediction figures to disk"
+    )
+    
+    parser.add_argument(
+        "--format",
+        type=str,
+        default="parquet",
+        choices=["parquet", "npz"],
+        help="Format of the per-sample output shards"
     )
     
     parser.add_argument(
@@ -97,19 +109,20 @@ def main():
     # Create output directory
     os.makedirs(args.output_dir, exist_ok=True)
     
-    # Load configuration
+    # Load the checkpoint once (memory-mapped, without optimizer state)
+    checkpoint = load_checkpoint(args.model_path)
+    
+    # Load configuration, from the checkpoint's hparams sidecar if no config is provided
+    hparams = read_hparams(args.model_path, checkpoint=checkpoint)
     if args.config:
         with open(args.config, "r") as f:
             config_dict = yaml.safe_load(f)
+    elif "config" in hparams:
+        config_dict = hparams["config"]
     else:
-        # If no config provided, load from checkpoint hparams
-        checkpoint = torch.load(args.model_path, map_location="cpu")
-        if "hyper_parameters" in checkpoint:
-            config_dict = checkpoint["hyper_parameters"]
-        else:
-            print("No config file provided and no hyper_parameters found in checkpoint.")
-            print("Using default configuration.")
-            config_dict = {}
+        print("No config file provided and no hparams sidecar found for the checkpoint.")
+        print("Using default configuration.")
+        config_dict = {}
     
     # Override with evaluation-specific settings
     config_dict["input_dirs"] = [args.test_data]
@@ -123,107 +136,32 @@ def main():
     model = get_model(config)
     
     # Create task
-    task = get_task(args.task_type, model)
+    task = get_task(args.task_type, model, **hparams.get("task", {}))
     
     # Load checkpoint weights
-    checkpoint = torch.load(args.model_path, map_location="cpu")
     task.load_state_dict(checkpoint["state_dict"])
     
     # Load data
-    datamodule = get_datamodule(args.task_type, config)
+    datamodule = get_datamodule(config)
     datamodule.setup(stage="test")
     
     # Create trainer
     trainer = Trainer(
         accelerator="gpu" if torch.cuda.is_available() else "cpu",
-        devices=[args.gpu_id] if torch.cuda.is_available() else None,
+        devices=[args.gpu_id] if torch.cuda.is_available() else "auto",
         logger=None,
         enable_checkpointing=False
     )
     
-    # Run evaluation
-    print("Running evaluation...")
-    results = trainer.test(task, datamodule=datamodule)[0]
-    
-    # Print results
-    print("\nEvaluation Results:")
-    for metric, value in results.items():
-        print(f"  {metric}: {value:.4f}")
-    
-    # Save results to file
-    result_file = os.path.join(args.output_dir, "evaluation_results.json")
-    with open(result_file, "w") as f:
-        json.dump(results, f, indent=2)
-    
-    print(f"Results saved to {result_file}")
-    
-    # Save predictions if requested
-    if args.save_predictions:
-        print("Generating and saving predictions...")
-        save_predictions(task, datamodule, args.output_dir)
-
-
-def save_predictions(task, datamodule, output_dir):
-    """Generate and save model predictions.
-    
-    Args:
-        task: LightningModule task
-        datamodule: DataModule with test data
-        output_dir: Directory to save predictions
-    """
-    # Create predictions directory
-    predictions_dir = os.path.join(output_dir, "predictions")
-    os.makedirs(predictions_dir, exist_ok=True)
-    
-    # Set model to evaluation mode
-    task.eval()
-    
-    # Generate predictions
-    dataloader = datamodule.test_dataloader()
-    
-    with torch.no_grad():
-        for i, batch in enumerate(dataloader):
-            # Get input and generate prediction
-            x = batch["image"]
-            y_hat = task(x)
-            
-            # Convert to numpy
-            pred = y_hat.cpu().numpy()
-            
-            # Save first 10 batches
-            if i < 10:
-                for j in range(min(4, len(x))):
-                    # Create figure
-                    fig, ax = plt.subplots(1, 3, figsize=(15, 5))
-                    
-                    # Plot input image
-                    img = x[j, :3].permute(1, 2, 0).cpu().numpy()
-                    img = np.clip(img, 0, 1)
-                    ax[0].imshow(img)
-                    ax[0].set_title("Input")
-                    ax[0].axis("off")
-                    
-                    # Plot ground truth if available
-                    if "target" in batch:
-                        target = batch["target"][j, 0].cpu().numpy()
-                        ax[1].imshow(target, cmap="viridis")
-                        ax[1].set_title("Ground Truth")
-                        ax[1].axis("off")
-                    else:
-                        ax[1].axis("off")
-                    
-                    # Plot prediction
-                    ax[2].imshow(pred[j, 0], cmap="viridis")
-                    ax[2].set_title("Prediction")
-                    ax[2].axis("off")
-                    
-                    # Save figure
-                    plt.tight_layout()
-                    plt.savefig(os.path.join(predictions_dir, f"pred_batch{i}_sample{j}.png"))
-                    plt.close()
-    
-    print(f"Saved prediction visualizations to {predictions_dir}")
+    evaluate_task(
+        task,
+        datamodule,
+        args.output_dir,
+        trainer=trainer,
+        with_predictions=args.save_predictions,
+        fmt=args.format
+    )
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
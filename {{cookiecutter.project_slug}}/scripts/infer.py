@@ -26,7 +26,9 @@ from torch import Tensor
 from torch.utils.data import DataLoader, Dataset
 from tqdm import tqdm
 
-from {{cookiecutter.project_slug}}.trainers import get_task
+from {{cookiecutter.project_slug}}.checkpoints import load_task
+from {{cookiecutter.project_slug}}.datasets import PathTable
+from {{cookiecutter.project_slug}}.telemetry import Telemetry
 
 # Set environment variables for better rasterio performance
 rasterio_best_practices = {
@@ -91,10 +93,10 @@ class GeoTIFFDataset(Dataset):
         """Initialize dataset.
         
         Args:
-            file_list: List of file paths to process
+            file_list: List of file paths to process (stored as a PathTable)
             transforms: Optional transforms to apply to samples
         """
-        self.file_list = file_list
+        self.file_list = file_list if isinstance(file_list, PathTable) else PathTable(file_list)
         self.transforms = transforms
 
     def __len__(self) -> int:
@@ -238,6 +240,24 @@ def parse_args():
         default="_prediction.tif",
         help="Suffix to add to output filenames"
     )
+    parser.add_argument(
+        "--metrics_port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics on this local port (default: disabled, 0 picks a free port)"
+    )
+    parser.add_argument(
+        "--telemetry_jsonl",
+        type=str,
+        default=None,
+        help="File telemetry snapshots are appended to (default: <output_dir>/telemetry.jsonl)"
+    )
+    parser.add_argument(
+        "--telemetry_interval",
+        type=float,
+        default=10.0,
+        help="Seconds between telemetry snapshots"
+    )
     
     return parser.parse_args()
 
@@ -252,15 +272,16 @@ def main():
     print(f"Using device: {device}")
     
     # Load input file list
+    # A compact table, so workers read it without touching one object per path
     with open(args.input_list, "r") as f:
-        file_list = [line.strip() for line in f.readlines() if line.strip()]
+        file_list = PathTable(line.strip() for line in f if line.strip())
     
     print(f"Loaded {len(file_list)} files for inference")
     
     # Load checkpoint
     print(f"Loading model from {args.checkpoint}")
-    task = get_task("segmentation", None)  # The model will be loaded from checkpoint
-    task = task.load_from_checkpoint(args.checkpoint, map_location=device)
+    # Built from the hparams sidecar, weights loaded once (memory-mapped)
+    task, _ = load_task(args.checkpoint, map_location=device)
     task.freeze()
     model = task.model.eval()
     
@@ -281,20 +302,55 @@ def main():
     # Create output directory
     os.makedirs(args.output_dir, exist_ok=True)
     
+    # Telemetry: progress, throughput, latencies and memory
+    telemetry = Telemetry(
+        "infer",
+        port=args.metrics_port,
+        jsonl_path=args.telemetry_jsonl or os.path.join(args.output_dir, "telemetry.jsonl"),
+        interval=args.telemetry_interval
+    )
+    telemetry.gauge("files_planned", "Files in the input list").set(len(file_list))
+    files_read = telemetry.counter("files_read_total", "Files received from the data loader")
+    files_done = telemetry.counter("files_total", "Files written")
+    files_failed = telemetry.counter("files_failed_total", "Files that failed inference or writing")
+    telemetry.gauge(
+        "files_in_flight", "Files received from the data loader but not yet written or failed",
+        fn=lambda: files_read.value - files_done.value - files_failed.value
+    )
+    pixels_done = telemetry.counter("pixels_total", "Input pixels processed")
+    read_latency = telemetry.histogram("read_latency_seconds", "Time waiting for the next batch")
+    infer_latency = telemetry.histogram("infer_latency_seconds", "Forward pass of a batch")
+    write_latency = telemetry.histogram("write_latency_seconds", "Writing one prediction")
+    
     # Run inference
     print("Starting inference...")
-    with torch.no_grad():
-        for batch in tqdm(dataloader, desc="Processing"):
+    loader_iter = iter(dataloader)
+    # Batches requested from the workers and not consumed yet (0 without workers)
+    telemetry.gauge(
+        "prefetch_queue_depth", "Batches being loaded or waiting to be consumed",
+        fn=lambda: getattr(loader_iter, "_tasks_outstanding", 0)
+    )
+    batches = iter(tqdm(loader_iter, total=len(dataloader), desc="Processing"))
+    # The final snapshot is written even if inference stops with an error
+    with telemetry, torch.no_grad():
+        while True:
+            with read_latency.time():
+                batch = next(batches, StopIteration)
+            if batch is StopIteration:
+                break
             if batch is None:
                 continue
             
             # Move data to device
             images = batch["image"].to(device)
             file_paths = batch["file_path"]
+            files_read.inc(len(file_paths))
             
             try:
                 # Run inference
-                predictions = model(images).cpu().numpy()
+                with infer_latency.time():
+                    predictions = model(images).cpu().numpy()
+                pixels_done.inc(images.shape[0] * images.shape[-2] * images.shape[-1])
                 
                 # Process each prediction in the batch
                 for i in range(len(images)):
@@ -315,13 +371,16 @@ def main():
                     prediction = predictions[i]
                     
                     # Save prediction
-                    save_prediction(prediction, metadata, output_path)
+                    with write_latency.time():
+                        save_prediction(prediction, metadata, output_path)
                     processed += 1
+                    files_done.inc()
                     
             except Exception as e:
                 print(f"Error processing batch: {e}")
                 for path in file_paths:
                     failed.append((path, str(e)))
+                files_failed.inc(len(file_paths))
     
     # Print summary
     print(f"\nInference complete:")
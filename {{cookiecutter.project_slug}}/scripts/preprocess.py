@@ -0,0 +1,109 @@
+"""
+Offline preprocessing script.
+
+This script:
+1. Builds the datamodule transforms from a configuration file
+2. Runs the deterministic part of each transform chain (e.g. Resize) once over
+   the dataset using a process pool
+3. Writes the results in a compact format (PNG/WebP at target size or a uint8 memmap)
+4. Records a manifest keyed by the transform signature
+
+The datamodule picks up a preprocessed variant automatically when
+``preprocessed_dir`` is set in the config and the transform signature matches.
+
+Usage:
+    python preprocess.py --config configs/0_baselines/00_baseline_default.yaml \
+        --preprocessed_dir data/preprocessed --format memmap
+"""
+
+import argparse
+import time
+
+import yaml
+
+from {{cookiecutter.project_slug}}.config import TrainerConfig
+from {{cookiecutter.project_slug}}.datamodules import get_datamodule
+from {{cookiecutter.project_slug}}.datasets import get_dataset
+from {{cookiecutter.project_slug}}.preprocessing import preprocess_images
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Preprocess a dataset offline")
+
+    parser.add_argument(
+        "--config",
+        type=str,
+        required=True,
+        help="Path to YAML configuration file"
+    )
+    parser.add_argument(
+        "--preprocessed_dir",
+        type=str,
+        help="Directory to write preprocessed variants to (defaults to config.preprocessed_dir)"
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        default="png",
+        choices=["png", "webp", "memmap"],
+        help="Output format for preprocessed images"
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)"
+    )
+    parser.add_argument(
+        "--stages",
+        type=str,
+        nargs="+",
+        default=["train", "val", "test"],
+        help="Transform chains to preprocess"
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    """Run offline preprocessing."""
+    args = parse_args()
+
+    with open(args.config, "r") as f:
+        config_dict = yaml.safe_load(f)
+    if args.preprocessed_dir:
+        config_dict["preprocessed_dir"] = args.preprocessed_dir
+
+    config = TrainerConfig(**config_dict)
+    preprocessed_dir = getattr(config, "preprocessed_dir", None)
+    if not preprocessed_dir:
+        raise ValueError("Set --preprocessed_dir or preprocessed_dir in the config")
+
+    datamodule = get_datamodule(config)
+    stage_transforms = {
+        "train": datamodule.train_transforms,
+        "val": datamodule.val_transforms,
+        "test": datamodule.test_transforms,
+    }
+
+    for stage in args.stages:
+        dataset = get_dataset(config, transform=stage_transforms[stage])
+        start_time = time.time()
+        out_dir = preprocess_images(
+            dataset.image_paths,
+            dataset.transforms,
+            preprocessed_dir,
+            fmt=args.format,
+            num_workers=args.num_workers,
+        )
+        if out_dir is None:
+            print(f"{stage}: no deterministic transforms to precompute, skipping")
+        else:
+            print(f"{stage}: {len(dataset)} images -> {out_dir} ({time.time() - start_time:.1f}s)")
+
+    print(f"\nSet preprocessed_dir: {preprocessed_dir} in your config to use them")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,11 @@ This script:
 3. Executes the training process or hyperparameter search
 4. Logs results and saves checkpoints
 
-The script supports two modes:
+The script supports three modes:
 - Standard training: Train a model with fixed hyperparameters
 - Search mode: Find optimal hyperparameters using Optuna
+- Pipeline mode: Search, retrain the best configuration on the full data
+  (warm-started from the best trial) and evaluate it, without prompting
 
 Usage:
     # Standard training
@@ -18,10 +20,20 @@ Usage:
     # Hyperparameter search
     python train.py --config configs/baseline/simple.yaml --search_mode --n_trials 20 \
         --lr_range 1e-5,1e-2 --wd_range 1e-6,1e-3 --batch_size_range 16,32,64
+
+    # Parallel, resumable search (rerun the same command to resume)
+    python train.py --config configs/baseline/simple.yaml --search_mode --n_trials 20 \
+        --n_workers 5 --study_name baseline_search
+
+    # Non-interactive search -> retrain -> evaluate (e.g. in a batch job)
+    python train.py --config configs/baseline/simple.yaml --pipeline --n_trials 20 --frac 0.2
 """
 
 import argparse
+import multiprocessing as mp
 import os
+import sys
+import zlib
 import yaml
 from pathlib import Path
 import time
@@ -36,10 +48,23 @@ from lightning.pytorch.callbacks import (
     LearningRateMonitor
 )
 
-from {{cookiecutter.project_slug}}.config import TrainerConfig
+from {{cookiecutter.project_slug}}.autotune import autotune_batch_size
+from {{cookiecutter.project_slug}}.checkpoints import (
+    BackgroundCheckpointIO,
+    load_checkpoint,
+    run_hparams,
+    save_slim_checkpoint,
+)
+from {{cookiecutter.project_slug}}.config import PERFORMANCE_PROFILES, TrainerConfig, resolve_performance_profile
+from {{cookiecutter.project_slug}}.distributed import CoreAffinity, cpu_ddp_strategy, pin_process, split_cores
 from {{cookiecutter.project_slug}}.models import get_model
+from {{cookiecutter.project_slug}}.profiling import StepTimeProfiler
+from {{cookiecutter.project_slug}}.telemetry import TelemetryCallback
 from {{cookiecutter.project_slug}}.datamodules import get_datamodule
+from {{cookiecutter.project_slug}}.evaluation import evaluate_task
 from {{cookiecutter.project_slug}}.trainers import get_task
+from {{cookiecutter.project_slug}}.validation import BackgroundValidator, ValidationSchedule
+
 
 try:
     import optuna
@@ -68,8 +93,31 @@ def parse_args():
     parser.add_argument("--max_epochs", type=int, help="Maximum number of epochs")
     parser.add_argument("--learning_rate", type=float, help="Learning rate")
     parser.add_argument("--gpu_ids", type=int, nargs="+", help="GPU IDs to use")
+    parser.add_argument(
+        "--num_processes",
+        type=int,
+        help="Without GPUs, train with this many gloo DDP processes per node on disjoint cores"
+    )
+    parser.add_argument("--num_nodes", type=int, help="Number of nodes of a multi-node run")
+    parser.add_argument(
+        "--rendezvous_file",
+        type=str,
+        help="Shared file the processes of a multi-node CPU run rendezvous through (fresh path per run)"
+    )
+    parser.add_argument(
+        "--performance_profile",
+        type=str,
+        choices=list(PERFORMANCE_PROFILES),
+        help="Trade-off between reproducibility and speed (default: reproducible)"
+    )
     parser.add_argument("--seed", type=int, help="Random seed")
     parser.add_argument("--experiment_name", type=str, help="Experiment name")
+    parser.add_argument(
+        "--autotune",
+        action="store_true",
+        default=None,
+        help="Choose the batch size (and scale the learning rate) by probing throughput and memory"
+    )
     
     # Hyperparameter search mode
     parser.add_argument(
@@ -77,6 +125,17 @@ def parse_args():
         action="store_true",
         help="Enable Optuna hyperparameter search mode"
     )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Search, retrain the best configuration on the full data and evaluate it, "
+             "without prompting"
+    )
+    parser.add_argument(
+        "--no_warm_start",
+        action="store_true",
+        help="In pipeline mode, retrain from scratch instead of the best trial's checkpoint"
+    )
     parser.add_argument(
         "--n_trials",
         type=int,
@@ -114,6 +173,42 @@ def parse_args():
         help="List of hyperparameters to disable from tuning (e.g., --disable_tuning lr batch_size)",
         default=[]
     )
+    parser.add_argument(
+        "--pruner",
+        type=str,
+        default="median",
+        choices=["none", "median", "hyperband", "asha"],
+        help="Optuna pruner used to stop unpromising trials early"
+    )
+    parser.add_argument(
+        "--pruner_warmup_epochs",
+        type=int,
+        default=1,
+        help="Number of epochs a trial always runs before it can be pruned"
+    )
+    parser.add_argument(
+        "--n_workers",
+        type=int,
+        default=1,
+        help="Number of worker processes running trials in parallel"
+    )
+    parser.add_argument(
+        "--study_name",
+        type=str,
+        help="Optuna study name; an existing study with this name is resumed"
+    )
+    parser.add_argument(
+        "--storage",
+        type=str,
+        help="Optuna storage: a .db/.sqlite file, a journal file, or a storage URL "
+             "(default: search_results/<study_name>.log)"
+    )
+    parser.add_argument(
+        "--decoded_cache_gb",
+        type=float,
+        default=0.0,
+        help="Shared memory (GB) for decoded images reused across trials (default: 0, disabled)"
+    )
     parser.add_argument(
         "--frac",
         type=float,
@@ -124,6 +219,143 @@ def parse_args():
     return parser.parse_args()
 
 
+def get_storage(storage):
+    """Create an Optuna storage that several processes can share.
+
+    Args:
+        storage: Path to a SQLite (.db/.sqlite) or journal file, or a storage URL
+
+    Returns:
+        Optuna storage object or URL
+    """
+    if "://" in storage:
+        return storage
+    os.makedirs(os.path.dirname(os.path.abspath(storage)), exist_ok=True)
+    if storage.endswith((".db", ".sqlite", ".sqlite3")):
+        return f"sqlite:///{os.path.abspath(storage)}"
+    try:
+        from optuna.storages.journal import JournalFileBackend
+    except ImportError:  # optuna < 4.0
+        from optuna.storages import JournalFileStorage as JournalFileBackend
+    return optuna.storages.JournalStorage(JournalFileBackend(storage))
+
+
+def _search_worker(search, worker_id, cores, n_trials):
+    """Run trials of a shared study in a worker process."""
+    pin_process(cores)
+    search.worker_id = worker_id
+    search.cores = cores
+    study = optuna.load_study(
+        study_name=search.study_name,
+        storage=get_storage(search.storage),
+        pruner=search.make_pruner()
+    )
+    study.optimize(search.objective, n_trials=n_trials)
+
+
+def load_warm_start(task, checkpoint_path):
+    """Initialize a task with the weights of a checkpoint.
+
+    Only the weights are loaded: the optimizer, scheduler and epoch counter
+    start fresh.
+
+    Args:
+        task: LightningModule task
+        checkpoint_path: Path to a Lightning checkpoint with the same architecture
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    task.load_state_dict(checkpoint["state_dict"])
+    print(f"Warm-started from {checkpoint_path}")
+
+
+def checkpoint_plugins(config, task_type):
+    """Get the checkpoint IO plugins selected by the config.
+
+    Every checkpoint gets an hparams sidecar, so the IO plugin is always
+    used; it only writes in the background or incrementally when selected.
+
+    Args:
+        config: Configuration object (``async_checkpointing``, ``incremental_checkpoints``)
+        task_type: Type of task, recorded in the sidecars
+
+    Returns:
+        List of Trainer plugins
+    """
+    # Up to a top-k, the last and a rolling step checkpoint per epoch, so
+    # saving never waits for the writes of the same epoch
+    saves_per_epoch = 2 + bool(getattr(config, "checkpoint_every_n_steps", None))
+    return [BackgroundCheckpointIO(
+        background=getattr(config, "async_checkpointing", False),
+        incremental=getattr(config, "incremental_checkpoints", False),
+        max_pending=saves_per_epoch,
+        hparams=run_hparams(config, task_type),
+    )]
+
+
+def apply_performance_profile(config):
+    """Apply the performance profile of the config to this process.
+
+    Sets the float32 matmul precision and returns the profile's ``pl.Trainer``
+    arguments (determinism, cuDNN autotuning, anomaly detection, validation
+    and logging cadence).
+
+    Args:
+        config: Configuration object (``performance_profile`` and overrides)
+
+    Returns:
+        Tuple of (resolved profile, Trainer keyword arguments)
+    """
+    profile = resolve_performance_profile(config)
+    torch.set_float32_matmul_precision(profile["matmul_precision"])
+    trainer_kwargs = {
+        "deterministic": profile["deterministic"],
+        "benchmark": profile["cudnn_benchmark"],
+        "detect_anomaly": profile["detect_anomaly"],
+        "check_val_every_n_epoch": profile["check_val_every_n_epoch"],
+        "log_every_n_steps": profile["log_every_n_steps"],
+    }
+    return profile, trainer_kwargs
+
+
+def write_manifest(path, manifest):
+    """Write the run manifest atomically, so it is always complete on disk."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+class PruningCallback(pl.Callback):
+    """Report the monitored metric to Optuna after every epoch and stop pruned trials."""
+
+    def __init__(self, trial, monitor="val_loss"):
+        """Initialize callback.
+
+        Args:
+            trial: Optuna trial being trained
+            monitor: Metric reported to the pruner
+        """
+        super().__init__()
+        self.trial = trial
+        self.monitor = monitor
+        self.pruned = False
+
+    def on_validation_end(self, trainer, pl_module):
+        """Report the epoch's score and stop training if the trial should be pruned."""
+        if trainer.sanity_checking:
+            return
+        score = trainer.callback_metrics.get(self.monitor)
+        if score is None:
+            return
+        epoch = trainer.current_epoch
+        self.trial.report(score.item(), step=epoch)
+        if self.trial.should_prune():
+            # Stop cleanly so that callbacks and loggers are finalized
+            print(f"Trial {self.trial.number} pruned at epoch {epoch}")
+            self.pruned = True
+            trainer.should_stop = True
+
+
 class HyperparameterSearch:
     """Class for performing hyperparameter optimization using Optuna."""
     
@@ -134,7 +366,13 @@ class HyperparameterSearch:
         n_trials=20,
         search_epochs=10,
         param_ranges=None,
-        frac=1.0
+        frac=1.0,
+        n_workers=1,
+        study_name=None,
+        storage=None,
+        pruner="median",
+        pruner_warmup_epochs=1,
+        decoded_cache_gb=0.0
     ):
         """Initialize hyperparameter search.
         
@@ -145,6 +383,12 @@ class HyperparameterSearch:
             search_epochs: Number of epochs to train per trial
             param_ranges: Dictionary of parameter ranges to search
             frac: Fraction of data to use for search
+            n_workers: Number of worker processes running trials in parallel
+            study_name: Name of the study, an existing study is resumed
+            storage: Shared storage (file path or URL) for the study
+            pruner: Pruner name (none, median, hyperband, asha)
+            pruner_warmup_epochs: Epochs a trial always runs before it can be pruned
+            decoded_cache_gb: Shared memory (GB) for decoded images reused across trials
         """
         self.config_dict = config_dict.copy()
         self.task_type = task_type
@@ -152,6 +396,23 @@ class HyperparameterSearch:
         self.search_epochs = search_epochs
         self.param_ranges = param_ranges or {}
         self.frac = frac
+        self.n_workers = max(1, n_workers)
+        self.study_name = study_name or config_dict.get("experiment_name", "search")
+        self.storage = storage or os.path.join("search_results", f"{self.study_name}.log")
+        self.pruner = pruner
+        self.pruner_warmup_epochs = pruner_warmup_epochs
+        self.worker_id = 0
+        self.cores = set()
+        self.n_pruned = 0
+        self.best_trial = None
+        self.decoded_cache_gb = decoded_cache_gb
+        self._datamodule = None
+        
+        # Deterministic per study, so resumed and parallel trials see the same subsample
+        self.subsample_seed = zlib.crc32(self.study_name.encode())
+        
+        if not 0 < frac <= 1:
+            raise ValueError(f"frac must be in (0, 1], got {frac}")
         
         # Override max_epochs for search
         self.config_dict["max_epochs"] = search_epochs
@@ -159,6 +420,52 @@ class HyperparameterSearch:
         if not OPTUNA_AVAILABLE:
             raise ImportError("Optuna is required for hyperparameter search. Install with: pip install optuna")
 
+    def make_pruner(self):
+        """Create the Optuna pruner.
+
+        Epochs are the resource unit: median pruning compares each epoch's
+        ``val_loss`` to other trials at the same epoch, while Hyperband and
+        ASHA run successive-halving brackets between ``pruner_warmup_epochs``
+        and ``search_epochs``.
+
+        Returns:
+            Optuna pruner
+        """
+        min_epochs = max(1, self.pruner_warmup_epochs)
+        if self.pruner == "none":
+            return optuna.pruners.NopPruner()
+        if self.pruner == "median":
+            return optuna.pruners.MedianPruner(n_startup_trials=2, n_warmup_steps=min_epochs - 1)
+        if self.pruner == "hyperband":
+            return optuna.pruners.HyperbandPruner(
+                min_resource=min_epochs, max_resource=self.search_epochs, reduction_factor=3
+            )
+        if self.pruner == "asha":
+            return optuna.pruners.SuccessiveHalvingPruner(
+                min_resource=min_epochs, reduction_factor=3
+            )
+        raise ValueError(f"Unsupported pruner: {self.pruner}")
+
+    def get_shared_datamodule(self, config):
+        """Get the datamodule shared by all trials run in this process.
+        
+        The dataset index, split indices, decoded-image cache and dataloader
+        workers are built by the first trial; later trials only change the
+        batch size. Trial hyperparameters must therefore not affect the data
+        (other than the batch size).
+        
+        Args:
+            config: Trial configuration
+            
+        Returns:
+            DataModule instance
+        """
+        if self._datamodule is None:
+            self._datamodule = get_datamodule(config)
+        else:
+            self._datamodule.set_batch_size(config.batch_size)
+        return self._datamodule
+    
     def objective(self, trial):
         """Optuna objective function.
         
@@ -187,12 +494,28 @@ class HyperparameterSearch:
         # Generate a unique experiment name for this trial
         trial_config["experiment_name"] = f"{trial_config.get('experiment_short_name', 'search')}_trial_{trial.number}"
         
+        # Subsample the data; the sampling order is shared by all trials of the study
+        trial_config["frac"] = self.frac
+        trial_config["subsample_seed"] = self.subsample_seed
+        trial_config["subsample_cache_dir"] = os.path.join("search_results", f"{self.study_name}_cache")
+        trial_config["decoded_cache_gb"] = self.decoded_cache_gb
+        trial_config["reuse_dataloaders"] = True
+        
+        # Keep data loading within this worker's cores and spread workers over GPUs
+        if self.cores:
+            trial_config["num_workers"] = min(
+                trial_config.get("num_workers", 4), max(0, len(self.cores) - 1)
+            )
+        if trial_config.get("gpu_ids"):
+            gpu_ids = trial_config["gpu_ids"]
+            trial_config["gpu_ids"] = [gpu_ids[self.worker_id % len(gpu_ids)]]
+        
         # Create config object
         config = TrainerConfig(**trial_config)
         
         # Initialize model, datamodule, and task
         model = get_model(config)
-        datamodule = get_datamodule(self.task_type, config)
+        datamodule = self.get_shared_datamodule(config)
         task = get_task(
             self.task_type,
             model,
@@ -204,7 +527,13 @@ class HyperparameterSearch:
             scheduler_params={
                 "patience": config.patience,
                 "t_max": config.max_epochs // 2
-            }
+            },
+            num_classes=config.out_channels,
+            metrics_mode=getattr(config, "metrics_mode", "epoch"),
+            metrics_interval=getattr(config, "metrics_interval", 50),
+            optimizer_impl=getattr(config, "optimizer_impl", "default"),
+            compile=getattr(config, "compile", False),
+            compile_mode=getattr(config, "compile_mode", "default")
         )
         
         # Setup callbacks
@@ -214,32 +543,50 @@ class HyperparameterSearch:
             mode="min"
         )
         
+        # One directory per trial, so the best trial's weights can be warm-started from
         checkpoint_callback = ModelCheckpoint(
-            dirpath=config.output_dir,
+            dirpath=os.path.join(
+                config.output_dir, "search", self.study_name, f"trial_{trial.number:04d}"
+            ),
             filename="best",
             monitor="val_loss",
             mode="min",
             save_top_k=1
         )
         
+        pruning_callback = PruningCallback(trial, monitor="val_loss")
+        
         # Setup logger
         logger = pl_loggers.TensorBoardLogger(
             save_dir=config.log_dir,
             name=config.experiment_name
         )
         
+        # Trials are pruned on every epoch's validation loss, whatever the profile's cadence
+        _, performance_kwargs = apply_performance_profile(config)
+        performance_kwargs["check_val_every_n_epoch"] = 1
+        
         # Train model
         trainer = pl.Trainer(
             max_epochs=config.max_epochs,
             accelerator="gpu" if config.gpu_ids else "cpu",
-            devices=config.gpu_ids if config.gpu_ids else None,
+            devices=config.gpu_ids if config.gpu_ids else "auto",
             logger=logger,
-            callbacks=[early_stop, checkpoint_callback],
+            callbacks=[early_stop, checkpoint_callback, pruning_callback],
+            plugins=checkpoint_plugins(config, self.task_type),
             enable_progress_bar=False,  # Disable progress bar for cleaner output
-            precision=config.precision
+            precision=config.precision,
+            accumulate_grad_batches=getattr(config, "accumulate_grad_batches", 1),
+            reload_dataloaders_every_n_epochs=int(getattr(config, "progressive_resizing", False)),
+            use_distributed_sampler=False,  # the datamodule shards every split itself
+            **performance_kwargs
         )
         
         trainer.fit(model=task, datamodule=datamodule)
+        trial.set_user_attr("checkpoint_path", checkpoint_callback.best_model_path)
+        
+        if pruning_callback.pruned:
+            raise optuna.TrialPruned()
         
         # Return best validation loss
         return early_stop.best_score.item()
@@ -253,17 +600,280 @@ class HyperparameterSearch:
         print(f"Starting hyperparameter search with {self.n_trials} trials")
         print(f"Parameter ranges: {self.param_ranges}")
         
-        # Create study
-        study = optuna.create_study(direction="minimize")
-        study.optimize(self.objective, n_trials=self.n_trials)
+        # Create the study, or resume an interrupted one with the same name
+        storage = optuna.storages.get_storage(get_storage(self.storage))
+        study = optuna.create_study(
+            study_name=self.study_name,
+            storage=storage,
+            direction="minimize",
+            pruner=self.make_pruner(),
+            load_if_exists=True
+        )
+        self._requeue_interrupted_trials(study, storage)
+        
+        finished_states = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+        n_remaining = self.n_trials - len(study.get_trials(deepcopy=False, states=finished_states))
+        print(f"Study '{self.study_name}' in {self.storage}: {max(0, n_remaining)} trials remaining")
+        
+        if n_remaining > 0 and self.n_workers == 1:
+            study.optimize(self.objective, n_trials=n_remaining)
+        elif n_remaining > 0:
+            n_workers = min(self.n_workers, n_remaining)
+            base, extra = divmod(n_remaining, n_workers)
+            core_sets = split_cores(n_workers, self.config_dict.get("n_jobs", -1))
+            ctx = mp.get_context("spawn")
+            workers = [
+                ctx.Process(
+                    target=_search_worker,
+                    args=(self, i, core_sets[i], base + (1 if i < extra else 0))
+                )
+                for i in range(n_workers)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            failed = [(i, worker.exitcode) for i, worker in enumerate(workers) if worker.exitcode != 0]
+            for i, exitcode in failed:
+                print(f"Search worker {i} exited with code {exitcode}; its remaining trials were not run")
+        
+        completed = study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+        if not completed:
+            raise RuntimeError(
+                f"No trial of study '{self.study_name}' completed; see the worker errors above. "
+                "Rerun the same command to resume the study."
+            )
+        
+        self.n_pruned = len(study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.PRUNED,)))
+        print(f"Pruned trials: {self.n_pruned}")
         
         # Get best trial
-        best_trial = study.best_trial
-        best_params = best_trial.params
-        best_value = best_trial.value
+        self.best_trial = study.best_trial
+        best_params = self.best_trial.params
+        best_value = self.best_trial.value
         
         return best_params, best_value
 
+    @staticmethod
+    def _requeue_interrupted_trials(study, storage):
+        """Mark trials left running by a crashed run as failed and retry their parameters.
+
+        Parameters already waiting or completed are not queued again. The
+        failed trial itself is ignored, so ``enqueue_trial(skip_if_exists=True)``
+        cannot be used: it would always find that trial and skip.
+        """
+        running = study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.RUNNING,))
+        known_states = (optuna.trial.TrialState.WAITING, optuna.trial.TrialState.COMPLETE)
+        known = {
+            json.dumps(trial.params, sort_keys=True)
+            for trial in study.get_trials(deepcopy=False, states=known_states)
+        }
+        n_requeued = 0
+        for trial in running:
+            storage.set_trial_state_values(trial._trial_id, state=optuna.trial.TrialState.FAIL)
+            key = json.dumps(trial.params, sort_keys=True)
+            if key not in known:
+                study.enqueue_trial(trial.params)
+                known.add(key)
+                n_requeued += 1
+        if running:
+            print(f"Marked {len(running)} interrupted trials as failed, re-queued {n_requeued}")
+
+
+def train_model(config, task_type, warm_start=None):
+    """Train a model with fixed hyperparameters.
+    
+    Args:
+        config: Configuration object
+        task_type: Type of task (segmentation, classification, etc.)
+        warm_start: Checkpoint to initialize the weights from (optional)
+        
+    Returns:
+        Tuple of (trainer, task, datamodule, checkpoint callback)
+    """
+    # Print configuration summary
+    print(f"\nExperiment: {config.experiment_name}")
+    print(f"Task type: {task_type}")
+    print(f"Model: {config.model_name}")
+    print(f"Backbone: {config.backbone_name}")
+    print(f"Batch size: {config.batch_size}")
+    print(f"Learning rate: {config.lr}")
+    print(f"Weight decay: {config.weight_decay}")
+    print(f"Max epochs: {config.max_epochs}")
+    print(f"GPUs: {config.gpu_ids}")
+    
+    # Set random seed
+    pl.seed_everything(config.seed)
+    
+    # Get model
+    model = get_model(config)
+    
+    # Get datamodule
+    datamodule = get_datamodule(config)
+    
+    # Get task
+    task = get_task(
+        task_type,
+        model,
+        loss=config.loss,
+        learning_rate=config.lr,
+        weight_decay=config.weight_decay,
+        optimizer=config.optimizer,
+        scheduler=config.scheduler,
+        scheduler_params={
+            "patience": config.patience,
+            "t_max": config.max_epochs // 10
+        },
+        num_classes=config.out_channels,
+        metrics_mode=getattr(config, "metrics_mode", "epoch"),
+        metrics_interval=getattr(config, "metrics_interval", 50),
+        optimizer_impl=getattr(config, "optimizer_impl", "default"),
+        compile=getattr(config, "compile", False),
+        compile_mode=getattr(config, "compile_mode", "default")
+    )
+    if warm_start:
+        load_warm_start(task, warm_start)
+    
+    # Pick the throughput-optimal batch size within the memory budget
+    if getattr(config, "autotune", False):
+        device = torch.device(f"cuda:{config.gpu_ids[0]}") if config.gpu_ids else torch.device("cpu")
+        batch_size, lr = autotune_batch_size(task, datamodule, config, device=device)
+        datamodule.set_batch_size(batch_size)
+        task.hparams.learning_rate = lr
+        config.batch_size, config.lr = batch_size, lr
+    
+    # Setup callbacks
+    callbacks = []
+    
+    # Checkpoint callback
+    checkpoint_callback = ModelCheckpoint(
+        dirpath=config.output_dir,
+        filename="{epoch:02d}-{val_loss:.4f}",
+        monitor="val_loss",
+        mode="min",
+        save_top_k=getattr(config, "checkpoint_top_k", 3),
+        save_last=True,
+        every_n_epochs=getattr(config, "checkpoint_every", 10)
+    )
+    callbacks.append(checkpoint_callback)
+    
+    # Rolling mid-epoch checkpoint (``resume_from_checkpoint: last`` picks the newest)
+    if getattr(config, "checkpoint_every_n_steps", None):
+        callbacks.append(ModelCheckpoint(
+            dirpath=config.output_dir,
+            filename="last-step",
+            every_n_train_steps=config.checkpoint_every_n_steps,
+            save_top_k=1,
+            enable_version_counter=False
+        ))
+    
+    # Early stopping
+    if getattr(config, "early_stop", True):
+        early_stop_callback = EarlyStopping(
+            monitor="val_loss",
+            patience=getattr(config, "early_stop_patience", 20),
+            mode="min"
+        )
+        callbacks.append(early_stop_callback)
+    
+    # Learning rate monitor
+    lr_monitor = LearningRateMonitor(logging_interval="epoch")
+    callbacks.append(lr_monitor)
+    
+    # Intermediate validations on a fixed subsample, full ones at checkpoint epochs
+    background_validation = getattr(config, "background_validation", False)
+    if getattr(config, "val_subsample", 1.0) < 1.0 or background_validation:
+        callbacks.append(ValidationSchedule(
+            full_every_n_epochs=getattr(config, "checkpoint_every", 10)
+        ))
+    
+    # Step-time breakdown (data, transfer, forward, backward, optimizer)
+    if getattr(config, "profile_step_times", False):
+        callbacks.append(StepTimeProfiler(
+            synchronize=getattr(config, "profile_synchronize", False),
+            trace_window=getattr(config, "profile_trace_window", None)
+        ))
+    
+    # Progress, latencies and memory on a local metrics endpoint and in JSONL
+    if getattr(config, "telemetry", False) or getattr(config, "telemetry_port", None) is not None:
+        callbacks.append(TelemetryCallback(
+            port=getattr(config, "telemetry_port", None),
+            jsonl_path=os.path.join(config.output_dir, "telemetry.jsonl"),
+            interval=getattr(config, "telemetry_interval", 10.0)
+        ))
+    
+    # CPU data parallelism: gloo DDP processes pinned to disjoint cores
+    num_processes = getattr(config, "num_processes", None) or 1
+    num_nodes = getattr(config, "num_nodes", None) or 1
+    cpu_ddp = not config.gpu_ids and (num_processes > 1 or num_nodes > 1)
+    if cpu_ddp:
+        callbacks.append(CoreAffinity(getattr(config, "n_jobs", -1)))
+    
+    # Setup logger
+    logger = pl_loggers.TensorBoardLogger(
+        save_dir=config.log_dir,
+        name=config.experiment_name
+    )
+    
+    # Full validation of every new last checkpoint, concurrently with training
+    if background_validation:
+        callbacks.append(BackgroundValidator(
+            config.output_dir,
+            log_dir=logger.log_dir,
+            device=getattr(config, "background_validation_device", "cpu"),
+            poll_interval=getattr(config, "background_validation_interval", 10.0)
+        ))
+    
+    # Determinism, numerics and logging cadence of the performance profile
+    profile, performance_kwargs = apply_performance_profile(config)
+    print(f"Performance profile: {profile}")
+    
+    # Setup trainer
+    trainer = pl.Trainer(
+        max_epochs=config.max_epochs,
+        accelerator="gpu" if config.gpu_ids else "cpu",
+        devices=config.gpu_ids if config.gpu_ids else (num_processes if cpu_ddp else "auto"),
+        num_nodes=num_nodes,
+        strategy=cpu_ddp_strategy(getattr(config, "rendezvous_file", None)) if cpu_ddp else "auto",
+        # The datamodule shards every split itself (resumable and validation
+        # samplers); Lightning would replace them with a DistributedSampler
+        use_distributed_sampler=False,
+        logger=logger,
+        callbacks=callbacks,
+        plugins=checkpoint_plugins(config, task_type),
+        precision=config.precision,
+        accumulate_grad_batches=getattr(config, "accumulate_grad_batches", 1),
+        reload_dataloaders_every_n_epochs=int(getattr(config, "progressive_resizing", False)),
+        val_check_interval=getattr(config, "val_check_interval", None),
+        **performance_kwargs
+    )
+    
+    # Train model
+    trainer.fit(
+        model=task,
+        datamodule=datamodule,
+        ckpt_path=getattr(config, "resume_from_checkpoint", None)
+    )
+    
+    # Print results
+    print(f"Best model path: {checkpoint_callback.best_model_path}")
+    print(f"Best validation loss: {checkpoint_callback.best_model_score}")
+    
+    # Save best model path
+    with open(os.path.join(config.output_dir, "best_model.txt"), "w") as f:
+        f.write(f"Best model path: {checkpoint_callback.best_model_path}\n")
+        f.write(f"Best validation loss: {checkpoint_callback.best_model_score}\n")
+    
+    # Optionally export an inference-only copy of the best model
+    if getattr(config, "save_slim_checkpoint", False) and checkpoint_callback.best_model_path:
+        slim_path = save_slim_checkpoint(
+            checkpoint_callback.best_model_path,
+            checkpoint_callback.best_model_path.replace(".ckpt", ".slim.ckpt")
+        )
+        print(f"Slim checkpoint: {slim_path}")
+    
+    return trainer, task, datamodule, checkpoint_callback
+
 
 def main():
     """Main training function."""
@@ -277,14 +887,25 @@ def main():
     for arg_name, arg_value in vars(args).items():
         if arg_value is not None and arg_name not in ["config", "search_mode", "n_trials", 
                                                "lr_range", "wd_range", "batch_size_range", 
-                                               "disable_tuning", "frac", "search_epochs"]:
+                                               "disable_tuning", "frac", "search_epochs",
+                                               "n_workers", "study_name", "storage",
+                                               "pruner", "pruner_warmup_epochs",
+                                               "decoded_cache_gb", "pipeline", "no_warm_start"]:
             config_dict[arg_name] = arg_value
     
     # Get task type
     task_type = config_dict.get("task_type", "base")
     
+    # Chain of artifacts produced by this run
+    manifest = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "command": sys.argv,
+        "config_file": args.config,
+    }
+    warm_start = None
+    
     # Check if running in search mode
-    if args.search_mode:
+    if args.search_mode or args.pipeline:
         if not OPTUNA_AVAILABLE:
             raise ImportError("Optuna is required for hyperparameter search. Install with: pip install optuna")
             
@@ -327,7 +948,13 @@ def main():
             n_trials=args.n_trials,
             search_epochs=args.search_epochs,
             param_ranges=param_ranges,
-            frac=args.frac
+            frac=args.frac,
+            n_workers=args.n_workers,
+            study_name=args.study_name,
+            storage=args.storage,
+            pruner=args.pruner,
+            pruner_warmup_epochs=args.pruner_warmup_epochs,
+            decoded_cache_gb=args.decoded_cache_gb
         )
         
         start_time = time.time()
@@ -348,6 +975,11 @@ def main():
             "best_score": best_score,
             "search_time": search_time,
             "n_trials": args.n_trials,
+            "n_workers": args.n_workers,
+            "pruner": args.pruner,
+            "n_pruned": search.n_pruned,
+            "study_name": search.study_name,
+            "storage": search.storage,
             "param_ranges": param_ranges
         }
         
@@ -364,8 +996,28 @@ def main():
         
         print(f"\nResults saved to: {results_file}")
         
+        best_checkpoint = search.best_trial.user_attrs.get("checkpoint_path")
+        manifest["search"] = {
+            "results_file": results_file,
+            "study_name": search.study_name,
+            "storage": search.storage,
+            "best_trial": search.best_trial.number,
+            "best_params": best_params,
+            "best_score": best_score,
+            "best_checkpoint": best_checkpoint,
+            "frac": args.frac,
+        }
+        
+        if args.pipeline:
+            # Retrain on the full data, starting from the best trial's weights
+            if not args.no_warm_start and best_checkpoint and os.path.exists(best_checkpoint):
+                warm_start = best_checkpoint
+        elif not sys.stdin.isatty():
+            print("Non-interactive session, not training. Use --pipeline to retrain automatically.")
+            return
+        
         # Ask if user wants to train with best parameters
-        while True:
+        while not args.pipeline:
             choice = input("\nDo you want to train a model with these parameters? (y/n): ").lower()
             if choice in ["y", "yes"]:
                 break
@@ -376,103 +1028,46 @@ def main():
     
     # Create config object for validation
     config = TrainerConfig(**config_dict)
+    manifest_path = os.path.join(config.output_dir, "run_manifest.json")
     
-    # Print configuration summary
-    print(f"\nExperiment: {config.experiment_name}")
-    print(f"Task type: {task_type}")
-    print(f"Model: {config.model_name}")
-    print(f"Backbone: {config.backbone_name}")
-    print(f"Batch size: {config.batch_size}")
-    print(f"Learning rate: {config.lr}")
-    print(f"Weight decay: {config.weight_decay}")
-    print(f"Max epochs: {config.max_epochs}")
-    print(f"GPUs: {config.gpu_ids}")
-    
-    # Set random seed
-    pl.seed_everything(config.seed)
-    
-    # Get model
-    model = get_model(config)
-    
-    # Get datamodule
-    datamodule = get_datamodule(task_type, config)
-    
-    # Get task
-    task = get_task(
-        task_type,
-        model,
-        loss=config.loss,
-        learning_rate=config.lr,
-        weight_decay=config.weight_decay,
-        optimizer=config.optimizer,
-        scheduler=config.scheduler,
-        scheduler_params={
-            "patience": config.patience,
-            "t_max": config.max_epochs // 10
-        }
-    )
+    trainer, task, datamodule, checkpoint_callback = train_model(config, task_type, warm_start)
+    manifest["config"] = config.model_dump()
+    manifest["train"] = {
+        "experiment_name": config.experiment_name,
+        "warm_start": warm_start,
+        "best_model_path": checkpoint_callback.best_model_path,
+        "best_model_score": checkpoint_callback.best_model_score,
+        "last_model_path": checkpoint_callback.last_model_path,
+        "slim_model_path": (
+            checkpoint_callback.best_model_path.replace(".ckpt", ".slim.ckpt")
+            if getattr(config, "save_slim_checkpoint", False) and checkpoint_callback.best_model_path
+            else None
+        ),
+        "log_dir": trainer.log_dir,
+        "performance_profile": resolve_performance_profile(config),
+    }
+    write_manifest(manifest_path, manifest)
     
-    # Setup callbacks
-    callbacks = []
-    
-    # Checkpoint callback
-    checkpoint_callback = ModelCheckpoint(
-        dirpath=config.output_dir,
-        filename="{epoch:02d}-{val_loss:.4f}",
-        monitor="val_loss",
-        mode="min",
-        save_top_k=3,
-        save_last=True,
-        every_n_epochs=getattr(config, "checkpoint_every", 10)
-    )
-    callbacks.append(checkpoint_callback)
-    
-    # Early stopping
-    if getattr(config, "early_stop", True):
-        early_stop_callback = EarlyStopping(
-            monitor="val_loss",
-            patience=getattr(config, "early_stop_patience", 20),
-            mode="min"
+    if args.pipeline:
+        # Evaluate the best checkpoint of the retrained model (or the final weights)
+        eval_dir = os.path.join(config.output_dir, "evaluation")
+        eval_checkpoint = checkpoint_callback.best_model_path or None
+        results = evaluate_task(
+            task,
+            datamodule,
+            eval_dir,
+            trainer=trainer,
+            ckpt_path=eval_checkpoint,
+            with_predictions=True
         )
-        callbacks.append(early_stop_callback)
-    
-    # Learning rate monitor
-    lr_monitor = LearningRateMonitor(logging_interval="epoch")
-    callbacks.append(lr_monitor)
-    
-    # Setup logger
-    logger = pl_loggers.TensorBoardLogger(
-        save_dir=config.log_dir,
-        name=config.experiment_name
-    )
-    
-    # Setup trainer
-    trainer = pl.Trainer(
-        max_epochs=config.max_epochs,
-        accelerator="gpu" if config.gpu_ids else "cpu",
-        devices=config.gpu_ids if config.gpu_ids else None,
-        logger=logger,
-        callbacks=callbacks,
-        deterministic=True,
-        precision=config.precision
-    )
-    
-    # Train model
-    trainer.fit(
-        model=task,
-        datamodule=datamodule,
-        ckpt_path=getattr(config, "resume_from_checkpoint", None)
-    )
-    
-    # Print results
-    print(f"Best model path: {checkpoint_callback.best_model_path}")
-    print(f"Best validation loss: {checkpoint_callback.best_model_score}")
+        manifest["evaluate"] = {
+            "output_dir": eval_dir,
+            "checkpoint": eval_checkpoint or checkpoint_callback.last_model_path,
+            "results": results,
+        }
+        write_manifest(manifest_path, manifest)
     
-    # Save best model path
-    with open(os.path.join(config.output_dir, "best_model.txt"), "w") as f:
-        f.write(f"Best model path: {checkpoint_callback.best_model_path}\n")
-        f.write(f"Best validation loss: {checkpoint_callback.best_model_score}\n")
-
+    print(f"Run manifest saved to {manifest_path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+"""Tests for the incremental data acquisition in `scripts/acquire.py`."""
+
+import csv
+import importlib.util
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+ACQUIRE_PATH = Path(__file__).resolve().parent.parent / "scripts" / "acquire.py"
+_spec = importlib.util.spec_from_file_location("acquire", ACQUIRE_PATH)
+acquire = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(acquire)
+
+
+class TestAcquire(unittest.TestCase):
+    """Acquire from a local directory standing in for the remote source."""
+
+    def setUp(self):
+        """Create a source directory with a few items."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.source = self.root / "source"
+        self.output = self.root / "output"
+        (self.source / "sub").mkdir(parents=True)
+        self.write_source("a.jpg", b"first image")
+        self.write_source("sub/b.png", b"second image")
+        self.write_source("notes.txt", b"not an image")
+
+    def tearDown(self):
+        """Remove the temporary directories."""
+        self._tmp.cleanup()
+
+    def write_source(self, rel_path, content):
+        """Write a source item, moving its mtime forward so changes are always seen."""
+        path = self.source / rel_path
+        previous_mtime_ns = path.stat().st_mtime_ns if path.exists() else 0
+        path.write_bytes(content)
+        mtime_ns = max(path.stat().st_mtime_ns, previous_mtime_ns + 1_000_000_000)
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def sync(self, **kwargs):
+        """Sync the source into the output directory."""
+        return acquire.sync(str(self.source), str(self.output), num_workers=2, **kwargs)
+
+    def output_mtimes(self):
+        """Get the modification time of every acquired file."""
+        data_dir = self.output / acquire.DATA_DIR_NAME
+        return {
+            path.relative_to(data_dir).as_posix(): path.stat().st_mtime_ns
+            for path in data_dir.rglob("*") if path.is_file()
+        }
+
+    def test_first_run_fetches_everything(self):
+        """All matching items are copied, verified and indexed."""
+        stats = self.sync()
+        self.assertEqual(stats["fetched"], 2)
+        self.assertEqual(stats["failed"], 0)
+        self.assertEqual(sorted(self.output_mtimes()), ["a.jpg", "sub/b.png"])
+        self.assertEqual((self.output / "data" / "a.jpg").read_bytes(), b"first image")
+
+    def test_rerun_only_fetches_changed_items(self):
+        """Unchanged items are skipped; changed and new items are re-fetched."""
+        self.sync()
+        before = self.output_mtimes()
+
+        stats = self.sync()
+        self.assertEqual(stats["fetched"], 0)
+        self.assertEqual(stats["skipped"], 2)
+        self.assertEqual(self.output_mtimes(), before)
+
+        self.write_source("a.jpg", b"first image, updated")
+        self.write_source("sub/c.jpg", b"third image")
+        stats = self.sync()
+        self.assertEqual(stats["fetched"], 2)
+        self.assertEqual(stats["skipped"], 1)
+
+        after = self.output_mtimes()
+        self.assertEqual(after["sub/b.png"], before["sub/b.png"])
+        self.assertIn("sub/c.jpg", after)
+        self.assertEqual((self.output / "data" / "a.jpg").read_bytes(), b"first image, updated")
+
+    def test_index_is_relocatable(self):
+        """The index stores paths relative to itself, so the output can be moved."""
+        self.sync()
+        moved = self.root / "moved"
+        self.output.rename(moved)
+        with open(moved / acquire.INDEX_NAME, newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 2)
+        for row in rows:
+            self.assertFalse(os.path.isabs(row["image_path"]))
+            self.assertTrue((moved / row["image_path"]).is_file())
+
+    def test_transcoding_collision_fails(self):
+        """Items that would transcode to the same output path are rejected."""
+        self.write_source("sub/b.jpg", b"same stem as sub/b.png")
+        with self.assertRaises(ValueError):
+            self.sync(fmt="webp")
+        self.assertFalse((self.output / acquire.MANIFEST_NAME).exists())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+"""Tests for `{{ cookiecutter.project_slug }}.autotune`."""
+
+import unittest
+from unittest import mock
+
+import torch
+import torch.nn as nn
+
+from {{ cookiecutter.project_slug }} import autotune
+
+GB = 1024 ** 3
+
+
+class FakeTask(nn.Module):
+    """Task that runs out of memory (or fails otherwise) above a batch size."""
+
+    def __init__(self, max_batch_size, error=RuntimeError("DefaultCPUAllocator: can't allocate memory")):
+        super().__init__()
+        self.layer = nn.Linear(4, 1)
+        self.max_batch_size = max_batch_size
+        self.error = error
+        self.loss_fn = nn.MSELoss()
+
+    def forward(self, x):
+        if len(x) > self.max_batch_size:
+            raise self.error
+        return self.layer(x)
+
+    def configure_optimizers(self):
+        return torch.optim.SGD(self.parameters(), lr=0.1)
+
+    def prepare_target(self, target):
+        return target
+
+
+SAMPLES = [{"image": torch.randn(4), "target": torch.randn(1)} for _ in range(4)]
+CPU = torch.device("cpu")
+
+
+class TestBatchSizeSearch(unittest.TestCase):
+    """Out-of-memory batch sizes are backed off, other errors are raised."""
+
+    def measure(self, task):
+        """Measure ``task`` with the real probe, but without a memory limit."""
+        return lambda batch_size: autotune.measure_batch_size(
+            task, SAMPLES, batch_size, CPU, steps=1, warmup_steps=0
+        )
+
+    def test_out_of_memory_backs_off(self):
+        """The search settles below the first batch size that runs out of memory."""
+        fits = autotune.search_batch_size(self.measure(FakeTask(20)), budget=1 << 62, max_batch_size=256)
+        self.assertEqual(max(fits), 20)
+        self.assertTrue(all(batch_size <= 20 for batch_size in fits))
+
+    def test_out_of_memory_measures_none(self):
+        """A probe that runs out of memory is reported as not fitting."""
+        self.assertIsNone(self.measure(FakeTask(2))(4))
+        self.assertIsNone(self.measure(FakeTask(2, MemoryError()))(4))
+
+    def test_other_errors_propagate(self):
+        """Errors that are not out-of-memory errors are not mistaken for one."""
+        task = FakeTask(2, RuntimeError("mat1 and mat2 shapes cannot be multiplied"))
+        with self.assertRaises(RuntimeError):
+            autotune.search_batch_size(self.measure(task), budget=1 << 62, max_batch_size=16)
+
+    def test_budget_bounds_the_search(self):
+        """Batch sizes whose peak memory exceeds the budget do not fit."""
+        fits = autotune.search_batch_size(lambda batch_size: (1.0, batch_size * 100), budget=1000, max_batch_size=64)
+        self.assertEqual(max(fits), 10)
+
+
+class TestOutOfMemoryMatching(unittest.TestCase):
+    """Out-of-memory errors are recognized by type or allocator message."""
+
+    def test_messages(self):
+        """Allocator messages of every backend count as out of memory."""
+        for message in autotune.OUT_OF_MEMORY_MESSAGES:
+            with self.subTest(message=message):
+                self.assertTrue(autotune._is_out_of_memory(RuntimeError(f"{message} (tried 2 GiB)")))
+
+    def test_types(self):
+        """MemoryError and CUDA OutOfMemoryError count as out of memory."""
+        self.assertTrue(autotune._is_out_of_memory(MemoryError()))
+        self.assertTrue(autotune._is_out_of_memory(torch.cuda.OutOfMemoryError("CUDA out of memory")))
+
+    def test_other_errors(self):
+        """Other RuntimeErrors and non-RuntimeErrors do not."""
+        self.assertFalse(autotune._is_out_of_memory(RuntimeError("expected scalar type Float")))
+        self.assertFalse(autotune._is_out_of_memory(ValueError("CUDA out of memory")))
+
+
+class TestMemoryBudget(unittest.TestCase):
+    """The CPU budget follows available memory and cgroup limits."""
+
+    def patch_memory(self, meminfo, cgroup=None, rss=0):
+        """Patch /proc and cgroup reads with the given values (in bytes)."""
+        proc = {"MemAvailable": meminfo, "VmRSS": rss}
+        cgroup = cgroup or {}
+        for patcher in (
+            mock.patch.object(autotune, "_read_proc_value", lambda path, field: proc.get(field)),
+            mock.patch.object(autotune, "_read_int", lambda path: cgroup.get(path)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_available_memory_without_cgroup_limit(self):
+        """Without a cgroup limit, MemAvailable is used."""
+        self.patch_memory(meminfo=16 * GB)
+        self.assertEqual(autotune.available_memory(), 16 * GB)
+
+    def test_cgroup_v2_headroom_caps_available_memory(self):
+        """A cgroup v2 limit caps available memory at its headroom."""
+        self.patch_memory(meminfo=16 * GB, cgroup={
+            "/sys/fs/cgroup/memory.max": 8 * GB, "/sys/fs/cgroup/memory.current": 6 * GB
+        })
+        self.assertEqual(autotune.available_memory(), 2 * GB)
+
+    def test_cgroup_v1_unlimited_is_ignored(self):
+        """The huge cgroup v1 "no limit" value does not count as a limit."""
+        self.patch_memory(meminfo=16 * GB, cgroup={
+            "/sys/fs/cgroup/memory/memory.limit_in_bytes": (1 << 63) - 1,
+            "/sys/fs/cgroup/memory/memory.usage_in_bytes": GB,
+        })
+        self.assertEqual(autotune.available_memory(), 16 * GB)
+
+    def test_budget_adds_a_fraction_of_free_memory_to_current_use(self):
+        """Current use plus the fraction of available memory, floored to whole GB."""
+        self.patch_memory(meminfo=10 * GB, rss=GB + 123)
+        self.assertEqual(autotune.memory_budget(CPU, fraction=0.5), 6 * GB)
+
+    def test_small_budgets_are_not_floored_to_zero(self):
+        """Budgets below 1 GB are kept as they are."""
+        self.patch_memory(meminfo=GB // 2, rss=0)
+        self.assertEqual(autotune.memory_budget(CPU, fraction=0.5), GB // 4)
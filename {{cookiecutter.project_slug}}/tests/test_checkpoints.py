@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+"""Tests for `{{ cookiecutter.project_slug }}.checkpoints`."""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import torch
+
+from {{ cookiecutter.project_slug }} import checkpoints
+from {{ cookiecutter.project_slug }}.checkpoints import (
+    BackgroundCheckpointIO,
+    read_hparams,
+    run_hparams,
+    save_hparams,
+    sidecar_path,
+)
+from {{ cookiecutter.project_slug }}.config import TrainerConfig
+
+
+def make_checkpoint(learning_rate):
+    """Get a small Lightning-style checkpoint."""
+    return {
+        "state_dict": {"weight": torch.full((4,), learning_rate)},
+        "hyper_parameters": {"learning_rate": learning_rate, "loss": "mse"},
+    }
+
+
+class TestHparamsSidecar(unittest.TestCase):
+    """Every checkpoint has its own sidecar, checked against the checkpoint."""
+
+    def setUp(self):
+        """Create a checkpoint directory shared by two runs."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self._tmp.cleanup()
+
+    def config(self, name):
+        """Get the config of a run writing to the shared directory."""
+        return TrainerConfig(experiment_name=name, output_dir=self.root, log_dir=os.path.join(self.root, "logs"))
+
+    def save(self, name, learning_rate, background=False):
+        """Save a checkpoint of run ``name`` through the checkpoint IO plugin."""
+        path = os.path.join(self.root, f"{name}.ckpt")
+        io = BackgroundCheckpointIO(background=background, hparams=run_hparams(self.config(name), "base"))
+        io.save_checkpoint(make_checkpoint(learning_rate), path)
+        io.teardown()
+        return path
+
+    def test_runs_sharing_a_directory_keep_their_sidecars(self):
+        """Checkpoints of two runs in one directory read back their own config."""
+        first, second = self.save("first", 0.1), self.save("second", 0.2, background=True)
+        for path, name, learning_rate in ((first, "first", 0.1), (second, "second", 0.2)):
+            hparams = read_hparams(path)
+            self.assertEqual(hparams["config"]["experiment_name"], name)
+            self.assertEqual(hparams["task_type"], "base")
+            self.assertEqual(hparams["task"]["learning_rate"], learning_rate)
+
+    def test_sidecar_is_removed_with_its_checkpoint(self):
+        """Removing a checkpoint also removes its sidecar."""
+        path = self.save("first", 0.1)
+        io = BackgroundCheckpointIO(background=False)
+        io.remove_checkpoint(path)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(sidecar_path(path)))
+
+    def test_mismatching_sidecar_is_ignored(self):
+        """A sidecar of another checkpoint is not trusted."""
+        path = self.save("first", 0.1)
+        with open(sidecar_path(path)) as f:
+            sidecar = json.load(f)
+        save_hparams(path, {**sidecar, "task": {"learning_rate": 0.5, "loss": "mse"}})
+        with self.assertWarns(UserWarning):
+            hparams = read_hparams(path)
+        self.assertNotIn("config", hparams)
+        self.assertEqual(hparams["task"]["learning_rate"], 0.1)
+
+    def test_without_sidecar(self):
+        """Without a sidecar, the task hyperparameters come from the checkpoint."""
+        path = os.path.join(self.root, "plain.ckpt")
+        torch.save(make_checkpoint(0.3), path)
+        self.assertEqual(read_hparams(path), {"task": {"learning_rate": 0.3, "loss": "mse"}})
+
+
+class TestBackgroundCheckpointIO(unittest.TestCase):
+    """Saving returns while the writer thread is busy; teardown flushes it."""
+
+    def setUp(self):
+        """Make checkpoint writes wait until ``self.release`` is set."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+        self.release = threading.Event()
+        write = checkpoints._atomic_torch_save
+
+        def slow_write(obj, path):
+            self.release.wait(timeout=30)
+            write(obj, path)
+
+        patcher = mock.patch.object(checkpoints, "_atomic_torch_save", slow_write)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.release.set()
+        self._tmp.cleanup()
+
+    def test_epoch_saves_do_not_wait_for_writes(self):
+        """A top-k and a last checkpoint are both queued without waiting for the writer."""
+        io = BackgroundCheckpointIO()
+        paths = [os.path.join(self.root, name) for name in ("epoch=01.ckpt", "last.ckpt")]
+        start = time.perf_counter()
+        for path in paths:
+            io.save_checkpoint(make_checkpoint(0.1), path)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+        self.release.set()
+        io.teardown()
+        for path in paths:
+            self.assertEqual(torch.load(path, weights_only=True)["hyper_parameters"]["learning_rate"], 0.1)
+
+    def test_snapshot_is_taken_at_save_time(self):
+        """Changing the weights after saving does not change the written checkpoint."""
+        io = BackgroundCheckpointIO()
+        checkpoint = make_checkpoint(0.1)
+        path = os.path.join(self.root, "last.ckpt")
+        io.save_checkpoint(checkpoint, path)
+        checkpoint["state_dict"]["weight"].fill_(7.0)
+        self.release.set()
+        io.teardown()
+        self.assertTrue(torch.equal(torch.load(path, weights_only=True)["state_dict"]["weight"], torch.full((4,), 0.1)))
+
+    def test_saving_waits_beyond_max_pending(self):
+        """Only ``max_pending`` snapshots are held in memory."""
+        io = BackgroundCheckpointIO(max_pending=1)
+        io.save_checkpoint(make_checkpoint(0.1), os.path.join(self.root, "a.ckpt"))
+        second = threading.Thread(
+            target=io.save_checkpoint, args=(make_checkpoint(0.2), os.path.join(self.root, "b.ckpt"))
+        )
+        second.start()
+        second.join(timeout=0.5)
+        self.assertTrue(second.is_alive())
+        self.release.set()
+        second.join(timeout=30)
+        io.teardown()
+        self.assertTrue(os.path.exists(os.path.join(self.root, "b.ckpt")))
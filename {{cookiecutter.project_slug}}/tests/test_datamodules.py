@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+
+"""Tests for `{{ cookiecutter.project_slug }}.datamodules`."""
+
+import csv
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import torch
+import torch.distributed as dist
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset, Subset
+
+from {{ cookiecutter.project_slug }} import datamodules
+from {{ cookiecutter.project_slug }}.datamodules import BaseDataModule
+from {{ cookiecutter.project_slug }}.datasets import stack_samples
+
+
+def subset_paths(dataset):
+    """Get the image paths of (nested) ``Subset``s of a BaseImageDataset."""
+    indices = range(len(dataset))
+    while isinstance(dataset, Subset):
+        indices = [dataset.indices[i] for i in indices]
+        dataset = dataset.dataset
+    return [dataset.image_paths[i] for i in indices]
+
+
+class TestIndexSplits(unittest.TestCase):
+    """Splits come from the CSV index when it has a ``split`` column."""
+
+    def setUp(self):
+        """Write an index with train, val and test rows."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+        self.splits = ["train"] * 6 + ["val"] * 2 + ["test"] * 2
+        with open(os.path.join(self.root, "index.csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["image_path", "split"])
+            for i, split in enumerate(self.splits):
+                writer.writerow([f"data/{i:02d}.png", split])
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self._tmp.cleanup()
+
+    def expected(self, split):
+        """Get the absolute paths of the rows of a split."""
+        return [
+            os.path.join(self.root, f"data/{i:02d}.png") for i, s in enumerate(self.splits) if s == split
+        ]
+
+    def test_splits_follow_the_index(self):
+        """Train, val and test hold exactly the rows of their split."""
+        datamodule = BaseDataModule(SimpleNamespace(input_dirs=[self.root], val_ratio=0.5))
+        datamodule.setup()
+        self.assertEqual(subset_paths(datamodule.train_dataset), self.expected("train"))
+        self.assertEqual(subset_paths(datamodule.val_dataset), self.expected("val"))
+        self.assertEqual(subset_paths(datamodule.test_dataset), self.expected("test"))
+
+    def test_test_rows_never_reach_training_with_frac(self):
+        """Subsampling keeps test rows out of the training and validation splits."""
+        datamodule = BaseDataModule(SimpleNamespace(input_dirs=[self.root], frac=0.5))
+        datamodule.setup("fit")
+        self.assertTrue(set(subset_paths(datamodule.train_dataset)) <= set(self.expected("train")))
+        self.assertTrue(set(subset_paths(datamodule.val_dataset)) <= set(self.expected("val")))
+
+    def test_test_stage_without_splits_uses_all_data(self):
+        """Without a split column and a training split, testing covers the whole data."""
+        for i in range(4):
+            open(os.path.join(self.root, f"{i}.png"), "wb").close()
+        os.remove(os.path.join(self.root, "index.csv"))
+        datamodule = BaseDataModule(SimpleNamespace(input_dirs=[self.root]))
+        datamodule.setup("test")
+        self.assertEqual(len(datamodule.test_dataset), 4)
+
+
+class TestDecodedImageCache(unittest.TestCase):
+    """The decoded cache holds the training subsample and is filled by workers."""
+
+    def setUp(self):
+        """Write a directory of small images of different sizes."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+        rng = np.random.default_rng(0)
+        for i in range(8):
+            pixels = rng.integers(0, 256, (10 + i, 12, 3), dtype=np.uint8)
+            Image.fromarray(pixels).save(os.path.join(self.root, f"{i}.png"))
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self._tmp.cleanup()
+
+    def test_no_image_is_opened_up_front(self):
+        """Building the cache reads no image, so unreadable files only fail when loaded."""
+        for i in range(8):
+            open(os.path.join(self.root, f"{i}.png"), "wb").close()
+        datamodule = BaseDataModule(SimpleNamespace(input_dirs=[self.root], decoded_cache_gb=0.01))
+        datamodule.setup("fit")
+        self.assertEqual(len(datamodule.decoded_cache.indices), 8)
+
+    def test_cache_holds_the_subsample(self):
+        """Only the ``frac`` subsample gets slots, and workers fill them for later epochs."""
+        config = SimpleNamespace(input_dirs=[self.root], frac=0.5, decoded_cache_gb=0.01, image_size=(8, 8))
+        datamodule = BaseDataModule(config)
+        datamodule.setup("fit")
+        cache = datamodule.decoded_cache
+        self.assertEqual(cache.indices.tolist(), datamodule._subsample)
+
+        # Validation transforms are deterministic
+        dataset = datamodule.val_dataset.dataset.dataset
+        subsample = Subset(dataset, datamodule._subsample)
+        epochs = []
+        for _ in range(2):
+            loader = DataLoader(subsample, batch_size=2, num_workers=2, collate_fn=stack_samples)
+            epochs.append(torch.cat([batch["image"] for batch in loader]))
+        self.assertTrue(cache.filled.all())
+        self.assertTrue(torch.equal(epochs[0], epochs[1]))
+        self.assertEqual(int(cache.end), sum((10 + i) * 12 * 3 for i in datamodule._subsample))
+
+
+class IndexDataset(Dataset):
+    """Dataset whose samples are their own index."""
+
+    def __len__(self):
+        return 22
+
+    def __getitem__(self, idx):
+        image = torch.full((1, 2, 2), float(idx))
+        return {"image": image, "target": image, "path": str(idx)}
+
+
+class IndexDataModule(BaseDataModule):
+    """Datamodule serving ``IndexDataset`` instead of files."""
+
+    def _get_dataset(self, transforms):
+        return IndexDataset()
+
+
+class TestResumableSampler(unittest.TestCase):
+    """A mid-epoch checkpoint resumes at the first batch not trained on."""
+
+    def train_paths(self, rank=0, world_size=1, batch_size=4, stop_after=None, state=None, **config):
+        """Iterate one training epoch, optionally stopping and saving the state.
+
+        Returns:
+            Tuple of (paths of each batch, saved datamodule state or None)
+        """
+        patches = [
+            mock.patch.object(dist, "is_initialized", return_value=world_size > 1),
+            mock.patch.object(dist, "get_world_size", return_value=world_size),
+            mock.patch.object(dist, "get_rank", return_value=rank),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        datamodule = IndexDataModule(
+            SimpleNamespace(batch_size=batch_size, num_workers=0, val_ratio=0.0, seed=3, **config)
+        )
+        datamodule.setup("fit")
+        progress = SimpleNamespace(processed=0)
+        datamodule.trainer = SimpleNamespace(
+            fit_loop=SimpleNamespace(epoch_loop=SimpleNamespace(batch_progress=SimpleNamespace(current=progress)))
+        )
+        epoch = 1
+        if state is not None:
+            datamodule.load_state_dict(state)
+            epoch = state["train_sampler"]["epoch"]
+        loader = datamodule.train_dataloader()
+        # As Lightning does at the start of every epoch
+        loader.batch_sampler.sampler.set_epoch(epoch)
+
+        batches = []
+        for batch in loader:
+            batches.append(list(batch["path"]))
+            progress.processed += 1
+            if len(batches) == stop_after:
+                return batches, datamodule.state_dict()
+        return batches, None
+
+    def assert_resumes(self, stop_after, **kwargs):
+        """The batches before the checkpoint and after the resume form the uninterrupted epoch."""
+        full, _ = self.train_paths(**kwargs)
+        head, state = self.train_paths(stop_after=stop_after, **kwargs)
+        tail, _ = self.train_paths(state=state, **kwargs)
+        self.assertEqual(head, full[:stop_after])
+        self.assertEqual(tail, full[stop_after:])
+        return full
+
+    def test_resume_mid_epoch(self):
+        """Resuming after two batches yields exactly the remaining ones."""
+        full = self.assert_resumes(stop_after=2)
+        self.assertEqual(sorted(int(path) for batch in full for path in batch), list(range(22)))
+
+    def test_resume_before_a_smaller_last_batch(self):
+        """The last, smaller batch is resumed whole."""
+        full = self.assert_resumes(stop_after=5, batch_size=4)
+        self.assertEqual([len(batch) for batch in full], [4, 4, 4, 4, 4, 2])
+
+    def test_resume_with_reused_dataloaders(self):
+        """Batch samplers of reused dataloaders resume the same way."""
+        self.assert_resumes(stop_after=3, reuse_dataloaders=True)
+
+    def test_resume_on_each_rank(self):
+        """Under data-parallel training every rank resumes its own shard."""
+        shards = []
+        for rank in range(2):
+            full = self.assert_resumes(stop_after=2, rank=rank, world_size=2, batch_size=4)
+            self.assertEqual([len(batch) for batch in full], [4, 4, 3])
+            shards.append({path for batch in full for path in batch})
+        self.assertFalse(shards[0] & shards[1])
+        self.assertEqual(len(shards[0] | shards[1]), 22)
+
+    def test_checkpoint_at_epoch_end_resumes_next_epoch(self):
+        """A checkpoint after the last batch resumes at the start of the next epoch."""
+        head, state = self.train_paths(stop_after=6)
+        self.assertEqual(state["train_sampler"]["epoch"], 2)
+        self.assertEqual(state["train_sampler"]["position"], 0)
+        tail, _ = self.train_paths(state=state)
+        self.assertEqual(len(tail), 6)
+        self.assertNotEqual(tail, head)
+
+
+class TestProgressiveResizing(unittest.TestCase):
+    """Resizing rebuilds the transforms only; inputs and splits are kept."""
+
+    def setUp(self):
+        """Write images, masks and their CSV index."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+        rng = np.random.default_rng(0)
+        with open(os.path.join(self.root, "index.csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["image_path", "target_path"])
+            for i in range(10):
+                image, mask = f"{i}.png", f"{i}_mask.png"
+                Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)).save(os.path.join(self.root, image))
+                Image.fromarray(rng.integers(0, 2, (64, 64), dtype=np.uint8) * 255).save(os.path.join(self.root, mask))
+                writer.writerow([image, mask])
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self._tmp.cleanup()
+
+    def test_resize_keeps_inputs_and_splits(self):
+        """A new epoch size changes the batch shape without rescanning or re-splitting."""
+        config = SimpleNamespace(
+            input_dirs=[self.root], image_size=(64, 64), batch_size=10, num_workers=0, val_ratio=0.2, seed=3,
+            progressive_resizing=True, resize_ramp_epochs=2, resize_multiple=16,
+        )
+        datamodule = BaseDataModule(config)
+        datamodule.trainer = SimpleNamespace(current_epoch=0)
+        with mock.patch.object(datamodules, "get_dataset", wraps=datamodules.get_dataset) as scan, \
+                mock.patch.object(datamodules, "random_split", wraps=datamodules.random_split) as split:
+            datamodule.setup("fit")
+            train_dataset = datamodule.train_dataset
+            paths = subset_paths(train_dataset)
+
+            shapes = []
+            for epoch in range(3):
+                datamodule.trainer.current_epoch = epoch
+                batch = next(iter(datamodule.train_dataloader()))
+                shapes.append((tuple(batch["image"].shape[-2:]), tuple(batch["target"].shape[-2:])))
+                self.assertIs(datamodule.train_dataset, train_dataset)
+                self.assertEqual(subset_paths(datamodule.train_dataset), paths)
+
+        self.assertEqual(scan.call_count, 1)
+        self.assertEqual(split.call_count, 1)
+        self.assertEqual(shapes, [((32, 32), (32, 32)), ((48, 48), (48, 48)), ((64, 64), (64, 64))])
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+"""Tests for `{{ cookiecutter.project_slug }}.datasets`."""
+
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+import torchvision.transforms as transforms_v1
+import torchvision.transforms.v2 as T
+from PIL import Image
+from torch.utils.data import DataLoader
+
+from {{ cookiecutter.project_slug }}.datasets import BaseImageDataset, PathTable, stack_samples
+from {{ cookiecutter.project_slug }}.trainers import get_task
+
+PATHS = [
+    "/data/train/0001.png",
+    "/data/train/0002.png",
+    "/data/répertoire/é.png",
+    "/data/画像/猫.jpg",
+    "/data/train/emoji_🐱.png",
+    "relative.png",
+    "/data/train/0003.png",
+    os.fsdecode(b"/data/raw/\xff\xfe.png"),
+]
+
+
+class TestPathTable(unittest.TestCase):
+    """A PathTable reads back the paths it was built from."""
+
+    def test_round_trip(self):
+        """Non-ASCII and undecodable paths read back unchanged, with and without shared prefixes."""
+        for share_prefixes in (True, False):
+            with self.subTest(share_prefixes=share_prefixes):
+                table = PathTable(PATHS, share_prefixes=share_prefixes)
+                self.assertEqual(len(table), len(PATHS))
+                self.assertEqual(list(table), PATHS)
+
+    def test_shared_prefixes_are_stored_once(self):
+        """Each directory is stored once."""
+        table = PathTable(PATHS)
+        self.assertEqual(len(table._directory_offsets) - 1, len({os.path.dirname(p) for p in PATHS}))
+        self.assertLess(table.nbytes, PathTable(PATHS, share_prefixes=False).nbytes)
+
+    def test_empty(self):
+        """An empty table has no entries."""
+        for share_prefixes in (True, False):
+            with self.subTest(share_prefixes=share_prefixes):
+                table = PathTable(iter([]), share_prefixes=share_prefixes)
+                self.assertEqual(len(table), 0)
+                self.assertEqual(list(table), [])
+                self.assertEqual(table[:], [])
+                with self.assertRaises(IndexError):
+                    table[0]
+
+    def test_indexing_and_slicing(self):
+        """Negative indices, NumPy integers and slices behave as on a list."""
+        table = PathTable(PATHS)
+        self.assertEqual(table[-1], PATHS[-1])
+        self.assertEqual(table[-len(PATHS)], PATHS[0])
+        for idx in (len(PATHS), -len(PATHS) - 1):
+            with self.assertRaises(IndexError):
+                table[idx]
+        for s in (slice(2, 5), slice(None, None, -1), slice(1, None, 3), slice(-3, None), slice(5, 2)):
+            self.assertEqual(table[s], PATHS[s])
+        self.assertEqual(table.index(PATHS[3]), 3)
+        self.assertIn(PATHS[4], table)
+
+    def test_pickle(self):
+        """Pickled tables read back the same paths and digest."""
+        table = PathTable(PATHS)
+        copy = pickle.loads(pickle.dumps(table))
+        self.assertEqual(list(copy), PATHS)
+        self.assertEqual(copy.digest(), table.digest())
+
+    def test_spawn_workers(self):
+        """DataLoader workers started with ``spawn`` read the same paths."""
+        loader = DataLoader(
+            PathTable(PATHS), batch_size=None, num_workers=2, multiprocessing_context="spawn"
+        )
+        self.assertEqual(list(loader), PATHS)
+
+
+def blocky_mask(seed, size=64, block=8, classes=2):
+    """Get a mask of random ``block``-sized squares of class values."""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, classes, (size // block, size // block), dtype=np.uint8)
+    return np.kron(blocks, np.ones((block, block), dtype=np.uint8))
+
+
+class TestJointTransforms(unittest.TestCase):
+    """Images and masks go through the same random transforms."""
+
+    def setUp(self):
+        """Write images whose first channel is their binary mask."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+        self.image_paths, self.target_paths = [], []
+        for i in range(4):
+            mask = blocky_mask(i) * 255
+            rng = np.random.default_rng(100 + i)
+            pixels = np.stack([mask, *rng.integers(0, 256, (2,) + mask.shape, dtype=np.uint8)], axis=-1)
+            self.image_paths.append(os.path.join(self.root, f"{i}.png"))
+            self.target_paths.append(os.path.join(self.root, f"{i}_mask.png"))
+            Image.fromarray(pixels).save(self.image_paths[-1])
+            Image.fromarray(mask).save(self.target_paths[-1])
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self._tmp.cleanup()
+
+    def dataset(self, transforms):
+        """Get a dataset of the images and masks."""
+        return BaseImageDataset(self.image_paths, self.target_paths, transforms=transforms, image_size=(32, 32))
+
+    def assert_moves_together(self, dataset):
+        """Over several draws, the mask follows the first image channel and the transforms vary."""
+        torch.manual_seed(0)
+        targets = set()
+        for _ in range(10):
+            for idx in range(len(dataset)):
+                sample = dataset[idx]
+                self.assertEqual(sample["target"].dtype, torch.uint8)
+                self.assertEqual(tuple(sample["target"].shape), (1, 32, 32))
+                self.assertTrue(torch.equal(sample["image"][:1], sample["target"]))
+                if idx == 0:
+                    targets.add(sample["target"].numpy().tobytes())
+        self.assertGreater(len(targets), 1)
+
+    def test_flip_and_crop(self):
+        """A random flip and crop cut the same window of image and mask."""
+        self.assert_moves_together(self.dataset(T.Compose([
+            T.RandomHorizontalFlip(), T.RandomVerticalFlip(), T.RandomCrop(32), T.ToImage()
+        ])))
+
+    def test_random_resized_crop(self):
+        """Masks are resized with nearest neighbors, like the (tensor) image here."""
+        self.assert_moves_together(self.dataset(T.Compose([
+            T.ToImage(),
+            T.RandomResizedCrop(32, scale=(0.3, 1.0), interpolation=T.InterpolationMode.NEAREST),
+            T.RandomHorizontalFlip(),
+        ])))
+
+    def test_masks_skip_color_and_dtype_transforms(self):
+        """Color jitter, dtype conversion and normalization leave the mask as uint8 class values."""
+        dataset = self.dataset(T.Compose([
+            T.Resize(32, interpolation=T.InterpolationMode.NEAREST),
+            T.ColorJitter(brightness=0.5),
+            T.ToImage(),
+            T.ToDtype(torch.float32, scale=True),
+            T.Normalize(mean=[0.5] * 3, std=[0.5] * 3),
+        ]))
+        target = dataset[0]["target"]
+        self.assertEqual(target.dtype, torch.uint8)
+        self.assertTrue(torch.equal(target[0], torch.from_numpy(blocky_mask(0)[::2, ::2] * 255)))
+
+    def test_with_transforms_shares_paths(self):
+        """``with_transforms`` keeps the path tables and applies only the new transforms."""
+        dataset = self.dataset(T.Compose([T.RandomCrop(32), T.ToImage()]))
+        resized = dataset.with_transforms(
+            T.Compose([T.Resize(16, interpolation=T.InterpolationMode.NEAREST), T.ToImage()])
+        )
+        self.assertIs(resized.image_paths, dataset.image_paths)
+        self.assertIs(resized.target_paths, dataset.target_paths)
+        self.assertIs(resized.decoder, dataset.decoder)
+        self.assertEqual(resized.image_size, dataset.image_size)
+        sample = resized[1]
+        self.assertEqual(tuple(sample["image"].shape), (3, 16, 16))
+        self.assertTrue(torch.equal(sample["image"][:1], sample["target"]))
+        self.assertEqual(tuple(dataset[1]["image"].shape), (3, 32, 32))
+
+    def test_without_joint_transforms(self):
+        """With v1 transforms, masks are only resized to ``image_size`` (with nearest neighbors)."""
+        dataset = self.dataset(transforms_v1.Compose([transforms_v1.Resize(32), transforms_v1.ToTensor()]))
+        target = dataset[2]["target"]
+        self.assertEqual(target.dtype, torch.uint8)
+        self.assertTrue(torch.equal(target[0], torch.from_numpy(blocky_mask(2)[::2, ::2] * 255)))
+
+
+class TestPrepareTarget(unittest.TestCase):
+    """Tasks turn uint8 masks into the target format of their loss on the device."""
+
+    def prepare(self, mask, loss):
+        """Load ``mask`` through a dataset and prepare the batch target for ``loss``."""
+        with tempfile.TemporaryDirectory() as root:
+            image_path, target_path = os.path.join(root, "image.png"), os.path.join(root, "mask.png")
+            Image.fromarray(np.zeros(mask.shape + (3,), dtype=np.uint8)).save(image_path)
+            Image.fromarray(mask).save(target_path)
+            dataset = BaseImageDataset([image_path], [target_path], transforms=T.ToImage(), image_size=mask.shape)
+            batch = stack_samples([dataset[0]])
+        task = get_task(
+            "base", torch.nn.Conv2d(3, 1, 1), loss=loss, learning_rate=1e-3, weight_decay=0.0,
+            optimizer="adam", scheduler="none", viz_max_figures_per_epoch=0
+        )
+        return task.on_after_batch_transfer(batch, 0)["target"]
+
+    def test_binary_masks(self):
+        """Binary masks become the [0, 1] floats that ``ToTensor`` gave."""
+        mask = blocky_mask(0) * 255
+        expected = transforms_v1.ToTensor()(Image.fromarray(mask))[None]
+        for loss in ("mse", "bce"):
+            with self.subTest(loss=loss):
+                target = self.prepare(mask, loss)
+                self.assertEqual(target.dtype, torch.float32)
+                self.assertTrue(torch.equal(target, expected))
+                self.assertEqual(set(target.unique().tolist()), {0.0, 1.0})
+
+    def test_multiclass_masks(self):
+        """Multiclass masks become (B, H, W) class indices for ``ce``, [0, 1] floats otherwise."""
+        mask = blocky_mask(1, classes=5)
+        target = self.prepare(mask, "ce")
+        self.assertEqual(target.dtype, torch.long)
+        self.assertTrue(torch.equal(target, torch.from_numpy(mask).long()[None]))
+        self.assertTrue(torch.equal(self.prepare(mask, "mse"), transforms_v1.ToTensor()(Image.fromarray(mask))[None]))
+
+
+if __name__ == "__main__":
+    unittest.main()
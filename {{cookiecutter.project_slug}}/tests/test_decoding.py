@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+"""Tests for `{{ cookiecutter.project_slug }}.decoding`."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from {{ cookiecutter.project_slug }}.decoding import TURBOJPEG_AVAILABLE, ImageDecoder
+
+WIDTH, HEIGHT = 256, 192
+
+
+def smooth_image(seed):
+    """Get an RGB image of gradients and mild noise, as JPEG-friendly as a photo."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:HEIGHT, 0:WIDTH]
+    pixels = np.stack([x * 255 / WIDTH, y * 255 / HEIGHT, (x + y) * 255 / (WIDTH + HEIGHT)], axis=-1)
+    pixels += rng.normal(0, 4, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+class DecoderTests:
+    """Compare a backend against a full PIL decode (mixed into a ``TestCase`` per backend)."""
+
+    backend = None
+
+    def setUp(self):
+        """Write a JPEG, a PNG and a grayscale JPEG."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+        self.jpeg = os.path.join(self.root, "image.jpg")
+        self.png = os.path.join(self.root, "image.png")
+        self.gray = os.path.join(self.root, "gray.jpg")
+        smooth_image(0).save(self.jpeg, quality=95)
+        smooth_image(1).save(self.png)
+        smooth_image(2).convert("L").save(self.gray, quality=95)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self._tmp.cleanup()
+
+    def reference(self, path):
+        """Decode with PIL at full size."""
+        with Image.open(path) as image:
+            return np.asarray(image.convert("RGB"))
+
+    def decode(self, path, min_size=None):
+        """Decode with the backend under test."""
+        image = ImageDecoder(self.backend)(path, min_size)
+        self.assertEqual(image.mode, "RGB")
+        return np.asarray(image)
+
+    def assert_close(self, pixels, reference, mean_tolerance=1.0, max_tolerance=8):
+        """Same shape and dtype, pixels within the tolerance of IDCT differences."""
+        self.assertEqual(pixels.shape, reference.shape)
+        self.assertEqual(pixels.dtype, np.uint8)
+        difference = np.abs(pixels.astype(np.int16) - reference.astype(np.int16))
+        self.assertLessEqual(difference.mean(), mean_tolerance)
+        self.assertLessEqual(difference.max(), max_tolerance)
+
+    def test_jpeg(self):
+        """Full-size JPEGs match PIL."""
+        self.assert_close(self.decode(self.jpeg), self.reference(self.jpeg))
+
+    def test_grayscale_jpeg(self):
+        """Grayscale JPEGs are decoded to RGB."""
+        self.assert_close(self.decode(self.gray), self.reference(self.gray))
+
+    def test_png(self):
+        """PNGs are lossless, so they match PIL exactly."""
+        self.assert_close(self.decode(self.png), self.reference(self.png), mean_tolerance=0, max_tolerance=0)
+
+    def test_reduced_jpeg(self):
+        """Reduced-scale JPEGs are at least ``min_size`` and match a downscaled full decode."""
+        pixels = self.decode(self.jpeg, min_size=(60, 40))
+        height, width = pixels.shape[:2]
+        self.assertGreaterEqual(width, 60)
+        self.assertGreaterEqual(height, 40)
+        with Image.open(self.jpeg) as image:
+            reference = np.asarray(image.convert("RGB").resize((width, height), Image.BOX))
+        self.assert_close(pixels, reference, mean_tolerance=4.0, max_tolerance=64)
+
+
+class TestPILDecoder(DecoderTests, unittest.TestCase):
+    """PIL decodes JPEGs at a reduced scale with ``draft``."""
+
+    backend = "pil"
+
+    def test_reduced_jpeg_scale(self):
+        """The smallest 1/2, 1/4 or 1/8 scale still at least ``min_size`` is used."""
+        self.assertEqual(self.decode(self.jpeg, min_size=(60, 40)).shape, (HEIGHT // 4, WIDTH // 4, 3))
+
+
+class TestTorchvisionDecoder(DecoderTests, unittest.TestCase):
+    """torchvision always decodes at full size."""
+
+    backend = "torchvision"
+
+    def test_reduced_jpeg_scale(self):
+        """``min_size`` is ignored."""
+        self.assertEqual(self.decode(self.jpeg, min_size=(60, 40)).shape, (HEIGHT, WIDTH, 3))
+
+
+@unittest.skipUnless(TURBOJPEG_AVAILABLE, "PyTurboJPEG is not installed")
+class TestTurboJPEGDecoder(DecoderTests, unittest.TestCase):
+    """libjpeg-turbo decodes JPEGs at a reduced scale with its scaling factors."""
+
+    backend = "turbojpeg"
+
+    def test_png(self):
+        """libjpeg-turbo only decodes JPEGs."""
+        with self.assertRaises(OSError):
+            self.decode(self.png)
+
+    def test_reduced_jpeg_scale(self):
+        """The smallest scaling factor still at least ``min_size`` is used."""
+        height, width = self.decode(self.jpeg, min_size=(60, 40)).shape[:2]
+        self.assertLess(width, WIDTH)
+        self.assertLess(height, HEIGHT)
+
+
+class TestAutoDecoder(DecoderTests, unittest.TestCase):
+    """``auto`` picks a backend per format and falls back to PIL."""
+
+    backend = "auto"
+
+    def test_backend_per_format(self):
+        """JPEGs use libjpeg-turbo when installed, everything else PIL."""
+        decoder = ImageDecoder("auto")
+        self.assertEqual(decoder.backend_for(self.jpeg), "turbojpeg" if TURBOJPEG_AVAILABLE else "pil")
+        self.assertEqual(decoder.backend_for(self.png), "pil")
+
+    def test_cmyk_jpeg_falls_back_to_pil(self):
+        """JPEGs the selected backend cannot decode are decoded by PIL."""
+        path = os.path.join(self.root, "cmyk.jpg")
+        smooth_image(3).convert("CMYK").save(path, quality=95)
+        self.assert_close(self.decode(path), self.reference(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
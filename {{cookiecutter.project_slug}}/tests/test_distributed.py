@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+"""Tests for multi-process CPU data-parallel training with reused dataloaders.
+
+The test runs this file as a script, so that the spawned DDP processes
+import the dataset and datamodule below from it.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import lightning.pytorch as pl
+import torch
+from torch.utils.data import Dataset
+
+from {{ cookiecutter.project_slug }}.datamodules import BaseDataModule
+from {{ cookiecutter.project_slug }}.distributed import cpu_ddp_strategy
+from {{ cookiecutter.project_slug }}.trainers import get_task
+
+NUM_SAMPLES = 64
+BATCH_SIZE = 8
+VAL_RATIO = 0.25
+NUM_PROCESSES = 2
+MAX_EPOCHS = 2
+
+
+class RandomDataset(Dataset):
+    """Small in-memory segmentation dataset."""
+
+    def __len__(self):
+        return NUM_SAMPLES
+
+    def __getitem__(self, idx):
+        image = torch.randn(3, 16, 16, generator=torch.Generator().manual_seed(idx))
+        return {"image": image, "target": image[:1].clone(), "path": str(idx)}
+
+
+class RandomDataModule(BaseDataModule):
+    """Datamodule serving ``RandomDataset`` instead of files."""
+
+    def _get_dataset(self, transforms):
+        return RandomDataset()
+
+
+class RecordBatches(pl.Callback):
+    """Write the samples and sampler of every training batch, per rank."""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+
+    def on_train_batch_start(self, trainer, pl_module, batch, batch_idx):
+        sampler = trainer.train_dataloader.batch_sampler.sampler
+        record = {"epoch": trainer.current_epoch, "paths": list(batch["path"]), "sampler": type(sampler).__name__}
+        with open(os.path.join(self.output_dir, f"rank{trainer.global_rank}.jsonl"), "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def run_fit(output_dir):
+    """Fit on ``NUM_PROCESSES`` gloo ranks with reused dataloaders."""
+    config = SimpleNamespace(
+        batch_size=BATCH_SIZE, num_workers=0, val_ratio=VAL_RATIO, seed=1, reuse_dataloaders=True
+    )
+    task = get_task(
+        "base", torch.nn.Conv2d(3, 1, 3, padding=1), loss="mse", learning_rate=1e-2,
+        weight_decay=0.0, optimizer="adam", scheduler="none", viz_max_figures_per_epoch=0
+    )
+    trainer = pl.Trainer(
+        max_epochs=MAX_EPOCHS,
+        accelerator="cpu",
+        devices=NUM_PROCESSES,
+        strategy=cpu_ddp_strategy(),
+        use_distributed_sampler=False,
+        callbacks=[RecordBatches(output_dir)],
+        default_root_dir=output_dir,
+        logger=False,
+        enable_checkpointing=False,
+        enable_progress_bar=False,
+        enable_model_summary=False,
+    )
+    trainer.fit(task, datamodule=RandomDataModule(config))
+
+
+class TestReusedDataloadersDistributed(unittest.TestCase):
+    """Reused dataloaders keep their samplers and batch size under DDP."""
+
+    def test_ranks_get_disjoint_full_batches(self):
+        """Every rank trains on its own shard, in batches of ``batch_size``."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join([project_dir, os.environ.get("PYTHONPATH", "")]))
+            subprocess.run([sys.executable, os.path.abspath(__file__), output_dir], env=env, check=True, timeout=300)
+
+            records = []
+            for rank in range(NUM_PROCESSES):
+                with open(os.path.join(output_dir, f"rank{rank}.jsonl")) as f:
+                    records.append([json.loads(line) for line in f])
+
+        n_train = NUM_SAMPLES - int(NUM_SAMPLES * VAL_RATIO)
+        batches_per_epoch = n_train // NUM_PROCESSES // BATCH_SIZE
+        for epoch in range(MAX_EPOCHS):
+            shards = []
+            for rank_records in records:
+                batches = [r for r in rank_records if r["epoch"] == epoch]
+                self.assertEqual(len(batches), batches_per_epoch)
+                self.assertTrue(all(len(r["paths"]) == BATCH_SIZE for r in batches))
+                self.assertTrue(all(r["sampler"] == "ResumableSampler" for r in batches))
+                shards.append({path for r in batches for path in r["paths"]})
+            self.assertFalse(shards[0] & shards[1])
+
+
+if __name__ == "__main__":
+    run_fit(sys.argv[1])
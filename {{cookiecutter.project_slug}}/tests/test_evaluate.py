@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+"""End-to-end test of `scripts/evaluate.py` on a tiny dataset."""
+
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import torch
+from PIL import Image
+
+from {{ cookiecutter.project_slug }}.checkpoints import run_hparams, save_hparams
+from {{ cookiecutter.project_slug }}.config import TrainerConfig
+from {{ cookiecutter.project_slug }}.evaluation import load_predictions
+from {{ cookiecutter.project_slug }}.models import get_model
+from {{ cookiecutter.project_slug }}.trainers import get_task
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+EVALUATE_PATH = PROJECT_DIR / "scripts" / "evaluate.py"
+
+
+class TestEvaluateScript(unittest.TestCase):
+    """Evaluate a checkpoint on a directory of images and masks."""
+
+    def setUp(self):
+        """Write images, masks and a checkpoint with its hparams sidecar."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.data = self.root / "data"
+        self.data.mkdir()
+        rng = np.random.default_rng(0)
+        self.rows = []
+        for i in range(6):
+            image, mask = self.data / f"{i}.png", self.data / f"{i}_mask.png"
+            Image.fromarray(rng.integers(0, 256, (16, 16, 3), dtype=np.uint8)).save(image)
+            Image.fromarray(rng.integers(0, 2, (16, 16), dtype=np.uint8) * 255).save(mask)
+            self.rows.append((image.name, mask.name))
+
+        config = TrainerConfig(
+            image_size=(16, 16), out_channels=1, num_workers=0,
+            output_dir=str(self.root / "run"), log_dir=str(self.root / "logs"),
+        )
+        task = get_task(
+            "base", get_model(config), loss="mse", learning_rate=1e-3, weight_decay=0.0,
+            optimizer="adam", scheduler="none", viz_max_figures_per_epoch=0
+        )
+        self.checkpoint = self.root / "run" / "best.ckpt"
+        torch.save({"state_dict": task.state_dict(), "hyper_parameters": dict(task.hparams)}, self.checkpoint)
+        save_hparams(str(self.checkpoint), {**run_hparams(config, "base"), "task": dict(task.hparams)})
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self._tmp.cleanup()
+
+    def write_index(self, splits=None):
+        """Write the CSV index of the data, optionally with a split column."""
+        with open(self.data / "index.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["image_path", "target_path"] + (["split"] if splits else []))
+            for i, row in enumerate(self.rows):
+                writer.writerow(list(row) + ([splits[i]] if splits else []))
+
+    def evaluate(self):
+        """Run the script and get the evaluated image names."""
+        output_dir = self.root / "evaluation"
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(PROJECT_DIR), os.environ.get("PYTHONPATH", "")]))
+        result = subprocess.run(
+            [sys.executable, str(EVALUATE_PATH), "--model_path", str(self.checkpoint),
+             "--test_data", str(self.data), "--output_dir", str(output_dir), "--batch_size", "4",
+             "--format", "npz"],
+            env=env, cwd=self.root, timeout=300, capture_output=True, text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with open(output_dir / "evaluation_results.json") as f:
+            self.assertIn("test_loss", json.load(f))
+        return sorted(os.path.basename(path) for path in load_predictions(str(output_dir / "predictions"))["path"])
+
+    def test_whole_directory(self):
+        """Without a split column, every image of ``--test_data`` is evaluated."""
+        self.write_index()
+        self.assertEqual(self.evaluate(), sorted(image for image, _ in self.rows))
+
+    def test_index_test_split(self):
+        """With a split column, only the test rows are evaluated."""
+        self.write_index(["train", "train", "val", "test", "train", "test"])
+        self.assertEqual(self.evaluate(), ["3.png", "5.png"])
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+"""Tests for `{{ cookiecutter.project_slug }}.models`."""
+
+import unittest
+
+import torch
+import torch.nn as nn
+
+from {{ cookiecutter.project_slug }}.models import _CheckpointedForward, enable_gradient_checkpointing
+
+
+class Block(nn.Module):
+    """Residual block holding a nested convolution."""
+
+    def __init__(self):
+        super().__init__()
+        self.conv = nn.Conv2d(4, 4, 3, padding=1)
+
+    def forward(self, x):
+        return x + self.conv(x)
+
+
+class Backbone(nn.Module):
+    """Model whose only top-level child wraps all blocks."""
+
+    def __init__(self):
+        super().__init__()
+        self.backbone = nn.Sequential(nn.Conv2d(3, 4, 1), Block(), Block())
+
+    def forward(self, x):
+        return self.backbone(x)
+
+
+def checkpointed(model):
+    """Get the names of the submodules whose forward is checkpointed."""
+    return [name for name, module in model.named_modules() if isinstance(module.forward, _CheckpointedForward)]
+
+
+class TestGradientCheckpointing(unittest.TestCase):
+    """Gradient checkpointing wraps the requested blocks."""
+
+    def test_default_wraps_top_level_children(self):
+        """Without targets, each top-level child is checkpointed."""
+        self.assertEqual(checkpointed(enable_gradient_checkpointing(Backbone())), ["backbone"])
+
+    def test_block_types_and_names(self):
+        """Block types, class names and submodule names select nested blocks."""
+        for modules in (Block, "Block", ["backbone.1", "backbone.2"]):
+            with self.subTest(modules=modules):
+                model = enable_gradient_checkpointing(Backbone(), modules)
+                self.assertEqual(checkpointed(model), ["backbone.1", "backbone.2"])
+
+    def test_nested_blocks_are_not_wrapped_twice(self):
+        """Blocks inside a selected block are left alone."""
+        model = enable_gradient_checkpointing(Backbone(), ["backbone", nn.Conv2d])
+        self.assertEqual(checkpointed(model), ["backbone"])
+
+    def test_gradients_match(self):
+        """Checkpointed blocks give the same gradients as the plain model."""
+        torch.manual_seed(0)
+        model, x = Backbone(), torch.randn(2, 3, 8, 8)
+        model(x).sum().backward()
+        expected = [p.grad.clone() for p in model.parameters()]
+        model.zero_grad()
+        enable_gradient_checkpointing(model, Block)(x).sum().backward()
+        for grad, param in zip(expected, model.parameters()):
+            self.assertTrue(torch.allclose(param.grad, grad))
+
+    def test_warns_when_nothing_matches(self):
+        """Targets that match no submodule warn instead of silently doing nothing."""
+        with self.assertWarns(UserWarning):
+            enable_gradient_checkpointing(Backbone(), "TransformerBlock")
+        with self.assertWarns(UserWarning):
+            enable_gradient_checkpointing(nn.Linear(2, 2))
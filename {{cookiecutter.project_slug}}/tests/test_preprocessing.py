@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+"""Tests for `{{ cookiecutter.project_slug }}.preprocessing`."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+import torchvision.transforms.v2 as T
+from PIL import Image
+
+from {{ cookiecutter.project_slug }}.datasets import BaseImageDataset, PreprocessedImageDataset, use_preprocessed
+from {{ cookiecutter.project_slug }}.preprocessing import preprocess_images
+
+
+class TestPreprocessedParity(unittest.TestCase):
+    """Preprocessed variants give the same samples as the online transforms."""
+
+    def setUp(self):
+        """Write a few random RGB images."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+        rng = np.random.default_rng(0)
+        self.image_paths = []
+        for i in range(3):
+            path = os.path.join(self.root, f"{i}.png")
+            Image.fromarray(rng.integers(0, 256, (20, 24, 3), dtype=np.uint8)).save(path)
+            self.image_paths.append(path)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self._tmp.cleanup()
+
+    def assert_parity(self, transforms, fmt):
+        """Preprocess with ``fmt`` and compare every sample with the online one."""
+        preprocessed_dir = os.path.join(self.root, f"preprocessed-{fmt}")
+        preprocess_images(self.image_paths, transforms, preprocessed_dir, fmt=fmt, num_workers=1)
+        online = BaseImageDataset(self.image_paths, transforms=transforms, image_size=(8, 8))
+        offline = use_preprocessed(online, preprocessed_dir)
+        self.assertIsInstance(offline, PreprocessedImageDataset)
+        for idx in range(len(online)):
+            expected, actual = online[idx]["image"], offline[idx]["image"]
+            self.assertEqual(actual.shape, expected.shape)
+            self.assertTrue(torch.equal(actual, expected))
+
+    def test_grayscale_prefix(self):
+        """A prefix ending in Grayscale keeps its single channel in every format."""
+        transforms = T.Compose([
+            T.Resize((8, 8)), T.Grayscale(), T.ToImage(), T.ToDtype(torch.float32, scale=True)
+        ])
+        for fmt in ("png", "webp", "memmap"):
+            with self.subTest(fmt=fmt):
+                self.assert_parity(transforms, fmt)
+
+    def test_rgb_prefix(self):
+        """An RGB prefix round-trips unchanged."""
+        transforms = T.Compose([T.Resize((8, 8)), T.ToImage(), T.ToDtype(torch.float32, scale=True)])
+        for fmt in ("png", "memmap"):
+            with self.subTest(fmt=fmt):
+                self.assert_parity(transforms, fmt)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""Tests for `{{ cookiecutter.project_slug }}.telemetry`."""
+
+import json
+import os
+import tempfile
+import unittest
+from urllib.request import urlopen
+
+from {{ cookiecutter.project_slug }}.telemetry import Telemetry
+
+
+class TestTelemetry(unittest.TestCase):
+    """Prometheus rendering, JSONL snapshots and the final flush."""
+
+    def setUp(self):
+        """Create a registry writing to a temporary JSONL file."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.jsonl_path = os.path.join(self._tmp.name, "telemetry.jsonl")
+        self.telemetry = Telemetry("job", jsonl_path=self.jsonl_path, interval=3600)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self._tmp.cleanup()
+
+    def records(self):
+        """Read the JSONL snapshots."""
+        with open(self.jsonl_path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_render_prometheus_format(self):
+        """Counters, gauges and cumulative histogram buckets in the text format."""
+        self.telemetry.counter("files_total", "Files written").inc(3)
+        self.telemetry.gauge("queue_depth", "Queued batches", fn=lambda: 2)
+        latency = self.telemetry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            latency.observe(value)
+
+        lines = self.telemetry.render().splitlines()
+        self.assertIn("# HELP job_files_total Files written", lines)
+        self.assertIn("# TYPE job_files_total counter", lines)
+        self.assertIn("job_files_total 3.0", lines)
+        self.assertIn("# TYPE job_queue_depth gauge", lines)
+        self.assertIn("job_queue_depth 2.0", lines)
+        self.assertIn("# TYPE job_latency_seconds histogram", lines)
+        self.assertEqual(
+            [line for line in lines if line.startswith("job_latency_seconds")],
+            [
+                'job_latency_seconds_bucket{le="0.1"} 2',
+                'job_latency_seconds_bucket{le="1.0"} 3',
+                'job_latency_seconds_bucket{le="+Inf"} 4',
+                "job_latency_seconds_sum 2.65",
+                "job_latency_seconds_count 4",
+            ],
+        )
+
+    def test_endpoint_serves_render(self):
+        """The HTTP endpoint serves the rendered metrics."""
+        telemetry = Telemetry("job", port=0)
+        telemetry.counter("files_total").inc()
+        with telemetry:
+            with urlopen(f"http://127.0.0.1:{telemetry.port}/metrics", timeout=10) as response:
+                body = response.read().decode()
+        self.assertIn("job_files_total 1.0", body.splitlines())
+
+    def test_snapshot_rates(self):
+        """Counter rates are per second since the previous snapshot."""
+        files = self.telemetry.counter("files_total")
+        self.telemetry.snapshot()
+        files.inc(10)
+        self.telemetry._previous_time -= 2.0
+        record = self.telemetry.snapshot()
+        self.assertEqual(record["job_files_total"], 10)
+        self.assertAlmostEqual(record["job_files_total_rate"], 5.0, places=2)
+
+    def test_snapshot_interval_means(self):
+        """Histogram means cover only the values observed since the previous snapshot."""
+        latency = self.telemetry.histogram("latency_seconds")
+        latency.observe(1.0)
+        latency.observe(3.0)
+        self.assertEqual(self.telemetry.snapshot()["job_latency_seconds_mean"], 2.0)
+        latency.observe(10.0)
+        record = self.telemetry.snapshot()
+        self.assertEqual(record["job_latency_seconds_mean"], 10.0)
+        self.assertEqual(record["job_latency_seconds_count"], 3)
+        self.assertNotIn("job_latency_seconds_mean", self.telemetry.snapshot())
+
+    def test_close_writes_final_snapshot(self):
+        """Closing writes a last snapshot, even before the first interval elapsed."""
+        files = self.telemetry.counter("files_total")
+        with self.telemetry:
+            files.inc(4)
+        self.assertEqual([record["job_files_total"] for record in self.records()], [4])
+
+    def test_final_snapshot_after_exception(self):
+        """The last snapshot is written when the job fails."""
+        files = self.telemetry.counter("files_total")
+        with self.assertRaises(RuntimeError):
+            with self.telemetry:
+                files.inc(2)
+                raise RuntimeError("inference failed")
+        self.assertEqual(self.records()[-1]["job_files_total"], 2)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+"""Tests for `{{ cookiecutter.project_slug }}.validation`."""
+
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import lightning.pytorch as pl
+import torch
+from lightning.pytorch.callbacks import ModelCheckpoint
+from torch.utils.data import Dataset
+
+from {{ cookiecutter.project_slug }}.datamodules import BaseDataModule
+from {{ cookiecutter.project_slug }}.trainers import get_task
+from {{ cookiecutter.project_slug }}.validation import ValidationSchedule
+
+NUM_SAMPLES = 100
+VAL_RATIO = 0.4
+VAL_SUBSAMPLE = 0.25
+
+
+class RandomDataset(Dataset):
+    """Small in-memory segmentation dataset with stratification labels."""
+
+    labels = [i % 4 for i in range(NUM_SAMPLES)]
+
+    def __len__(self):
+        return NUM_SAMPLES
+
+    def __getitem__(self, idx):
+        image = torch.randn(3, 8, 8, generator=torch.Generator().manual_seed(idx))
+        return {"image": image, "target": image[:1].clone(), "path": str(idx)}
+
+
+class RandomDataModule(BaseDataModule):
+    """Datamodule serving ``RandomDataset`` instead of files."""
+
+    def _get_dataset(self, transforms):
+        return RandomDataset()
+
+
+class RecordValidations(pl.Callback):
+    """Record the size and metrics of every validation and the metrics of every checkpoint."""
+
+    def __init__(self):
+        self.validations = []
+        self.checkpoints = []
+
+    def on_validation_epoch_start(self, trainer, pl_module):
+        self._samples = 0
+
+    def on_validation_batch_end(self, trainer, pl_module, outputs, batch, batch_idx, dataloader_idx=0):
+        self._samples += len(batch["path"])
+
+    def on_validation_end(self, trainer, pl_module):
+        if trainer.sanity_checking:
+            return
+        self.validations.append({
+            "epoch": trainer.current_epoch,
+            "samples": self._samples,
+            "val_full": float(trainer.callback_metrics["val_full"]),
+            "val_loss": float(trainer.callback_metrics["val_loss"]),
+        })
+
+    def on_save_checkpoint(self, trainer, pl_module, checkpoint):
+        self.checkpoints.append({
+            "epoch": trainer.current_epoch,
+            "samples": self._samples,
+            "val_full": float(trainer.callback_metrics["val_full"]),
+        })
+
+
+class TestValidationSchedule(unittest.TestCase):
+    """Intermediate validations use the subsample, checkpoint epochs the whole split."""
+
+    def test_full_validation_at_checkpoint_epochs(self):
+        """Epochs 2 and 4 (checkpoints) and 5 (last) validate fully; checkpoints rank full metrics."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            config = SimpleNamespace(
+                batch_size=8, num_workers=0, val_ratio=VAL_RATIO, seed=1, val_subsample=VAL_SUBSAMPLE
+            )
+            task = get_task(
+                "base", torch.nn.Conv2d(3, 1, 3, padding=1), loss="mse", learning_rate=1e-2,
+                weight_decay=0.0, optimizer="adam", scheduler="none", viz_max_figures_per_epoch=0
+            )
+            checkpoint = ModelCheckpoint(
+                dirpath=output_dir, monitor="val_loss", mode="min", save_top_k=-1, every_n_epochs=2
+            )
+            record = RecordValidations()
+            trainer = pl.Trainer(
+                max_epochs=5,
+                accelerator="cpu",
+                callbacks=[ValidationSchedule(full_every_n_epochs=2), record, checkpoint],
+                use_distributed_sampler=False,
+                logger=False,
+                enable_progress_bar=False,
+                enable_model_summary=False,
+            )
+            trainer.fit(task, datamodule=RandomDataModule(config))
+            best_k_scores = sorted(float(score) for score in checkpoint.best_k_models.values())
+
+        n_val = int(NUM_SAMPLES * VAL_RATIO)
+        n_subsample = round(n_val * VAL_SUBSAMPLE)
+        full_epochs = {1, 3, 4}
+        self.assertEqual([v["epoch"] for v in record.validations], [0, 1, 2, 3, 4])
+        for validation in record.validations:
+            full = validation["epoch"] in full_epochs
+            self.assertEqual(validation["samples"], n_val if full else n_subsample)
+            self.assertEqual(validation["val_full"], float(full))
+
+        # Checkpoints are saved at epochs 2 and 4, right after their full validations
+        self.assertEqual([c["epoch"] for c in record.checkpoints], [1, 3])
+        self.assertTrue(all(c["samples"] == n_val and c["val_full"] == 1.0 for c in record.checkpoints))
+        full_losses = sorted(v["val_loss"] for v in record.validations if v["epoch"] in (1, 3))
+        self.assertEqual(len(best_k_scores), len(full_losses))
+        for score, loss in zip(best_k_scores, full_losses):
+            self.assertAlmostEqual(score, loss, places=6)
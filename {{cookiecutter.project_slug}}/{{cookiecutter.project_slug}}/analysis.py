@@ -0,0 +1,256 @@
+"""
+Sliced metrics with bootstrap confidence intervals over stored predictions.
+
+This module provides:
+- Slice keys by path prefix, label or a metadata column joined on the path
+- Metrics recomputed from the per-sample statistics written by
+  ``evaluation.PredictionWriter`` (no model forward passes)
+- Vectorized Poisson bootstrap confidence intervals for every slice
+
+Every metric is a function of sums of per-sample statistics, so a bootstrap
+replicate of a slice is a weighted sum: all replicates are one matrix
+product of Poisson(1) weights with the statistics. Samples are sorted by
+slice once, so each slice is a contiguous block of columns. Large slices are
+first summed into a fixed number of random groups; group sums are
+independent, so bootstrapping them keeps the cost independent of the number
+of samples.
+"""
+
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+#: Lookup table mapping uniform uint16 values to Poisson(1) draws.
+_POISSON_TABLE = np.searchsorted(
+    np.cumsum([math.exp(-1) / math.factorial(k) for k in range(16)]) * 65536,
+    np.arange(65536),
+    side="right",
+).astype(np.float32)
+
+
+def path_prefix(paths: np.ndarray, depth: int = 1) -> np.ndarray:
+    """Get the first ``depth`` directories of each path below their common root.
+
+    Args:
+        paths: Sample paths
+        depth: Number of directory levels to keep
+
+    Returns:
+        Array of prefixes ("." for files directly in the root)
+    """
+    # Only the (few) unique directories are processed
+    codes, dirs = pd.factorize(pd.Series(paths, dtype=str).map(os.path.dirname))
+    if len(dirs) == 0:
+        return np.asarray([], dtype=object)
+    root = os.path.commonpath(list(dirs))
+    prefixes = []
+    for directory in dirs:
+        parts = os.path.relpath(directory, root).replace("\\", "/").split("/")
+        prefixes.append("/".join(part for part in parts[:depth] if part != ".") or ".")
+    return np.asarray(prefixes, dtype=object)[codes]
+
+
+def load_metadata(csv_path: str) -> pd.DataFrame:
+    """Load a metadata CSV (e.g. the index written by ``scripts/acquire.py``).
+
+    Args:
+        csv_path: CSV file with an ``image_path`` column
+
+    Returns:
+        DataFrame indexed by absolute image path
+    """
+    metadata = pd.read_csv(csv_path)
+    base_dir = os.path.dirname(os.path.abspath(csv_path))
+    metadata.index = [
+        path if os.path.isabs(path) else os.path.normpath(os.path.join(base_dir, path))
+        for path in metadata["image_path"]
+    ]
+    return metadata
+
+
+def slice_keys(predictions: Dict[str, np.ndarray], by: str, metadata: Optional[pd.DataFrame] = None, depth: int = 1) -> np.ndarray:
+    """Get the slice key of every sample.
+
+    Args:
+        predictions: Columns loaded with ``evaluation.load_predictions``
+        by: ``path_prefix``, ``label`` (the target class), or a metadata column
+        metadata: Metadata from ``load_metadata`` (for metadata columns)
+        depth: Directory depth for ``path_prefix``
+
+    Returns:
+        Array of slice keys
+    """
+    if by == "path_prefix":
+        return path_prefix(predictions["path"], depth)
+    if by == "label" and "target" in predictions:
+        return predictions["target"]
+    if metadata is None or by not in metadata.columns:
+        raise ValueError(f"Cannot slice by '{by}': not a prediction column and no metadata column of that name")
+    paths = [os.path.normpath(os.path.abspath(p)) for p in predictions["path"]]
+    return metadata[by].reindex(paths).fillna("<missing>").astype(str).to_numpy()
+
+
+def statistics_matrix(predictions: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Dict[str, slice]]:
+    """Stack the summable per-sample statistics into one matrix.
+
+    Args:
+        predictions: Columns loaded with ``evaluation.load_predictions``
+
+    Returns:
+        Tuple of (float64 matrix of shape (samples, statistics), column slices by name)
+    """
+    names = ["n", "loss"] + [name for name in ("tp", "fp", "fn", "sse", "sae", "count") if name in predictions]
+    n = len(predictions["loss"])
+    blocks, columns, start = [], {}, 0
+    for name in names:
+        values = np.ones(n) if name == "n" else predictions[name]
+        values = values.reshape(n, -1).astype(np.float64)
+        blocks.append(values)
+        columns[name] = slice(start, start + values.shape[1])
+        start += values.shape[1]
+    return np.concatenate(blocks, axis=1), columns
+
+
+def metrics_from_sums(sums: np.ndarray, columns: Dict[str, slice]) -> Dict[str, np.ndarray]:
+    """Compute metrics from summed statistics.
+
+    Classification metrics are macro averages over the classes present
+    (matching torchmetrics); works on any leading dimensions.
+
+    Args:
+        sums: Summed statistics, last dimension indexed by ``columns``
+        columns: Column slices from ``statistics_matrix``
+
+    Returns:
+        Dictionary of metric arrays
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = sums[..., columns["n"]][..., 0]
+        metrics = {"loss": sums[..., columns["loss"]][..., 0] / n}
+        if "tp" in columns:
+            tp, fp, fn = (sums[..., columns[name]] for name in ("tp", "fp", "fn"))
+            precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+            recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+            f1 = np.where(2 * tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+            present = (tp + fp + fn) > 0
+            n_present = present.sum(axis=-1)
+            for name, values in (("precision", precision), ("recall", recall), ("f1", f1)):
+                metrics[name] = (values * present).sum(axis=-1) / n_present
+            if tp.shape[-1] > 1:
+                metrics["accuracy"] = tp.sum(axis=-1) / sums[..., columns["count"]][..., 0]
+        if "sse" in columns:
+            count = sums[..., columns["count"]][..., 0]
+            metrics["mse"] = sums[..., columns["sse"]][..., 0] / count
+            metrics["mae"] = sums[..., columns["sae"]][..., 0] / count
+    return metrics
+
+
+def group_sums(stats: np.ndarray, bounds: np.ndarray, max_groups: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum each slice larger than ``max_groups`` samples into random groups.
+
+    Args:
+        stats: Statistics matrix with samples sorted by slice
+        bounds: Slice boundaries
+        max_groups: Maximum number of rows per slice
+        seed: Random seed
+
+    Returns:
+        Tuple of (grouped statistics, new slice boundaries)
+    """
+    rng = np.random.default_rng(seed)
+    blocks, sizes = [], []
+    for s in range(len(bounds) - 1):
+        block = stats[bounds[s]:bounds[s + 1]]
+        if len(block) > max_groups:
+            block = block[rng.permutation(len(block))]
+            starts = np.linspace(0, len(block), max_groups, endpoint=False).astype(np.int64)
+            block = np.add.reduceat(block, starts, axis=0)
+        blocks.append(block)
+        sizes.append(len(block))
+    return np.concatenate(blocks), np.concatenate([[0], np.cumsum(sizes)])
+
+
+def bootstrap_sums(
+    stats: np.ndarray,
+    bounds: np.ndarray,
+    n_boot: int = 1000,
+    seed: int = 0,
+    max_chunk_bytes: int = 256 * 1024 ** 2,
+) -> np.ndarray:
+    """Compute Poisson bootstrap replicates of per-slice sums.
+
+    Args:
+        stats: Statistics matrix with samples sorted by slice
+        bounds: Slice boundaries, slice ``s`` is ``stats[bounds[s]:bounds[s + 1]]``
+        n_boot: Number of bootstrap replicates
+        seed: Random seed
+        max_chunk_bytes: Memory used for the weights of one chunk of replicates
+
+    Returns:
+        Array of shape (n_boot, slices, statistics)
+    """
+    rng = np.random.default_rng(seed)
+    n, k = stats.shape
+    n_slices = len(bounds) - 1
+    stats32 = stats.astype(np.float32)
+    replicates = np.empty((n_boot, n_slices, k), dtype=np.float64)
+    chunk = max(1, min(n_boot, max_chunk_bytes // (6 * max(n, 1))))
+    for start in range(0, n_boot, chunk):
+        stop = min(start + chunk, n_boot)
+        weights = _POISSON_TABLE[rng.integers(0, 65536, size=(stop - start, n), dtype=np.uint16)]
+        for s in range(n_slices):
+            lo, hi = bounds[s], bounds[s + 1]
+            replicates[start:stop, s] = weights[:, lo:hi] @ stats32[lo:hi]
+    return replicates
+
+
+def analyze(
+    predictions: Dict[str, np.ndarray],
+    keys: Optional[np.ndarray] = None,
+    n_boot: int = 1000,
+    confidence: float = 0.95,
+    seed: int = 0,
+    max_groups: int = 10000,
+) -> pd.DataFrame:
+    """Compute metrics with bootstrap confidence intervals per slice.
+
+    Args:
+        predictions: Columns loaded with ``evaluation.load_predictions``
+        keys: Slice key of every sample (None for the whole set only)
+        n_boot: Number of bootstrap replicates (0 to skip intervals)
+        confidence: Confidence level of the intervals
+        seed: Random seed
+        max_groups: Slices with more samples are bootstrapped over this many
+            random groups of samples
+
+    Returns:
+        DataFrame with one row per (slice, metric) and columns slice, n,
+        metric, value, ci_low, ci_high
+    """
+    stats, columns = statistics_matrix(predictions)
+    if keys is None:
+        keys = np.full(len(stats), "all", dtype=object)
+    codes, names = pd.factorize(pd.Series(keys), sort=True)
+    order = np.argsort(codes, kind="stable")
+    stats = stats[order]
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(names)))])
+
+    sums = np.add.reduceat(stats, bounds[:-1], axis=0)
+    point = metrics_from_sums(sums, columns)
+    if n_boot > 0:
+        grouped, group_bounds = group_sums(stats, bounds, max_groups, seed)
+        replicates = metrics_from_sums(bootstrap_sums(grouped, group_bounds, n_boot, seed), columns)
+        alpha = (1 - confidence) / 2
+
+    rows: List[dict] = []
+    for s, name in enumerate(names):
+        for metric, values in point.items():
+            row = {"slice": name, "n": int(bounds[s + 1] - bounds[s]), "metric": metric, "value": values[s]}
+            if n_boot > 0:
+                low, high = np.nanquantile(replicates[metric][:, s], [alpha, 1 - alpha])
+                row.update({"ci_low": low, "ci_high": high})
+            rows.append(row)
+    return pd.DataFrame(rows)
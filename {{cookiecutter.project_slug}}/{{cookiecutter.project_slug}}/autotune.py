@@ -0,0 +1,420 @@
+"""
+Batch size and learning rate autotuning.
+
+This module provides:
+- Measuring training throughput and peak memory of one batch size
+- Searching the largest batch size that fits a memory budget (CPU RSS or
+  device memory) and picking the throughput-optimal one
+- Scaling the learning rate to the chosen batch size
+- Caching results per (model, input shape, hardware), so later runs skip the probe
+
+Probes run a few optimizer steps on a copy of the task with synthetic batches
+built from real training samples; the task itself is left untouched.
+"""
+
+import copy
+import hashlib
+import json
+import math
+import os
+import platform
+import time
+from typing import Dict, Optional, Tuple
+
+import torch
+
+from {{cookiecutter.project_slug}}.datasets import stack_samples
+
+LR_SCALING_RULES = ("linear", "sqrt", "none")
+
+
+def scale_learning_rate(lr: float, base_batch_size: int, batch_size: int, rule: str = "linear") -> float:
+    """Scale a learning rate tuned for ``base_batch_size`` to ``batch_size``.
+
+    Args:
+        lr: Learning rate tuned for ``base_batch_size``
+        base_batch_size: Batch size the learning rate was tuned for
+        batch_size: New batch size
+        rule: linear, sqrt or none
+
+    Returns:
+        Scaled learning rate
+    """
+    if rule not in LR_SCALING_RULES:
+        raise ValueError(f"Unsupported learning rate scaling rule: {rule}")
+    ratio = batch_size / base_batch_size
+    if rule == "linear":
+        return lr * ratio
+    if rule == "sqrt":
+        return lr * math.sqrt(ratio)
+    return lr
+
+
+def hardware_signature(device: torch.device) -> str:
+    """Describe the hardware a probe ran on."""
+    if device.type == "cuda":
+        props = torch.cuda.get_device_properties(device)
+        return f"cuda:{props.name}:{props.total_memory}"
+    return f"cpu:{platform.machine()}:{platform.processor()}:{torch.get_num_threads()}threads"
+
+
+def probe_signature(model, sample: Dict, device: torch.device, extra: Dict) -> str:
+    """Compute the cache key of a probe.
+
+    Args:
+        model: Model being tuned
+        sample: A training sample (defines the input shape)
+        device: Device the probe runs on
+        extra: Other settings the result depends on (optimizer, precision, budget)
+
+    Returns:
+        Hex digest identifying the probe
+    """
+    key = {
+        "model": type(model).__name__,
+        "parameters": [(name, list(p.shape)) for name, p in model.named_parameters()],
+        "inputs": {k: list(v.shape) for k, v in sample.items() if isinstance(v, torch.Tensor)},
+        "hardware": hardware_signature(device),
+        "torch": torch.__version__,
+        **extra,
+    }
+    return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _read_proc_value(path: str, field: str) -> Optional[int]:
+    """Read a ``<field>: <value> kB`` entry of a /proc file in bytes (None if unavailable)."""
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _read_int(path: str) -> Optional[int]:
+    """Read an integer file such as a cgroup limit (None if missing or unlimited)."""
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        # Missing, or "max" for no cgroup v2 limit
+        return None
+
+
+def available_memory() -> int:
+    """Get the host memory this process can still allocate in bytes.
+
+    ``MemAvailable`` accounts for other processes on the node; under a cgroup
+    memory limit (containers, batch schedulers) the remaining headroom of the
+    cgroup is used if smaller.
+    """
+    available = _read_proc_value("/proc/meminfo", "MemAvailable")
+    if available is None:
+        available = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+    for limit_path, usage_path in (
+        ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+        ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes"),
+    ):
+        limit, usage = _read_int(limit_path), _read_int(usage_path)
+        # cgroup v1 reports no limit as a huge number
+        if limit is not None and usage is not None and limit < 1 << 60:
+            available = min(available, max(0, limit - usage))
+            break
+    return available
+
+
+def memory_budget(device: torch.device, fraction: float = 0.8) -> int:
+    """Get the peak memory a probe may reach on ``device`` in bytes.
+
+    Peaks are measured for the whole process, so the budget is the memory it
+    uses now plus ``fraction`` of what is still available: free device memory
+    on GPU, ``available_memory`` on CPU. It is rounded down to whole GB so
+    that small fluctuations of free memory still hit the probe cache.
+    """
+    if device.type == "cuda":
+        free, _ = torch.cuda.mem_get_info(device)
+        used = torch.cuda.memory_allocated(device)
+        # Cached but unallocated blocks are reusable by this process
+        free += torch.cuda.memory_reserved(device) - used
+    else:
+        used = _read_proc_value("/proc/self/status", "VmRSS") or 0
+        free = available_memory()
+    budget = used + int(free * fraction)
+    gb = 1024 ** 3
+    return budget // gb * gb if budget >= gb else budget
+
+
+def _reset_peak_memory(device: torch.device) -> None:
+    """Reset the peak memory counter of ``device``."""
+    if device.type == "cuda":
+        torch.cuda.reset_peak_memory_stats(device)
+        return
+    try:
+        # Resets the peak RSS (VmHWM) of this process on Linux
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_memory(device: torch.device) -> int:
+    """Get the peak memory use of ``device`` in bytes since the last reset."""
+    if device.type == "cuda":
+        return torch.cuda.max_memory_allocated(device)
+    peak = _read_proc_value("/proc/self/status", "VmHWM")
+    if peak is not None:
+        return peak
+    # Never reset, so an upper bound of the probe's peak
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+#: Allocator messages of out-of-memory errors raised as plain RuntimeErrors.
+OUT_OF_MEMORY_MESSAGES = (
+    "DefaultCPUAllocator: can't allocate memory",
+    "CUDA out of memory",
+    "CUDA error: out of memory",
+    "MPS backend out of memory",
+)
+
+
+def _is_out_of_memory(error: BaseException) -> bool:
+    """Whether an exception was caused by running out of memory."""
+    if isinstance(error, (MemoryError, torch.cuda.OutOfMemoryError)):
+        return True
+    message = str(error)
+    return isinstance(error, RuntimeError) and any(m in message for m in OUT_OF_MEMORY_MESSAGES)
+
+
+def measure_batch_size(
+    task,
+    samples,
+    batch_size: int,
+    device: torch.device,
+    steps: int = 5,
+    warmup_steps: int = 2,
+    precision=32,
+) -> Optional[Tuple[float, int]]:
+    """Measure training throughput and peak memory at one batch size.
+
+    Args:
+        task: LightningModule task (copied, not modified)
+        samples: Training samples the synthetic batch is built from
+        batch_size: Batch size to measure
+        device: Device to run on
+        steps: Number of timed optimizer steps
+        warmup_steps: Number of untimed optimizer steps run first
+        precision: Trainer precision; half precisions run under autocast
+
+    Returns:
+        Tuple of (samples per second, peak memory in bytes), or None if the
+        batch size ran out of memory
+    """
+    probe = None
+    try:
+        probe = copy.deepcopy(task).to(device).train()
+        optimizer = probe.configure_optimizers()
+        if isinstance(optimizer, dict):
+            optimizer = optimizer["optimizer"]
+
+        batch = stack_samples([samples[i % len(samples)] for i in range(batch_size)])
+        x, y = batch["image"].to(device), probe.prepare_target(batch["target"].to(device))
+        autocast_dtype = torch.bfloat16 if "bf16" in str(precision) else torch.float16
+        use_autocast = "16" in str(precision)
+
+        def step():
+            with torch.autocast(device.type, dtype=autocast_dtype, enabled=use_autocast):
+                loss = probe.loss_fn(probe(x), y)
+            loss.backward()
+            optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
+
+        for _ in range(warmup_steps):
+            step()
+        _reset_peak_memory(device)
+        if device.type == "cuda":
+            torch.cuda.synchronize(device)
+        start_time = time.perf_counter()
+        for _ in range(steps):
+            step()
+        if device.type == "cuda":
+            torch.cuda.synchronize(device)
+        elapsed = time.perf_counter() - start_time
+        return batch_size * steps / elapsed, _peak_memory(device)
+    except Exception as error:
+        if not _is_out_of_memory(error):
+            raise
+        return None
+    finally:
+        del probe
+        if device.type == "cuda":
+            torch.cuda.empty_cache()
+
+
+def search_batch_size(
+    measure,
+    budget: int,
+    max_batch_size: int,
+    min_batch_size: int = 1,
+    resolution: float = 0.1,
+) -> Dict[int, Tuple[float, int]]:
+    """Find the batch sizes that fit a memory budget.
+
+    Doubles the batch size until it exceeds the budget (or runs out of
+    memory), then binary-searches the boundary down to ``resolution``
+    (relative to the largest fitting size).
+
+    Args:
+        measure: Function mapping a batch size to (samples/sec, peak bytes) or None
+        budget: Memory budget in bytes
+        max_batch_size: Largest batch size to try
+        min_batch_size: Smallest batch size to try
+        resolution: Relative precision of the boundary search
+
+    Returns:
+        Dictionary mapping every fitting batch size to (samples/sec, peak bytes)
+    """
+    fits = {}
+
+    def fits_budget(batch_size):
+        result = measure(batch_size)
+        if result is None or result[1] > budget:
+            return False
+        fits[batch_size] = result
+        return True
+
+    low, high = None, None
+    batch_size = min_batch_size
+    while batch_size <= max_batch_size:
+        if not fits_budget(batch_size):
+            high = batch_size
+            break
+        low = batch_size
+        if batch_size == max_batch_size:
+            break
+        batch_size = min(batch_size * 2, max_batch_size)
+
+    if low is None or high is None:
+        return fits
+    while high - low > max(1, int(low * resolution)):
+        mid = (low + high) // 2
+        if fits_budget(mid):
+            low = mid
+        else:
+            high = mid
+    return fits
+
+
+def pick_batch_size(candidates: Dict[int, Tuple[float, int]], tolerance: float = 0.05) -> int:
+    """Pick the throughput-optimal batch size.
+
+    Throughput usually plateaus, so the smallest batch size within
+    ``tolerance`` of the best throughput is picked: it needs the least
+    learning rate scaling for the same speed.
+
+    Args:
+        candidates: Dictionary mapping batch size to (samples/sec, peak bytes)
+        tolerance: Relative throughput loss accepted for a smaller batch size
+
+    Returns:
+        Batch size
+    """
+    best = max(throughput for throughput, _ in candidates.values())
+    return min(
+        batch_size for batch_size, (throughput, _) in candidates.items()
+        if throughput >= (1 - tolerance) * best
+    )
+
+
+def autotune_batch_size(task, datamodule, config, device: Optional[torch.device] = None) -> Tuple[int, float]:
+    """Choose the batch size and learning rate before training.
+
+    Optional config keys: ``autotune_memory_gb`` (default: current use plus
+    ``autotune_memory_fraction``, 0.8, of the available memory), ``autotune_max_batch_size``, ``autotune_lr_scaling``
+    (linear, sqrt or none), ``autotune_tolerance`` and ``autotune_cache``.
+
+    Args:
+        task: LightningModule task
+        datamodule: DataModule providing training samples
+        config: Configuration object; ``batch_size`` and ``lr`` are the base
+            the learning rate is scaled from
+        device: Device to probe on (defaults to CUDA if available, else CPU)
+
+    Returns:
+        Tuple of (batch size, learning rate)
+    """
+    device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    base_batch_size = config.batch_size
+    lr_scaling = getattr(config, "autotune_lr_scaling", "linear")
+    tolerance = getattr(config, "autotune_tolerance", 0.05)
+    cache_path = getattr(
+        config, "autotune_cache", os.path.join(config.output_dir, "autotune_cache.json")
+    )
+
+    memory_gb = getattr(config, "autotune_memory_gb", None)
+    if memory_gb:
+        budget = int(memory_gb * 1024 ** 3)
+    else:
+        budget = memory_budget(device, getattr(config, "autotune_memory_fraction", 0.8))
+
+    datamodule.setup("fit")
+    dataset = datamodule.train_dataset
+    samples = [dataset[i] for i in range(min(8, len(dataset)))]
+    max_batch_size = min(getattr(config, "autotune_max_batch_size", None) or 4096, len(dataset))
+
+    key = probe_signature(task.model, samples[0], device, {
+        "optimizer": task.hparams.get("optimizer"),
+        "precision": config.precision,
+        "budget": budget,
+        "max_batch_size": max_batch_size,
+    })
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+
+    if key in cache:
+        candidates = {int(bs): tuple(result) for bs, result in cache[key]["candidates"].items()}
+        print(f"Autotune: using cached probe {key} from {cache_path}")
+    else:
+        print(f"Autotune: probing batch sizes up to {max_batch_size} "
+              f"within {budget / 1024 ** 3:.1f} GB on {device}")
+
+        def measure(batch_size):
+            result = measure_batch_size(task, samples, batch_size, device, precision=config.precision)
+            if result is None:
+                print(f"  batch size {batch_size}: out of memory")
+            else:
+                print(f"  batch size {batch_size}: {result[0]:.1f} samples/s, "
+                      f"peak {result[1] / 1024 ** 2:.0f} MB")
+            return result
+
+        candidates = search_batch_size(measure, budget, max_batch_size)
+        if not candidates:
+            print(f"Autotune: no batch size fits the budget, keeping {base_batch_size}")
+            return base_batch_size, config.lr
+
+        # Re-read before writing, other runs may have added entries meanwhile
+        if os.path.exists(cache_path):
+            with open(cache_path, "r") as f:
+                cache = json.load(f)
+        cache[key] = {
+            "hardware": hardware_signature(device),
+            "model": type(task.model).__name__,
+            "candidates": {str(bs): list(result) for bs, result in sorted(candidates.items())},
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, cache_path)
+
+    batch_size = pick_batch_size(candidates, tolerance)
+    lr = scale_learning_rate(config.lr, base_batch_size, batch_size, lr_scaling)
+    print(f"Autotune: batch size {base_batch_size} -> {batch_size} "
+          f"({candidates[batch_size][0]:.1f} samples/s), lr {config.lr:.2e} -> {lr:.2e} ({lr_scaling})")
+    return batch_size, lr
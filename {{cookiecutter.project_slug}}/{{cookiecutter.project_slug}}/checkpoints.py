@@ -0,0 +1,454 @@
+"""
+Checkpoint loading and export.
+
+This module provides:
+- A small JSON sidecar per checkpoint with the config and task
+  hyperparameters, so models can be built from the config they trained with
+- Loading checkpoints once, memory-mapped and with ``weights_only``, optionally
+  without optimizer and loop state
+- Building a task with its weights from a checkpoint
+- Saving slim, inference-only checkpoints
+- A checkpoint IO plugin that writes checkpoints on a background thread,
+  optionally with incremental (content-addressed) weight files
+
+Memory-mapped loading only reads the pickled structure up front; tensors are
+paged in from disk as they are used, so startup time and memory do not grow
+with the optimizer state stored in training checkpoints.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import warnings
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from lightning.pytorch.plugins.io import TorchCheckpointIO
+from lightning_utilities.core.apply_func import apply_to_collection
+
+from {{cookiecutter.project_slug}}.config import TrainerConfig
+from {{cookiecutter.project_slug}}.models import get_model
+from {{cookiecutter.project_slug}}.trainers import get_task
+
+SIDECAR_SUFFIX = ".hparams.json"
+
+#: Checkpoint entries only needed to resume training.
+TRAINING_STATE_KEYS = ("optimizer_states", "lr_schedulers", "loops", "callbacks")
+
+#: Directory (next to the checkpoints) holding incremental weight files.
+WEIGHTS_DIR = "weights"
+WEIGHTS_INDEX = "index.json"
+
+
+def sidecar_path(checkpoint_path: str) -> str:
+    """Get the sidecar path of a checkpoint (``<checkpoint>.hparams.json``)."""
+    return f"{os.path.abspath(checkpoint_path)}{SIDECAR_SUFFIX}"
+
+
+def run_hparams(config, task_type: str) -> Dict[str, Any]:
+    """Get the sidecar entries shared by all checkpoints of a run.
+
+    Args:
+        config: Configuration object
+        task_type: Type of task (segmentation, classification, etc.)
+
+    Returns:
+        Dictionary with ``task_type`` and ``config`` entries
+    """
+    return {"task_type": task_type, "config": config.model_dump()}
+
+
+def save_hparams(checkpoint_path: str, hparams: Dict[str, Any]) -> str:
+    """Write the hyperparameter sidecar of a checkpoint.
+
+    Args:
+        checkpoint_path: Path of the checkpoint
+        hparams: Dictionary with ``task_type``, ``config`` and ``task`` entries
+
+    Returns:
+        Path of the sidecar
+    """
+    path = sidecar_path(checkpoint_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(hparams, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_checkpoint(
+    checkpoint_path: str,
+    map_location="cpu",
+    weights_only: bool = True,
+    strip_training_state: bool = True,
+) -> Dict[str, Any]:
+    """Load a checkpoint once, memory-mapped.
+
+    Args:
+        checkpoint_path: Path to a Lightning (or slim) checkpoint
+        map_location: Device to map tensors to
+        weights_only: Only unpickle tensors and primitive types (set False
+            only for trusted checkpoints with custom objects)
+        strip_training_state: Drop optimizer, scheduler, loop and callback state
+
+    Returns:
+        Checkpoint dictionary
+    """
+    try:
+        checkpoint = torch.load(
+            checkpoint_path, map_location=map_location, mmap=True, weights_only=weights_only
+        )
+    except RuntimeError:
+        # Legacy (non-zipfile) checkpoints cannot be memory-mapped
+        checkpoint = torch.load(checkpoint_path, map_location=map_location, weights_only=weights_only)
+    if strip_training_state:
+        for key in TRAINING_STATE_KEYS:
+            checkpoint.pop(key, None)
+    return resolve_weight_files(checkpoint, checkpoint_path, map_location)
+
+
+def resolve_weight_files(checkpoint: Dict[str, Any], checkpoint_path: str, map_location="cpu") -> Dict[str, Any]:
+    """Load the weight files referenced by an incremental checkpoint.
+
+    Args:
+        checkpoint: Loaded checkpoint dictionary
+        checkpoint_path: Path the checkpoint was loaded from
+        map_location: Device to map tensors to
+
+    Returns:
+        Checkpoint with a regular ``state_dict`` (unchanged if it is not incremental)
+    """
+    files = checkpoint.pop("state_dict_files", None)
+    if files is None:
+        return checkpoint
+    weights_dir = os.path.join(os.path.dirname(os.path.abspath(checkpoint_path)), WEIGHTS_DIR)
+    checkpoint["state_dict"] = {
+        name: torch.load(os.path.join(weights_dir, filename), map_location=map_location, mmap=True, weights_only=True)
+        for name, filename in files.items()
+    }
+    return checkpoint
+
+
+def read_hparams(
+    checkpoint_path: str, weights_only: bool = True, checkpoint: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Read the hyperparameters of a checkpoint.
+
+    The config and task type come from the checkpoint's sidecar when present.
+    The task hyperparameters always come from the checkpoint itself
+    (memory-mapped, so tensors are not read); a sidecar that disagrees with
+    them belongs to another checkpoint and is ignored with a warning.
+
+    Args:
+        checkpoint_path: Path to the checkpoint
+        weights_only: Passed to ``load_checkpoint``
+        checkpoint: The checkpoint, if already loaded
+
+    Returns:
+        Dictionary with ``task_type``, ``config`` and ``task`` entries (the
+        first two may be missing)
+    """
+    if checkpoint is None:
+        checkpoint = load_checkpoint(checkpoint_path, weights_only=weights_only)
+    task_hparams = dict(checkpoint.get("hyper_parameters", {}))
+
+    path = sidecar_path(checkpoint_path)
+    if not os.path.exists(path):
+        return {"task": task_hparams}
+    with open(path, "r") as f:
+        sidecar = json.load(f)
+    # Compared as JSON, since that is how the sidecar stores them
+    if "hyper_parameters" in checkpoint and sidecar.get("task") != json.loads(json.dumps(task_hparams, default=str)):
+        warnings.warn(
+            f"{path} does not match the hyperparameters stored in {checkpoint_path}; "
+            "ignoring it and using the checkpoint's own hyperparameters"
+        )
+        return {"task": task_hparams}
+    return {**sidecar, "task": task_hparams}
+
+
+def load_task(
+    checkpoint_path: str,
+    task_type: Optional[str] = None,
+    config_overrides: Optional[Dict[str, Any]] = None,
+    map_location="cpu",
+    weights_only: bool = True,
+) -> Tuple[Any, TrainerConfig]:
+    """Build a task from a checkpoint, loading the checkpoint only once.
+
+    On CPU the weights are assigned directly from the memory-mapped
+    checkpoint instead of being copied into freshly initialized parameters.
+
+    Args:
+        checkpoint_path: Path to the checkpoint
+        task_type: Task type (defaults to the one in the sidecar)
+        config_overrides: Config values to override (e.g. input_dirs)
+        map_location: Device to load the weights to
+        weights_only: Passed to ``load_checkpoint``
+
+    Returns:
+        Tuple of (task in eval mode, config)
+    """
+    checkpoint = load_checkpoint(checkpoint_path, map_location=map_location, weights_only=weights_only)
+    hparams = read_hparams(checkpoint_path, checkpoint=checkpoint)
+    config = TrainerConfig(**{**hparams.get("config", {}), **(config_overrides or {})})
+    task_type = task_type or hparams.get("task_type", config.task_type)
+
+    task = get_task(task_type, get_model(config), **hparams.get("task", {}))
+    state_dict = checkpoint["state_dict"]
+    # Weights are copied when they need a cast (e.g. from a float16 slim checkpoint)
+    assign = torch.device(map_location).type == "cpu" and all(
+        state_dict[name].dtype == tensor.dtype
+        for name, tensor in task.state_dict().items() if name in state_dict
+    )
+    task.load_state_dict(state_dict, assign=assign)
+    return task.eval(), config
+
+
+def save_slim_checkpoint(checkpoint_path: str, output_path: str, dtype: Optional[torch.dtype] = None) -> str:
+    """Save an inference-only copy of a checkpoint.
+
+    Only the weights and hyperparameters are kept; the sidecar is copied for
+    the slim checkpoint if it exists.
+
+    Args:
+        checkpoint_path: Path to a Lightning checkpoint
+        output_path: Path of the slim checkpoint
+        dtype: Cast floating point weights to this dtype (e.g. torch.float16)
+
+    Returns:
+        Path of the slim checkpoint
+    """
+    checkpoint = load_checkpoint(checkpoint_path, weights_only=True)
+    state_dict = checkpoint["state_dict"]
+    if dtype is not None:
+        state_dict = {
+            name: tensor.to(dtype) if tensor.is_floating_point() else tensor
+            for name, tensor in state_dict.items()
+        }
+    slim = {
+        "state_dict": state_dict,
+        "hyper_parameters": checkpoint.get("hyper_parameters", {}),
+        "pytorch-lightning_version": checkpoint.get("pytorch-lightning_version"),
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    torch.save(slim, tmp_path)
+    os.replace(tmp_path, output_path)
+
+    source_sidecar = sidecar_path(checkpoint_path)
+    if os.path.exists(source_sidecar) and source_sidecar != sidecar_path(output_path):
+        with open(source_sidecar, "r") as f:
+            save_hparams(output_path, json.load(f))
+    return output_path
+
+
+def _atomic_torch_save(obj: Any, path: str) -> None:
+    """Save with ``torch.save`` to a temporary file, sync it and rename it into place."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        torch.save(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _snapshot_tensor(tensor: torch.Tensor) -> torch.Tensor:
+    """Copy a tensor to CPU memory (a point-in-time copy, also for CPU tensors)."""
+    return tensor.detach().to("cpu", copy=True)
+
+
+def _tensor_digest(tensor: torch.Tensor) -> str:
+    """Hash the dtype, shape and content of a CPU tensor."""
+    digest = hashlib.sha1(f"{tensor.dtype}{tuple(tensor.shape)}".encode())
+    digest.update(tensor.contiguous().reshape(-1).view(torch.uint8).numpy())
+    return digest.hexdigest()
+
+
+class BackgroundCheckpointIO(TorchCheckpointIO):
+    """Checkpoint IO plugin that keeps checkpoint writes off the training loop.
+
+    The checkpoint is copied to CPU memory on the training thread; the
+    serialization, fsync and atomic rename run on a single writer thread, in
+    order with checkpoint removals, so ``ModelCheckpoint``'s top-k retention
+    never deletes a file that is still being written. At most ``max_pending``
+    snapshots are held in memory: saving waits while that many writes are in
+    flight. The default of 2 covers an epoch saving both a top-k and the last
+    checkpoint; runs saving more checkpoints per epoch should raise it.
+    Errors of the writer are raised on the next save or at teardown.
+
+    With ``incremental=True`` the weights are written as content-addressed
+    files in a ``weights`` directory next to the checkpoints and the
+    checkpoint only refers to them by name, so unchanged tensors (frozen
+    layers, or the same weights saved as best and last) are written once.
+    Weight files no longer referenced by any checkpoint are deleted when
+    checkpoints are removed.
+
+    With ``hparams``, every checkpoint gets its own sidecar (see
+    ``save_hparams``), written before the checkpoint and removed after it.
+    """
+
+    def __init__(
+        self,
+        background: bool = True,
+        incremental: bool = False,
+        max_pending: int = 2,
+        hparams: Optional[Dict[str, Any]] = None,
+    ):
+        """Initialize plugin.
+
+        Args:
+            background: Write on a background thread (otherwise writes are
+                synchronous, e.g. to only use incremental weight files)
+            incremental: Write weights as content-addressed files
+            max_pending: Maximum number of checkpoints being written at once
+            hparams: Sidecar entries of the run (see ``run_hparams``); the
+                task hyperparameters are taken from each checkpoint
+        """
+        super().__init__()
+        self.background = background
+        self.incremental = incremental
+        self.max_pending = max_pending
+        self.hparams = hparams
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: List[Future] = []
+        self._error: Optional[BaseException] = None
+
+    def _submit(self, fn, *args) -> None:
+        """Run ``fn`` on the writer thread (or inline if not in background mode)."""
+        if not self.background:
+            fn(*args)
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint-writer")
+        self._pending.append(self._executor.submit(self._guarded, fn, *args))
+
+    def _guarded(self, fn, *args) -> None:
+        """Run ``fn``, keeping its error for the training thread."""
+        try:
+            fn(*args)
+        except BaseException as error:
+            self._error = error
+
+    def _raise_error(self) -> None:
+        """Raise an error of the writer thread, if any."""
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _wait_for_slot(self) -> None:
+        """Wait until fewer than ``max_pending`` writes are in flight."""
+        self._pending = [future for future in self._pending if not future.done()]
+        while len(self._pending) >= self.max_pending:
+            wait(self._pending, return_when=FIRST_COMPLETED)
+            self._pending = [future for future in self._pending if not future.done()]
+
+    @property
+    def pending(self) -> int:
+        """Number of writes and removals submitted but not finished yet."""
+        return sum(not future.done() for future in self._pending)
+
+    def wait(self) -> None:
+        """Wait for all pending writes and removals to finish."""
+        if self._pending:
+            wait(self._pending)
+            self._pending = []
+        self._raise_error()
+
+    def save_checkpoint(self, checkpoint: Dict[str, Any], path, storage_options: Optional[Any] = None) -> None:
+        """Snapshot ``checkpoint`` to CPU memory and write it to ``path``."""
+        if storage_options is not None:
+            raise TypeError(f"storage_options are not supported by {type(self).__name__}")
+        self._raise_error()
+        self._wait_for_slot()
+        snapshot = apply_to_collection(checkpoint, torch.Tensor, _snapshot_tensor)
+        self._submit(self._write, snapshot, str(path))
+
+    def _write(self, checkpoint: Dict[str, Any], path: str) -> None:
+        """Serialize a snapshot (writer thread)."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if self.hparams is not None:
+            save_hparams(path, {**self.hparams, "task": dict(checkpoint.get("hyper_parameters", {}))})
+        if self.incremental and "state_dict" in checkpoint:
+            weights_dir = os.path.join(directory, WEIGHTS_DIR)
+            os.makedirs(weights_dir, exist_ok=True)
+            files = {}
+            for name, tensor in checkpoint.pop("state_dict").items():
+                files[name] = f"{_tensor_digest(tensor)}.pt"
+                weight_path = os.path.join(weights_dir, files[name])
+                if not os.path.exists(weight_path):
+                    _atomic_torch_save(tensor, weight_path)
+            checkpoint["state_dict_files"] = files
+            # Weight files are referenced before the checkpoint exists, so a
+            # concurrent removal cannot collect them
+            index = self._read_index(weights_dir)
+            index[os.path.basename(path)] = sorted(set(files.values()))
+            self._write_index(weights_dir, index)
+            _atomic_torch_save(checkpoint, path)
+            # Files of the checkpoint this one replaced (e.g. last.ckpt)
+            self._collect_garbage(weights_dir, index)
+        else:
+            _atomic_torch_save(checkpoint, path)
+
+    def load_checkpoint(self, path, map_location=lambda storage, loc: storage, weights_only: Optional[bool] = None) -> Dict[str, Any]:
+        """Load a checkpoint once pending writes are done, resolving incremental weight files."""
+        self.wait()
+        checkpoint = super().load_checkpoint(path, map_location=map_location, weights_only=weights_only)
+        return resolve_weight_files(checkpoint, str(path), map_location)
+
+    def remove_checkpoint(self, path) -> None:
+        """Remove a checkpoint after the writes submitted before it."""
+        self._submit(self._remove, str(path))
+
+    def _remove(self, path: str) -> None:
+        """Remove a checkpoint, its sidecar and its unreferenced weight files (writer thread)."""
+        super().remove_checkpoint(path)
+        if os.path.exists(sidecar_path(path)):
+            os.remove(sidecar_path(path))
+        weights_dir = os.path.join(os.path.dirname(os.path.abspath(path)), WEIGHTS_DIR)
+        if not os.path.isdir(weights_dir):
+            return
+        index = self._read_index(weights_dir)
+        index.pop(os.path.basename(path), None)
+        self._write_index(weights_dir, index)
+        self._collect_garbage(weights_dir, index)
+
+    @staticmethod
+    def _collect_garbage(weights_dir: str, index: Dict[str, List[str]]) -> None:
+        """Delete weight files not referenced by any checkpoint."""
+        referenced = {filename for filenames in index.values() for filename in filenames}
+        for weight_path in glob.glob(os.path.join(weights_dir, "*.pt")):
+            if os.path.basename(weight_path) not in referenced:
+                os.remove(weight_path)
+
+    @staticmethod
+    def _read_index(weights_dir: str) -> Dict[str, List[str]]:
+        """Read the weight files referenced by each checkpoint."""
+        path = os.path.join(weights_dir, WEIGHTS_INDEX)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write_index(weights_dir: str, index: Dict[str, List[str]]) -> None:
+        """Write the weight file index atomically."""
+        path = os.path.join(weights_dir, WEIGHTS_INDEX)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def teardown(self) -> None:
+        """Wait for pending writes and stop the writer thread."""
+        try:
+            self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -1,7 +1,64 @@
 from enum import Enum
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 from pathlib import Path
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, ConfigDict, field_validator
+
+#: Training speed/reproducibility trade-offs selected by ``performance_profile``.
+#: Config keys with the same names override single settings of a profile.
+PERFORMANCE_PROFILES = {
+    # Deterministic kernels and full-precision float32 matmuls
+    "reproducible": {
+        "deterministic": True,
+        "matmul_precision": "highest",
+        "cudnn_benchmark": False,
+        "detect_anomaly": False,
+        "check_val_every_n_epoch": 1,
+        "log_every_n_steps": 50,
+    },
+    # Fastest kernels (autotuned convolutions, TF32 matmuls), same cadence
+    "fast": {
+        "deterministic": False,
+        "matmul_precision": "high",
+        "cudnn_benchmark": True,
+        "detect_anomaly": False,
+        "check_val_every_n_epoch": 1,
+        "log_every_n_steps": 50,
+    },
+    # Also validate and log less often
+    "max_throughput": {
+        "deterministic": False,
+        "matmul_precision": "medium",
+        "cudnn_benchmark": True,
+        "detect_anomaly": False,
+        "check_val_every_n_epoch": 5,
+        "log_every_n_steps": 200,
+    },
+}
+
+
+def resolve_performance_profile(config):
+    """Get the performance settings of a configuration.
+
+    Args:
+        config: Configuration object (``performance_profile``, default
+            ``reproducible``, and optional overrides of single settings)
+
+    Returns:
+        Dictionary with the profile name and all its settings
+
+    Raises:
+        ValueError: If the profile is unknown
+    """
+    name = getattr(config, "performance_profile", None) or "reproducible"
+    if name not in PERFORMANCE_PROFILES:
+        raise ValueError(
+            f"Unsupported performance profile: {name} (choose from {', '.join(PERFORMANCE_PROFILES)})"
+        )
+    settings = {
+        key: getattr(config, key, None) if getattr(config, key, None) is not None else default
+        for key, default in PERFORMANCE_PROFILES[name].items()
+    }
+    return {"name": name, **settings}
 
 
 class DataSourceEnum(str, Enum):
@@ -44,3 +101,54 @@ class ExperimentConfig(BaseModel):
         out_dir = Path(path)
         out_dir.mkdir(parents=True, exist_ok=True)
         return str(out_dir)
+
+
+class TrainerConfig(BaseModel):
+    """Configuration for training, evaluating and searching deep learning models.
+
+    Unknown keys from the YAML file are kept as attributes so that components
+    can read optional settings with ``getattr(config, name, default)``.
+    """
+
+    model_config = ConfigDict(extra="allow", protected_namespaces=())
+
+    # Project params
+    experiment_name: str = "experiment"
+    experiment_short_name: Optional[str] = None
+    task_type: str = "base"
+    output_dir: str = "model_runs/"
+    log_dir: str = "logs/"
+
+    # Data params
+    input_dirs: Union[str, List[str]] = []
+    image_size: Tuple[int, int] = (224, 224)
+    in_channels: int = 3
+    out_channels: int = 1
+    batch_size: int = 32
+    num_workers: int = 4
+    val_ratio: float = 0.2
+    test_ratio: Optional[float] = None
+
+    # Model params
+    model_name: str = "custom"
+    backbone_name: Optional[str] = None
+
+    # Optimization params
+    loss: str = "mse"
+    optimizer: str = "adam"
+    lr: float = 1e-3
+    weight_decay: float = 0.0
+    scheduler: Optional[str] = None
+    patience: int = 10
+    max_epochs: int = 100
+
+    # Compute params
+    seed: int = 42
+    gpu_ids: Optional[List[int]] = None
+    precision: Union[int, str] = 32
+
+    @field_validator("output_dir", "log_dir")
+    def validate_dirs(cls, path):
+        out_dir = Path(path)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        return str(out_dir)
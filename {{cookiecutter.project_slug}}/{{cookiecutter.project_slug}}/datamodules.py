@@ -4,20 +4,193 @@ PyTorch Lightning DataModules for handling training, validation, and test datase
 This module provides:
 - DataModule classes for organizing datasets
 - Train/val/test split functionality
-- DataLoader configuration
+- DataLoader configuration, with a sampler that resumes mid-epoch
+- Progressive resizing of training images
 - Data preprocessing and augmentation
 
 Customize these components for your specific data requirements.
 """
 
+import hashlib
+import os
 from typing import Dict, List, Optional, Union, Callable, Any, Tuple
 
 import lightning.pytorch as pl
+import numpy as np
 import torch
-from torch.utils.data import DataLoader, Dataset, random_split
-import torchvision.transforms as T
+import torch.distributed as dist
+from torch.utils.data import (
+    BatchSampler, DataLoader, Dataset, DistributedSampler, RandomSampler, SequentialSampler, Subset,
+    random_split
+)
+import torchvision.transforms.v2 as T
 
-from {{cookiecutter.project_slug}}.datasets import get_dataset, stack_samples
+from {{cookiecutter.project_slug}}.datasets import (
+    DecodedImageCache, get_dataset, stack_samples, use_preprocessed
+)
+
+
+def subsample_order(n, labels=None, seed=42):
+    """Get a random order of ``n`` samples whose prefixes are stratified.
+
+    Each sample gets a key equal to its (jittered) rank within its class
+    divided by the class size, so every prefix of the order holds each class
+    in proportion to its frequency.
+
+    Args:
+        n: Number of samples
+        labels: Per-sample labels used for stratification (optional)
+        seed: Random seed
+
+    Returns:
+        Array of sample indices
+    """
+    rng = np.random.default_rng(seed)
+    if labels is None:
+        return rng.permutation(n)
+    
+    labels = np.asarray(labels)
+    keys = np.empty(n, dtype=np.float64)
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        ranks = rng.permutation(len(members))
+        keys[members] = (ranks + rng.random(len(members))) / len(members)
+    return np.argsort(keys, kind="stable")
+
+
+def progressive_image_size(epoch, image_size, start_scale=0.5, ramp_epochs=1, multiple=32):
+    """Get the training image size of an epoch under progressive resizing.
+
+    The scale ramps linearly from ``start_scale`` at epoch 0 to 1 at epoch
+    ``ramp_epochs``. Reduced sizes are rounded to a multiple of ``multiple``,
+    so they (and the transforms built for them) only change every few epochs.
+
+    Args:
+        epoch: Current epoch
+        image_size: Target image size (int or (height, width))
+        start_scale: Scale of the first epoch
+        ramp_epochs: Epoch from which the target size is used
+        multiple: Round sizes to multiples of this
+
+    Returns:
+        Tuple of (height, width)
+    """
+    if isinstance(image_size, int):
+        image_size = (image_size, image_size)
+    progress = min(1.0, epoch / ramp_epochs) if ramp_epochs > 0 else 1.0
+    scale = start_scale + (1.0 - start_scale) * progress
+    if scale >= 1.0:
+        return tuple(image_size)
+    return tuple(
+        min(dim, max(multiple, int(round(scale * dim / multiple)) * multiple))
+        for dim in image_size
+    )
+
+
+class ResumableSampler(DistributedSampler):
+    """Shuffling sampler whose order can be resumed mid-epoch.
+
+    The order of every epoch is a permutation drawn from a generator seeded
+    with ``seed + epoch`` (sharded per rank under data-parallel training), so
+    the seed, the epoch and the number of samples already consumed are its
+    whole state. After ``load_state_dict`` the next iteration starts at the
+    saved position: skipped samples are never yielded, so they are not read.
+    """
+
+    def __init__(self, dataset, shuffle=True, seed=0):
+        """Initialize sampler.
+
+        Args:
+            dataset: Dataset to sample from
+            shuffle: Shuffle the samples every epoch
+            seed: Random seed, identical on all ranks
+        """
+        distributed = dist.is_available() and dist.is_initialized()
+        super().__init__(
+            dataset,
+            num_replicas=dist.get_world_size() if distributed else 1,
+            rank=dist.get_rank() if distributed else 0,
+            shuffle=shuffle,
+            seed=seed
+        )
+        self.start = 0
+    
+    def set_epoch(self, epoch):
+        """Set the epoch; a new epoch starts from its first sample."""
+        if epoch != self.epoch:
+            self.start = 0
+        super().set_epoch(epoch)
+    
+    def __iter__(self):
+        indices = list(super().__iter__())[self.start:]
+        # Only the first iteration after a resume is partial
+        self.start = 0
+        return iter(indices)
+    
+    def state_dict(self, position=0):
+        """Get the sampler state.
+        
+        Args:
+            position: Number of samples of the current epoch already consumed
+                by training (this rank)
+        
+        Returns:
+            Dictionary with the seed, epoch and position
+        """
+        if position >= self.num_samples:
+            # The epoch is complete: resume at the start of the next one
+            return {"seed": self.seed, "epoch": self.epoch + 1, "position": 0}
+        return {"seed": self.seed, "epoch": self.epoch, "position": position}
+    
+    def load_state_dict(self, state):
+        """Restore the sampler state; the next iteration resumes at its position."""
+        self.seed = state["seed"]
+        self.epoch = state["epoch"]
+        self.start = state["position"]
+
+
+class ValidationSampler(DistributedSampler):
+    """Sequential sampler over the whole dataset or a fixed subset of it.
+
+    ``full`` selects which one the next iteration covers, so intermediate
+    validations can run on a subsample while checkpoint validations see the
+    whole split. Its length is always that of the whole dataset (the limit
+    Lightning computes once); subsampled iterations simply end early.
+    """
+
+    def __init__(self, dataset, subset=None):
+        """Initialize sampler.
+
+        Args:
+            dataset: Dataset to sample from
+            subset: Indices iterated when ``full`` is False (None for all)
+        """
+        distributed = dist.is_available() and dist.is_initialized()
+        super().__init__(
+            dataset,
+            num_replicas=dist.get_world_size() if distributed else 1,
+            rank=dist.get_rank() if distributed else 0,
+            shuffle=False
+        )
+        self.subset = subset
+        self.full = True
+    
+    def __iter__(self):
+        if self.full or self.subset is None:
+            return super().__iter__()
+        indices = list(self.subset)
+        # Pad so that every rank gets the same number of samples
+        padding = -len(indices) % self.num_replicas
+        indices += indices[:padding]
+        return iter(indices[self.rank::self.num_replicas])
+
+
+def _dataset_labels(dataset):
+    """Get the per-sample labels of a dataset, resolving ``Subset`` wrappers (None if unknown)."""
+    if isinstance(dataset, Subset):
+        labels = _dataset_labels(dataset.dataset)
+        return None if labels is None else np.asarray(labels)[dataset.indices]
+    return getattr(dataset, "labels", None)
 
 
 class BaseDataModule(pl.LightningDataModule):
@@ -48,6 +221,36 @@ class BaseDataModule(pl.LightningDataModule):
         self.test_ratio = getattr(config, "test_ratio", None)
         self.image_size = getattr(config, "image_size", (224, 224))
         self.seed = getattr(config, "seed", 42)
+        self.preprocessed_dir = getattr(config, "preprocessed_dir", None)
+        self.frac = getattr(config, "frac", 1.0)
+        self.subsample_seed = getattr(config, "subsample_seed", self.seed)
+        self.subsample_cache_dir = getattr(config, "subsample_cache_dir", None)
+        self.decoded_cache_gb = getattr(config, "decoded_cache_gb", 0)
+        self.reuse_dataloaders = getattr(config, "reuse_dataloaders", False)
+        self.val_subsample = getattr(config, "val_subsample", 1.0)
+        self.progressive_resizing = getattr(config, "progressive_resizing", False)
+        self.resize_start_scale = getattr(config, "resize_start_scale", 0.5)
+        self.resize_ramp_epochs = getattr(config, "resize_ramp_epochs", None) or max(
+            1, getattr(config, "max_epochs", 2) // 2
+        )
+        self.resize_multiple = getattr(config, "resize_multiple", 32)
+        self.resize_batch_scaling = getattr(config, "resize_batch_scaling", True)
+        self.decoded_cache = None
+        self._source_dataset = None
+        self._dataloaders = {}
+        self._train_sampler = None
+        self._train_sampler_state = None
+        self._val_sampler = None
+        self._full_validation = True
+        self._subsample = None
+        self._train_image_size = None
+        
+        # Progressive resizing rebuilds the train transforms for each size
+        if self.progressive_resizing and train_transforms is not None:
+            raise ValueError(
+                "progressive_resizing rebuilds the default train transforms; "
+                "override _default_train_transforms instead of passing train_transforms"
+            )
         
         # Set up transforms
         self.train_transforms = train_transforms or self._default_train_transforms()
@@ -59,13 +262,19 @@ class BaseDataModule(pl.LightningDataModule):
         self.val_dataset = None
         self.test_dataset = None
     
-    def _default_train_transforms(self):
-        """Default transforms for training data."""
+    def _default_train_transforms(self, image_size=None):
+        """Default transforms for training data.
+        
+        Args:
+            image_size: Output size (defaults to ``image_size``; smaller
+                during progressive resizing)
+        """
         return T.Compose([
-            T.RandomResizedCrop(self.image_size, scale=(0.8, 1.0)),
+            T.RandomResizedCrop(image_size or self.image_size, scale=(0.8, 1.0)),
             T.RandomHorizontalFlip(),
             T.ColorJitter(brightness=0.1, contrast=0.1, saturation=0.1),
-            T.ToTensor(),
+            T.ToImage(),
+            T.ToDtype(torch.float32, scale=True),
             T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
         ])
     
@@ -73,7 +282,8 @@ class BaseDataModule(pl.LightningDataModule):
         """Default transforms for validation data."""
         return T.Compose([
             T.Resize(self.image_size),
-            T.ToTensor(),
+            T.ToImage(),
+            T.ToDtype(torch.float32, scale=True),
             T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
         ])
     
@@ -81,7 +291,8 @@ class BaseDataModule(pl.LightningDataModule):
         """Default transforms for test data."""
         return T.Compose([
             T.Resize(self.image_size),
-            T.ToTensor(),
+            T.ToImage(),
+            T.ToDtype(torch.float32, scale=True),
             T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
         ])
     
@@ -90,85 +301,288 @@ class BaseDataModule(pl.LightningDataModule):
         # Data download/preparation could be done here if needed
         pass
     
+    def _get_dataset(self, transforms):
+        """Get the dataset, using a preprocessed variant when one matches.
+
+        Variants are produced by ``scripts/preprocess.py`` under
+        ``config.preprocessed_dir`` and keyed by the deterministic prefix of
+        ``transforms``, so they are only used when the transforms still match.
+        Otherwise, with ``decoded_cache_gb`` set, decoded images are cached in
+        shared memory (see ``DecodedImageCache``).
+
+        ``input_dirs`` are scanned (and CSV indices read) on the first call
+        only; later calls share its path tables with other transforms.
+        """
+        if self._source_dataset is None:
+            self._source_dataset = get_dataset(self.config, transform=transforms)
+            dataset = self._source_dataset
+        else:
+            dataset = self._source_dataset.with_transforms(transforms)
+        preprocessed = use_preprocessed(dataset, self.preprocessed_dir)
+        if preprocessed is not dataset:
+            return preprocessed
+        
+        # Optionally keep decoded images in shared memory; one cache serves
+        # every split, since they index the same images, but only holds the
+        # ``frac`` subsample when training on one
+        if self.decoded_cache_gb > 0:
+            if self.decoded_cache is None:
+                if self.frac < 1.0 and self._subsample is None:
+                    self._subsample = self._subsample_indices(dataset)
+                indices = range(len(dataset)) if self._subsample is None else self._subsample
+                self.decoded_cache = DecodedImageCache(indices, int(self.decoded_cache_gb * 1024 ** 3))
+            dataset.decoded_cache = self.decoded_cache
+        return dataset
+
+    def _subsample_indices(self, dataset):
+        """Get the indices of a ``frac`` subsample of the dataset.
+
+        The sampling order is computed once per (image paths, labels, seed)
+        and cached in ``subsample_cache_dir``, so trials of a study share it.
+        Any fraction is a prefix of that order, so subsamples of increasing
+        ``frac`` are nested.
+        """
+        labels = getattr(dataset, "labels", None)
+        order = None
+        cache_path = None
+        if self.subsample_cache_dir:
+            digest = hashlib.sha1(dataset.image_paths.digest().encode())
+            if labels is not None:
+                digest.update("\0".join(map(str, labels)).encode())
+            cache_path = os.path.join(
+                self.subsample_cache_dir,
+                f"subsample_order_{self.subsample_seed}_{len(dataset)}_{digest.hexdigest()[:16]}.npy"
+            )
+            if os.path.exists(cache_path):
+                order = np.load(cache_path)
+        
+        if order is None:
+            order = subsample_order(len(dataset), labels, self.subsample_seed)
+            if cache_path is not None:
+                os.makedirs(self.subsample_cache_dir, exist_ok=True)
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp.npy"
+                np.save(tmp_path, order)
+                os.replace(tmp_path, cache_path)
+        
+        n_samples = max(1, int(round(self.frac * len(dataset))))
+        # Sorted so that files are read in their original order
+        return np.sort(order[:n_samples]).tolist()
+    
     def setup(self, stage=None):
         """Set up datasets - called on every GPU.
         
+        When the CSV index of the data has a ``split`` column (as written by
+        ``scripts/acquire.py``), its train, val and test rows form the splits
+        and ``val_ratio`` is ignored. Otherwise ``val_ratio`` of the data is
+        split off randomly for validation, and testing uses the validation
+        split, or all of the data if no training split was set up (e.g. in
+        ``evaluate.py``).
+        
         Args:
             stage: Current stage (fit, validate, test, predict)
         """
-        if stage == "fit" or stage is None:
+        # Datasets are kept when the datamodule is reused (e.g. across search trials)
+        if (stage == "fit" or stage is None) and self.train_dataset is None:
 
             # Create a single dataset for training and use random_split
-            full_dataset = get_dataset(self.config, transform=self.train_transforms)
+            full_dataset = self._get_dataset(self.train_transforms)
+            splits = getattr(full_dataset, "splits", None)
             
-            # Determine splits
-            dataset_size = len(full_dataset)
-            val_size = int(dataset_size * self.val_ratio)
-            train_size = dataset_size - val_size
+            # Optionally subsample the data (e.g. for fast hyperparameter search)
+            if self.frac < 1.0 and self._subsample is None:
+                self._subsample = self._subsample_indices(full_dataset)
+            indices = self._subsample
+            if indices is not None:
+                full_dataset = Subset(full_dataset, indices)
             
-            # Split dataset
-            generator = torch.Generator().manual_seed(self.seed)
-            self.train_dataset, self.val_dataset = random_split(
-                full_dataset, [train_size, val_size], generator=generator
-            )
+            if splits is not None:
+                # Use the splits recorded in the index; test rows never reach training
+                if indices is not None:
+                    splits = splits[indices]
+                self.train_dataset = Subset(full_dataset, np.flatnonzero(splits == "train").tolist())
+                self.val_dataset = Subset(full_dataset, np.flatnonzero(splits == "val").tolist())
+            else:
+                # Determine splits
+                dataset_size = len(full_dataset)
+                val_size = int(dataset_size * self.val_ratio)
+                train_size = dataset_size - val_size
+                
+                # Split dataset
+                generator = torch.Generator().manual_seed(self.seed)
+                self.train_dataset, self.val_dataset = random_split(
+                    full_dataset, [train_size, val_size], generator=generator
+                )
             
             # Apply validation transforms
             # Note: this is a simplified approach - for complex cases, you may need
             # to create separate datasets with different transforms
-            self.val_dataset.dataset = get_dataset(self.config, transform=self.val_transforms)
+            val_dataset = self._get_dataset(self.val_transforms)
+            if indices is not None:
+                val_dataset = Subset(val_dataset, indices)
+            self.val_dataset.dataset = val_dataset
         
         if stage == "test" or stage is None:
             # For test data, you can either:
-            # 1. Use a predetermined test split
-            # 2. Use a separate test dataset
+            # 1. Use a predetermined test split (the index's test rows)
+            # 2. Use a separate test dataset (all of the data, e.g. evaluate.py)
             # 3. Use the validation dataset as test
-            
-            # Option 3 (simplest) shown here:
             if self.test_dataset is None:
-                if self.val_dataset is None:
-                    full_dataset = get_dataset(self.config, transform=self.test_transforms)
-                    dataset_size = len(full_dataset)
-                    test_size = int(dataset_size * self.val_split)
-                    _, self.test_dataset = random_split(
-                        full_dataset, [dataset_size - test_size, test_size],
-                        generator=torch.Generator().manual_seed(self.seed)
-                    )
+                splits = getattr(self._source_dataset, "splits", None)
+                if splits is not None or self.val_dataset is None:
+                    full_dataset = self._get_dataset(self.test_transforms)
+                    splits = getattr(full_dataset, "splits", None)
+                    self.test_dataset = full_dataset
+                    if splits is not None:
+                        self.test_dataset = Subset(full_dataset, np.flatnonzero(splits == "test").tolist())
                 else:
-                    # Reuse validation dataset with test transforms
+                    # Reuse validation dataset
                     self.test_dataset = self.val_dataset
     
-    def train_dataloader(self):
-        """Create the training dataloader."""
-        return DataLoader(
-            self.train_dataset,
-            batch_size=self.batch_size,
-            shuffle=True,
-            num_workers=self.num_workers,
-            pin_memory=True,
-            collate_fn=stack_samples
+    def set_batch_size(self, batch_size):
+        """Change the batch size, including that of reused dataloaders."""
+        self.batch_size = batch_size
+        for name, loader in self._dataloaders.items():
+            loader.batch_sampler.batch_size = self._batch_size(name)
+    
+    def _batch_size(self, name):
+        """Get the batch size of a dataloader.
+        
+        With ``resize_batch_scaling``, the training batch size grows with the
+        inverse of the image area during progressive resizing, so every step
+        processes about as many pixels as at the target size.
+        """
+        if name != "train" or self._train_image_size is None or not self.resize_batch_scaling:
+            return self.batch_size
+        target_area = np.prod(progressive_image_size(0, self.image_size, start_scale=1.0))
+        return max(self.batch_size, int(self.batch_size * target_area / np.prod(self._train_image_size)))
+    
+    def _resize_train_dataset(self):
+        """Rebuild the training dataset for the current epoch's image size.
+        
+        The default train transforms are rebuilt for the new size (so images
+        are decoded at a reduced scale for it) and targets are resized to it.
+        The new dataset shares the path tables of the current one; nothing is
+        rebuilt while the size does not change.
+        """
+        epoch = self.trainer.current_epoch if self.trainer is not None else 0
+        size = progressive_image_size(
+            epoch, self.image_size, self.resize_start_scale, self.resize_ramp_epochs, self.resize_multiple
         )
+        if size == self._train_image_size:
+            return
+        self._train_image_size = size
+        
+        dataset = self._get_dataset(self._default_train_transforms(size))
+        dataset.set_image_size(size)
+        if self._subsample is not None:
+            dataset = Subset(dataset, self._subsample)
+        self.train_dataset.dataset = dataset
+        
+        # Reused workers hold a copy of the previous dataset
+        self._dataloaders.pop("train", None)
+    
+    def _dataloader(self, name, dataset, shuffle):
+        """Create a dataloader, or return the reused one.
+        
+        With ``reuse_dataloaders``, loaders are created once with persistent
+        workers and a batch sampler whose batch size can be changed, so
+        repeated fits (e.g. search trials) keep the same worker processes.
+        """
+        if not self.reuse_dataloaders:
+            sampler = self._sampler(name, dataset, shuffle)
+            return DataLoader(
+                dataset,
+                batch_size=self._batch_size(name),
+                sampler=sampler,
+                num_workers=self.num_workers,
+                pin_memory=True,
+                collate_fn=stack_samples
+            )
+        
+        if name not in self._dataloaders:
+            sampler = self._sampler(name, dataset, shuffle)
+            self._dataloaders[name] = DataLoader(
+                dataset,
+                batch_sampler=BatchSampler(sampler, self._batch_size(name), drop_last=False),
+                num_workers=self.num_workers,
+                pin_memory=True,
+                persistent_workers=self.num_workers > 0,
+                collate_fn=stack_samples
+            )
+        return self._dataloaders[name]
+    
+    def _sampler(self, name, dataset, shuffle):
+        """Create the sampler of a dataloader.
+        
+        Under data-parallel training every rank gets a disjoint shard of the
+        dataset (reshuffled each epoch with the same seed on all ranks).
+        The training loader uses a ``ResumableSampler`` and the validation
+        loader a ``ValidationSampler``.
+        """
+        if name == "train":
+            self._train_sampler = ResumableSampler(dataset, shuffle=shuffle, seed=self.seed)
+            return self._train_sampler
+        if name == "val":
+            self._val_sampler = ValidationSampler(dataset, self._val_subset(dataset))
+            self._val_sampler.full = self._full_validation
+            return self._val_sampler
+        if dist.is_available() and dist.is_initialized() and dist.get_world_size() > 1:
+            return DistributedSampler(dataset, shuffle=shuffle, seed=self.seed)
+        return RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    
+    def _val_subset(self, dataset):
+        """Get the fixed, stratified ``val_subsample`` of the validation split (None for all of it)."""
+        if self.val_subsample >= 1.0:
+            return None
+        order = subsample_order(len(dataset), _dataset_labels(dataset), self.seed)
+        n_samples = max(1, int(round(self.val_subsample * len(dataset))))
+        # Sorted so that files are read in their original order
+        return np.sort(order[:n_samples]).tolist()
+    
+    def set_full_validation(self, full):
+        """Validate on the whole split (True) or on the ``val_subsample`` (False)."""
+        self._full_validation = full
+        if self._val_sampler is not None:
+            self._val_sampler.full = full
+    
+    def train_dataloader(self):
+        """Create the training dataloader, resuming a restored sampler state.
+        
+        With ``progressive_resizing``, the image size and batch size follow
+        the current epoch: the trainer must reload dataloaders every epoch
+        (``reload_dataloaders_every_n_epochs=1``).
+        """
+        if self.progressive_resizing:
+            self._resize_train_dataset()
+        loader = self._dataloader("train", self.train_dataset, shuffle=True)
+        if self._train_sampler_state is not None:
+            self._train_sampler.load_state_dict(self._train_sampler_state)
+            self._train_sampler_state = None
+        return loader
     
     def val_dataloader(self):
         """Create the validation dataloader."""
-        return DataLoader(
-            self.val_dataset,
-            batch_size=self.batch_size,
-            shuffle=False,
-            num_workers=self.num_workers,
-            pin_memory=True,
-            collate_fn=stack_samples
-        )
+        return self._dataloader("val", self.val_dataset, shuffle=False)
     
     def test_dataloader(self):
         """Create the test dataloader."""
-        return DataLoader(
-            self.test_dataset,
-            batch_size=self.batch_size,
-            shuffle=False,
-            num_workers=self.num_workers,
-            pin_memory=True,
-            collate_fn=stack_samples
-        )
+        return self._dataloader("test", self.test_dataset, shuffle=False)
+    
+    def state_dict(self):
+        """Save the training sampler state in checkpoints.
+        
+        The position counts the batches the training loop has processed, not
+        those prefetched by the dataloader, so a mid-epoch checkpoint resumes
+        at the first batch it has not trained on.
+        """
+        if self._train_sampler is None or self.trainer is None:
+            return {}
+        processed = self.trainer.fit_loop.epoch_loop.batch_progress.current.processed
+        return {"train_sampler": self._train_sampler.state_dict(processed * self._batch_size("train"))}
+    
+    def load_state_dict(self, state_dict):
+        """Restore the training sampler state (applied to the next training dataloader)."""
+        self._train_sampler_state = state_dict.get("train_sampler")
 
 
 def get_datamodule(config, **kwargs):
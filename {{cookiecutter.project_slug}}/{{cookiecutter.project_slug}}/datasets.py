@@ -3,22 +3,33 @@ Dataset utilities for loading and preprocessing data.
 
 This module provides base dataset classes and utility functions for:
 - Loading image data from disk or remote sources
-- Preprocessing and augmenting data
+- Storing file paths compactly for DataLoader workers
+- Preprocessing and augmenting data, jointly for images and target masks
 - Converting between different data formats
 
 Customize these classes for your specific data structure and tasks.
 """
 
+import hashlib
+import multiprocessing
 import os
-from typing import Dict, List, Callable, Optional, Tuple, Union
+import shutil
+import tempfile
+import weakref
+from collections.abc import Sequence
+from typing import Dict, Iterable, List, Callable, Optional, Tuple, Union
 
 import numpy as np
 import torch
 from torch.utils.data import Dataset
-import torchvision.transforms as T
+from torchvision import tv_tensors
+import torchvision.transforms.v2 as T
 from PIL import Image
 import pandas as pd
 
+from {{cookiecutter.project_slug}}.decoding import ImageDecoder, reduced_size
+from {{cookiecutter.project_slug}}.preprocessing import MEMMAP_NAME, find_preprocessed, split_transforms
+
 
 def stack_samples(samples):
     """Stack a list of samples into a batch.
@@ -38,38 +49,181 @@ def stack_samples(samples):
     return batch
 
 
+def _pack(items: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack byte strings into one uint8 array and an offsets array."""
+    ends = np.cumsum([len(item) for item in items], dtype=np.int64)
+    # 32-bit offsets unless the data needs more
+    dtype = np.int32 if len(ends) == 0 or ends[-1] < 2 ** 31 else np.int64
+    offsets = np.zeros(len(items) + 1, dtype=dtype)
+    offsets[1:] = ends
+    return np.frombuffer(b"".join(items), dtype=np.uint8), offsets
+
+
+class PathTable(Sequence):
+    """Compact, read-only table of file paths.
+
+    Paths are stored encoded in one uint8 array plus an offsets array instead
+    of one Python ``str`` per path. Python objects are refcounted on every
+    access, so a list of millions of paths gets copied page by page into each
+    forked DataLoader worker; a few NumPy arrays stay shared. With
+    ``share_prefixes``, each directory is stored once and entries keep the
+    index of their directory and their file name. Path strings are only built
+    when an entry is read.
+    """
+
+    def __init__(self, paths: Iterable[str], share_prefixes: bool = True):
+        """Initialize table.
+
+        Args:
+            paths: File paths, in order (any iterable, consumed once)
+            share_prefixes: Store each directory prefix once
+        """
+        names = []
+        directories = {}
+        directory_ids = []
+        for path in paths:
+            path = os.fspath(path)
+            if share_prefixes:
+                cut = max(path.rfind(os.sep), path.rfind(os.altsep) if os.altsep else -1) + 1
+                directory_ids.append(directories.setdefault(path[:cut], len(directories)))
+                path = path[cut:]
+            names.append(os.fsencode(path))
+
+        self._names, self._name_offsets = _pack(names)
+        self._directories, self._directory_offsets = _pack([os.fsencode(d) for d in directories])
+        self._directory_ids = None
+        if share_prefixes:
+            self._directory_ids = np.asarray(directory_ids, dtype=np.min_scalar_type(len(directories)))
+
+    @staticmethod
+    def _entry(data: np.ndarray, offsets: np.ndarray, idx: int) -> bytes:
+        return data[offsets[idx]:offsets[idx + 1]].tobytes()
+
+    def __len__(self):
+        return len(self._name_offsets) - 1
+
+    def __getitem__(self, idx):
+        """Get the path at ``idx`` (a list of paths for a slice)."""
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("PathTable index out of range")
+        path = self._entry(self._names, self._name_offsets, idx)
+        if self._directory_ids is not None:
+            directory = self._directory_ids[idx]
+            path = self._entry(self._directories, self._directory_offsets, directory) + path
+        return os.fsdecode(path)
+
+    def _arrays(self) -> List[np.ndarray]:
+        arrays = [self._names, self._name_offsets, self._directories, self._directory_offsets]
+        if self._directory_ids is not None:
+            arrays.append(self._directory_ids)
+        return arrays
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the table's arrays."""
+        return sum(array.nbytes for array in self._arrays())
+
+    def digest(self) -> str:
+        """Get a hex digest of the table; tables built from the same paths share it."""
+        digest = hashlib.sha1()
+        for array in self._arrays():
+            digest.update(array.dtype.str.encode())
+            digest.update(np.ascontiguousarray(array).data)
+        return digest.hexdigest()
+
+    def __repr__(self):
+        return f"PathTable({len(self)} paths, {self.nbytes} bytes)"
+
+
 class BaseImageDataset(Dataset):
-    """Base dataset for loading images and targets."""
+    """Base dataset for loading images and targets.
+
+    Targets are masks loaded as (1, H, W) uint8 tensors. With ``torchvision``
+    v2 transforms, each sample's image and mask go through the transforms
+    together: random geometric transforms draw their parameters once for
+    both, masks are resized with nearest-neighbor interpolation and skipped
+    by color and dtype transforms. With other transforms, masks are only
+    resized to ``image_size``.
+    """
 
     def __init__(
         self,
-        image_paths: List[str],
-        target_paths: Optional[List[str]] = None,
+        image_paths: Sequence[str],
+        target_paths: Optional[Sequence[str]] = None,
         transforms: Optional[Callable] = None,
         image_size: Tuple[int, int] = (224, 224),
+        labels: Optional[List] = None,
+        decoder: Optional[ImageDecoder] = None,
+        splits: Optional[Sequence[str]] = None,
     ):
         """Initialize dataset.
 
         Args:
-            image_paths: List of paths to images
-            target_paths: List of paths to targets (optional)
+            image_paths: List of paths to images (stored as a PathTable)
+            target_paths: List of paths to targets (optional, stored as a PathTable)
             transforms: Transforms to apply
             image_size: Size to resize images to
+            labels: Per-image labels used for stratified sampling (optional)
+            decoder: Image decoder (defaults to automatic backend selection)
+            splits: Per-image split (train, val or test) from a CSV index (optional)
         """
+        if not isinstance(image_paths, PathTable):
+            image_paths = PathTable(image_paths)
+        if target_paths is not None and not isinstance(target_paths, PathTable):
+            target_paths = PathTable(target_paths)
         self.image_paths = image_paths
         self.target_paths = target_paths
         self.transforms = transforms
-        self.image_size = image_size
+        self.labels = labels
+        self.decoder = decoder or ImageDecoder()
+        self.splits = None if splits is None else np.asarray(splits)
 
         # Default transforms if none provided
         if self.transforms is None:
             self.transforms = T.Compose(
                 [
                     T.Resize(image_size),
-                    T.ToTensor(),
+                    T.ToImage(),
+                    T.ToDtype(torch.float32, scale=True),
                     T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
                 ]
             )
+        self.joint_transforms = isinstance(self.transforms, T.Transform)
+        self.set_image_size(image_size)
+
+    def with_transforms(self, transforms: Optional[Callable], image_size: Optional[Tuple[int, int]] = None):
+        """Get a dataset of the same original images with other transforms.
+
+        The path tables, labels and decoder are shared rather than rebuilt,
+        so no directory is scanned and no index is read again.
+
+        Args:
+            transforms: Transforms to apply (None for the defaults)
+            image_size: Size to resize targets to (defaults to this dataset's)
+
+        Returns:
+            BaseImageDataset instance
+        """
+        return BaseImageDataset(
+            image_paths=self.image_paths,
+            target_paths=self.target_paths,
+            transforms=transforms,
+            image_size=image_size or self.image_size,
+            labels=self.labels,
+            decoder=self.decoder,
+            splits=self.splits,
+        )
+
+    def set_image_size(self, image_size):
+        """Set the size targets are resized to when transforms are not joint."""
+        self.image_size = image_size
+        # Built once, not per sample; v2 resizes masks with nearest neighbors
+        self.target_transforms = None if self.joint_transforms else T.Resize(image_size)
 
     def __len__(self):
         return len(self.image_paths)
@@ -85,31 +239,277 @@ class BaseImageDataset(Dataset):
         """
         # Load image
         img_path = self.image_paths[idx]
-        image = Image.open(img_path).convert("RGB")
+        image = self._load_image(idx)
+
+        if self.target_paths is None:
+            return {"image": self.transforms(image), "path": img_path}
+
+        # Transform the image and its target together
+        target = self._load_target(idx)
+        if self.joint_transforms:
+            width, height = image.size
+            if tuple(target.shape[-2:]) != (height, width):
+                # The image was decoded at a reduced scale
+                target = T.functional.resize(target, [height, width])
+            image, target = self.transforms(image, target)
+        else:
+            image = self.transforms(image)
+            target = self.target_transforms(target)
+
+        return {"image": image, "path": img_path, "target": target.as_subclass(torch.Tensor)}
+
+    def _load_target(self, idx):
+        """Load the target at ``idx`` as a (1, H, W) uint8 mask."""
+        with Image.open(self.target_paths[idx]) as target:
+            pixels = np.array(target.convert("L"), dtype=np.uint8)
+        return tv_tensors.Mask(torch.from_numpy(pixels)[None])
+
+    def _load_image(self, idx):
+        """Load the image at ``idx`` as an RGB PIL image.
+
+        Images are decoded at a reduced scale when the transforms resize them
+        anyway, except with a decoded cache (which holds full-size images).
+        """
+        cache = getattr(self, "decoded_cache", None)
+        if cache is not None:
+            image = cache.get(idx)
+            if image is not None:
+                return image
+        min_size = reduced_size(self.transforms) if cache is None else None
+        image = self.decoder(self.image_paths[idx], min_size)
+        if cache is not None:
+            cache.put(idx, image)
+        return image
 
-        # Apply transforms
-        image = self.transforms(image)
 
-        # Create sample dictionary
-        sample = {"image": image, "path": img_path}
+class DecodedImageCache:
+    """Decoded RGB images kept in shared memory across DataLoader workers.
+
+    Only the images at ``indices`` (e.g. a ``frac`` subsample) are cached.
+    Slots are allocated as workers decode images, so no file is opened up
+    front: pixels go to a sparse file in shared memory that each process maps
+    itself, and only cached images take up memory. Later epochs (and later
+    fits reusing the dataset, e.g. search trials) read decoded pixels instead
+    of decoding files again. Images that do not fit in the memory budget are
+    simply not cached.
+    """
+
+    def __init__(self, indices: Iterable[int], max_bytes: int):
+        """Initialize cache.
+
+        Args:
+            indices: Dataset indices of the images that may be cached
+            max_bytes: Memory budget for decoded pixels
+        """
+        self.indices = np.unique(np.fromiter(indices, dtype=np.int64))
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        # Writing past the free space of the file system would crash workers
+        self.max_bytes = min(int(max_bytes), shutil.disk_usage(directory).free)
 
-        # Load target if available
-        if self.target_paths is not None:
-            target_path = self.target_paths[idx]
-            target = Image.open(target_path).convert("L")
-            target = T.Resize(self.image_size)(target)
-            target = T.ToTensor()(target)
-            sample["target"] = target
+        # Offset, width and height of each slot's pixels (offset -1: no pixels)
+        self.slots = torch.full((len(self.indices), 3), -1, dtype=torch.int64).share_memory_()
+        self.filled = torch.zeros(len(self.indices), dtype=torch.bool).share_memory_()
+        self.end = torch.zeros(1, dtype=torch.int64).share_memory_()
+        self.lock = multiprocessing.Lock()
 
-        return sample
+        fd, self.path = tempfile.mkstemp(prefix="decoded-images-", dir=directory)
+        os.ftruncate(fd, self.max_bytes)
+        os.close(fd)
+        weakref.finalize(self, _remove_owned_file, self.path, os.getpid())
+        self.pixels = None
 
+    def __getstate__(self):
+        """Drop the memory map; each worker maps the file itself."""
+        state = self.__dict__.copy()
+        state["pixels"] = None
+        return state
 
-def get_dataset(config, transform=None):
+    def _slot(self, idx):
+        """Get the slot of dataset index ``idx`` (None if it is not cached)."""
+        slot = int(np.searchsorted(self.indices, idx))
+        if slot < len(self.indices) and self.indices[slot] == idx:
+            return slot
+        return None
+
+    def _pixels(self):
+        """Map the pixel file on first use in this process."""
+        if self.pixels is None:
+            self.pixels = np.memmap(self.path, dtype=np.uint8, mode="r+", shape=(self.max_bytes,))
+        return self.pixels
+
+    def get(self, idx):
+        """Get the decoded image at ``idx``, or None if it is not cached yet."""
+        slot = self._slot(idx)
+        if slot is None or not self.filled[slot]:
+            return None
+        offset, width, height = self.slots[slot].tolist()
+        pixels = self._pixels()[offset:offset + width * height * 3]
+        return Image.fromarray(pixels.reshape(height, width, 3))
+
+    def put(self, idx, image):
+        """Store the decoded RGB image at ``idx`` if it may be cached and fits."""
+        slot = self._slot(idx)
+        if slot is None or image.mode != "RGB":
+            return
+        width, height = image.size
+        nbytes = width * height * 3
+        with self.lock:
+            if self.slots[slot, 0] >= 0:
+                # Another worker is storing it
+                return
+            offset = int(self.end[0])
+            if offset + nbytes > self.max_bytes:
+                return
+            self.end[0] = offset + nbytes
+            self.slots[slot] = torch.tensor([offset, width, height])
+        self._pixels()[offset:offset + nbytes] = np.asarray(image, dtype=np.uint8).reshape(-1)
+        self.filled[slot] = True
+
+
+def _remove_owned_file(path, pid):
+    """Remove ``path`` unless running in a process forked from its owner."""
+    if os.getpid() == pid and os.path.exists(path):
+        os.remove(path)
+
+
+class PreprocessedImageDataset(BaseImageDataset):
+    """Dataset reading images produced by ``preprocessing.preprocess_images``.
+
+    The deterministic part of the transform chain has already been applied
+    offline, so only the remaining transforms run per sample. Sample paths
+    still refer to the original images.
+    """
+
+    def __init__(
+        self,
+        image_paths: Sequence[str],
+        preprocessed_dir: str,
+        manifest: Dict,
+        target_paths: Optional[Sequence[str]] = None,
+        transforms: Optional[Callable] = None,
+        image_size: Tuple[int, int] = (224, 224),
+        labels: Optional[List] = None,
+        target_prefix: Optional[Callable] = None,
+        splits: Optional[Sequence[str]] = None,
+    ):
+        """Initialize dataset.
+
+        Args:
+            image_paths: List of paths to the original images
+            preprocessed_dir: Directory of the preprocessed variant
+            manifest: Manifest of the preprocessed variant
+            target_paths: List of paths to targets (optional)
+            transforms: Remaining (non-deterministic) transforms to apply
+            image_size: Size to resize targets to
+            labels: Per-image labels used for stratified sampling (optional)
+            target_prefix: Deterministic transforms already applied to the
+                images, applied to targets at load time (joint transforms only)
+            splits: Per-image split (train, val or test) from a CSV index (optional)
+        """
+        super().__init__(
+            image_paths, target_paths, transforms or T.Identity(), image_size, labels, splits=splits
+        )
+        self.target_prefix = target_prefix
+        self.preprocessed_dir = preprocessed_dir
+        self.format = manifest["format"]
+        # Mode the deterministic prefix produced (older manifests: RGB)
+        self.mode = manifest.get("mode", "RGB")
+        self.images = None
+
+    def _load_image(self, idx):
+        """Load the preprocessed image at ``idx``."""
+        if self.format == "memmap":
+            # Opened lazily so that each DataLoader worker maps the file itself
+            if self.images is None:
+                self.images = np.load(
+                    os.path.join(self.preprocessed_dir, MEMMAP_NAME), mmap_mode="r"
+                )
+            return Image.fromarray(np.asarray(self.images[idx]))
+        path = os.path.join(self.preprocessed_dir, f"{idx:08d}.{self.format}")
+        image = Image.open(path)
+        # Formats without a grayscale mode (WebP) store L images as RGB
+        return image if image.mode == self.mode else image.convert(self.mode)
+
+    def _load_target(self, idx):
+        """Load the target at ``idx``, aligned with the preprocessed image."""
+        target = super()._load_target(idx)
+        if self.joint_transforms and self.target_prefix is not None:
+            target = self.target_prefix(target)
+        return target
+
+
+def use_preprocessed(dataset, preprocessed_dir):
+    """Swap a dataset for its preprocessed variant if one matches.
+
+    Args:
+        dataset: BaseImageDataset instance
+        preprocessed_dir: Root directory of preprocessed variants (or None)
+
+    Returns:
+        PreprocessedImageDataset if a matching variant exists, else ``dataset``
+    """
+    found = find_preprocessed(preprocessed_dir, dataset.transforms, dataset.image_paths)
+    if found is None:
+        return dataset
+    manifest, variant_dir, remaining = found
+    prefix, _ = split_transforms(dataset.transforms)
+    return PreprocessedImageDataset(
+        image_paths=dataset.image_paths,
+        preprocessed_dir=variant_dir,
+        manifest=manifest,
+        target_paths=dataset.target_paths,
+        transforms=remaining,
+        image_size=dataset.image_size,
+        labels=dataset.labels,
+        target_prefix=T.Compose(prefix),
+        splits=dataset.splits,
+    )
+
+
+def read_index(index_path, split=None):
+    """Read image (and optional target) paths from a CSV index.
+
+    The index is the one written by ``scripts/acquire.py``: an ``image_path``
+    column, and optional ``target_path``, ``label`` and ``split`` columns.
+
+    Args:
+        index_path: Path to the CSV index
+        split: Only keep rows of this split (train, val, test) if given
+
+    Returns:
+        Tuple of (image_paths, target_paths, labels, splits), the latter
+        three are None if absent
+    """
+    index = pd.read_csv(index_path)
+    if split is not None and "split" in index.columns:
+        index = index[index["split"] == split]
+
+    base_dir = os.path.dirname(os.path.abspath(index_path))
+
+    def resolve(path):
+        return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+    image_paths = [resolve(p) for p in index["image_path"]]
+    target_paths = None
+    if "target_path" in index.columns:
+        target_paths = [resolve(p) for p in index["target_path"]]
+    labels = index["label"].tolist() if "label" in index.columns else None
+    splits = index["split"].astype(str).tolist() if "split" in index.columns else None
+    return image_paths, target_paths, labels, splits
+
+
+def get_dataset(config, transform=None, split=None):
     """Get dataset based on configuration.
 
+    Each entry of ``config.input_dirs`` may be a directory of images, a CSV
+    index file, or a directory containing an ``index.csv`` (as produced by
+    ``scripts/acquire.py``). The ``split`` column of the indices is kept as
+    the dataset's ``splits`` when every image has one.
+
     Args:
         config: Configuration object
         transform: Optional transforms to apply
+        split: Only keep this split when reading CSV indices (optional)
 
     Returns:
         Dataset instance
@@ -124,11 +524,28 @@ def get_dataset(config, transform=None):
 
     image_paths = []
     target_paths = []
+    labels = []
+    splits = []
 
     for directory in input_dirs:
         if not os.path.exists(directory):
             continue
 
+        # CSV indices take precedence over listing the directory
+        index_path = directory
+        if os.path.isdir(directory):
+            index_path = os.path.join(directory, "index.csv")
+        if index_path.lower().endswith(".csv") and os.path.isfile(index_path):
+            index_images, index_targets, index_labels, index_splits = read_index(index_path, split=split)
+            image_paths.extend(index_images)
+            if index_targets is not None:
+                target_paths.extend(index_targets)
+            if index_labels is not None:
+                labels.extend(index_labels)
+            if index_splits is not None:
+                splits.extend(index_splits)
+            continue
+
         # Find all images with common extensions
         for ext in ["jpg", "jpeg", "png", "tif", "tiff"]:
             image_paths.extend(
@@ -139,9 +556,23 @@ def get_dataset(config, transform=None):
                 ]
             )
 
+    # Targets, labels and splits are only usable if every image has one
+    if len(target_paths) != len(image_paths):
+        target_paths = None
+    if len(labels) != len(image_paths):
+        labels = None
+    if len(splits) != len(image_paths):
+        splits = None
+
     return BaseImageDataset(
         image_paths=image_paths,
-        target_paths=None,
+        target_paths=target_paths or None,
         transforms=transform,
         image_size=getattr(config, "image_size", (224, 224)),
+        labels=labels or None,
+        decoder=ImageDecoder(
+            getattr(config, "decode_backend", "auto"),
+            reduced=getattr(config, "reduced_decoding", True)
+        ),
+        splits=splits or None,
     )
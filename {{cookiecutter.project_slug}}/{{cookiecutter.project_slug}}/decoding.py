@@ -0,0 +1,188 @@
+"""
+Image decoding backends.
+
+This module provides:
+- Decoders turning image files into RGB PIL images with PIL, torchvision
+  (``torchvision.io.decode_image`` on raw bytes) or libjpeg-turbo
+  (``PyTurboJPEG``, optional)
+- Automatic selection of the backend per file format
+- The smallest size an image can be decoded at before a transform chain
+  resizes it anyway
+
+JPEGs can be decoded at 1/2, 1/4 or 1/8 scale at a fraction of the cost of a
+full decode: when the first transform resizes to ``image_size``, large JPEGs
+are decoded at the smallest scale that is still at least as large, instead of
+decoding every pixel and throwing most of them away in ``Resize``.
+"""
+
+import math
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+import torchvision.transforms as T
+from torchvision.transforms import v2
+from PIL import Image
+from torchvision.io import ImageReadMode, decode_image, read_file
+
+try:
+    from turbojpeg import TJPF_RGB, TurboJPEG
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    TURBOJPEG_AVAILABLE = False
+
+DECODE_BACKENDS = ("auto", "pil", "torchvision", "turbojpeg")
+
+#: File extensions of each recognized image format.
+FORMAT_EXTENSIONS = {
+    "jpeg": (".jpg", ".jpeg"),
+    "png": (".png",),
+    "tiff": (".tif", ".tiff"),
+    "webp": (".webp",),
+}
+
+
+def image_format(path: str) -> str:
+    """Get the format of an image file from its extension (``other`` if unknown)."""
+    extension = os.path.splitext(path)[1].lower()
+    for fmt, extensions in FORMAT_EXTENSIONS.items():
+        if extension in extensions:
+            return fmt
+    return "other"
+
+
+def reduced_size(transforms) -> Optional[Tuple[int, int]]:
+    """Get the smallest (width, height) images can be decoded at for a transform chain.
+
+    Only chains starting with a resize qualify: ``Resize`` needs at least its
+    output size, ``RandomResizedCrop`` enough margin for its smallest crop
+    (``scale`` and ``ratio`` lower bounds) to still cover its output size.
+
+    Args:
+        transforms: A ``T.Compose`` or ``v2.Compose`` (or single transform)
+
+    Returns:
+        Minimum (width, height), or None if images must be decoded at full size
+    """
+    step = transforms
+    if isinstance(transforms, (T.Compose, v2.Compose)):
+        if not transforms.transforms:
+            return None
+        step = transforms.transforms[0]
+
+    if isinstance(step, (T.RandomResizedCrop, v2.RandomResizedCrop)):
+        height, width = step.size
+        aspect = min(step.ratio[0], 1.0 / step.ratio[1])
+        factor = 1.0 / math.sqrt(step.scale[0] * aspect)
+        return math.ceil(width * factor), math.ceil(height * factor)
+    if isinstance(step, (T.Resize, v2.Resize)):
+        size = step.size
+        if size is None:
+            # v2 Resize with only max_size
+            return None
+        if isinstance(size, int) or len(size) == 1:
+            # The shorter side is resized to the size
+            side = size if isinstance(size, int) else size[0]
+            return side, side
+        height, width = size
+        return width, height
+    return None
+
+
+def decode_pil(path: str, min_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Decode an image with PIL; JPEGs at a reduced scale (``draft``) if ``min_size`` is given."""
+    image = Image.open(path)
+    if min_size is not None:
+        # JPEGs decode at the smallest 1/2, 1/4 or 1/8 scale still at least
+        # min_size; other formats ignore it
+        image.draft("RGB", min_size)
+    return image.convert("RGB")
+
+
+def decode_torchvision(path: str, min_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Decode an image from its raw bytes with ``torchvision.io`` (always at full size)."""
+    pixels = decode_image(read_file(path), mode=ImageReadMode.RGB)
+    return Image.fromarray(pixels.permute(1, 2, 0).numpy())
+
+
+class ImageDecoder:
+    """Decode image files to RGB PIL images with a configurable backend.
+
+    With ``auto``, JPEGs use libjpeg-turbo if ``PyTurboJPEG`` is installed and
+    PIL otherwise (both decode at a reduced scale), and other formats use PIL;
+    files that libjpeg-turbo fails on (e.g. CMYK JPEGs) fall back to PIL.
+    """
+
+    def __init__(self, backend: str = "auto", reduced: bool = True):
+        """Initialize decoder.
+
+        Args:
+            backend: One of ``DECODE_BACKENDS``
+            reduced: Decode at a reduced scale when a minimum size is given
+        """
+        if backend not in DECODE_BACKENDS:
+            raise ValueError(f"Unknown decode backend: {backend} (expected one of {DECODE_BACKENDS})")
+        if backend == "turbojpeg" and not TURBOJPEG_AVAILABLE:
+            raise ImportError("The turbojpeg backend requires PyTurboJPEG: pip install PyTurboJPEG")
+        self.backend = backend
+        self.reduced = reduced
+        self._turbojpeg = None
+
+    def __getstate__(self):
+        # The libjpeg-turbo handle is not picklable; each process opens its own
+        state = self.__dict__.copy()
+        state["_turbojpeg"] = None
+        return state
+
+    def backend_for(self, path: str) -> str:
+        """Get the backend used for a file."""
+        if self.backend != "auto":
+            return self.backend
+        if image_format(path) == "jpeg" and TURBOJPEG_AVAILABLE:
+            return "turbojpeg"
+        # PNG decoding is bound by zlib, which torchvision does not speed up
+        return "pil"
+
+    def decode_turbojpeg(self, path: str, min_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """Decode a JPEG with libjpeg-turbo, at the smallest scale still at least ``min_size``."""
+        if self._turbojpeg is None:
+            self._turbojpeg = TurboJPEG()
+        with open(path, "rb") as f:
+            data = f.read()
+
+        scaling_factor = None
+        if min_size is not None:
+            width, height = self._turbojpeg.decode_header(data)[:2]
+            for num, denom in sorted(self._turbojpeg.scaling_factors, key=lambda f: f[0] / f[1]):
+                if num >= denom:
+                    break
+                if (math.ceil(width * num / denom) >= min_size[0]
+                        and math.ceil(height * num / denom) >= min_size[1]):
+                    scaling_factor = (num, denom)
+                    break
+        pixels = self._turbojpeg.decode(data, pixel_format=TJPF_RGB, scaling_factor=scaling_factor)
+        return Image.fromarray(np.ascontiguousarray(pixels))
+
+    def __call__(self, path: str, min_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """Decode an image.
+
+        Args:
+            path: Path to the image
+            min_size: Minimum (width, height) the image may be decoded at
+                (None for full size)
+
+        Returns:
+            RGB PIL image
+        """
+        if not self.reduced:
+            min_size = None
+        backend = self.backend_for(path)
+        try:
+            if backend == "turbojpeg":
+                return self.decode_turbojpeg(path, min_size)
+            if backend == "torchvision":
+                return decode_torchvision(path, min_size)
+        except (OSError, RuntimeError):
+            if self.backend != "auto":
+                raise
+        return decode_pil(path, min_size)
@@ -0,0 +1,128 @@
+"""
+Multi-process data-parallel training on CPU.
+
+This module provides:
+- Splitting the available cores into disjoint sets, one per process
+- A callback pinning every training process to its own core set
+- A gloo DDP strategy for CPU training that can rendezvous through a shared
+  file, so multi-node runs need no launcher or open main port
+
+One process with many intra-op threads scales poorly beyond a few cores;
+several processes with disjoint cores, each on its shard of the data and
+all-reducing gradients, keep every core busy.
+"""
+
+import os
+from typing import List, Optional, Set
+
+import lightning.pytorch as pl
+import torch
+import torch.distributed as dist
+from lightning.pytorch.strategies import DDPStrategy
+
+
+def split_cores(n_workers: int, n_jobs: int = -1) -> List[Set[int]]:
+    """Split the available CPU cores into disjoint sets, one per worker.
+
+    Args:
+        n_workers: Number of worker processes
+        n_jobs: Total number of cores to use (-1 for all available)
+
+    Returns:
+        List of core sets (empty sets if affinity is not supported)
+    """
+    if not hasattr(os, "sched_getaffinity"):
+        return [set() for _ in range(n_workers)]
+    cores = sorted(os.sched_getaffinity(0))
+    if n_jobs is not None and n_jobs > 0:
+        cores = cores[:n_jobs]
+    if len(cores) < n_workers:
+        # Fewer cores than workers: workers share cores round-robin
+        return [{cores[i % len(cores)]} for i in range(n_workers)]
+    per_worker = len(cores) // n_workers
+    return [set(cores[i * per_worker:(i + 1) * per_worker]) for i in range(n_workers)]
+
+
+def pin_process(cores: Set[int]) -> None:
+    """Pin this process to ``cores`` and use one intra-op thread per core."""
+    if cores:
+        os.sched_setaffinity(0, cores)
+        torch.set_num_threads(len(cores))
+
+
+class CoreAffinity(pl.Callback):
+    """Pin every local training process to a disjoint set of cores.
+
+    DataLoader workers started afterwards inherit the core set of their
+    process.
+    """
+
+    def __init__(self, n_jobs: int = -1):
+        """Initialize callback.
+
+        Args:
+            n_jobs: Total number of cores to split between the local processes
+                (-1 for all available)
+        """
+        super().__init__()
+        self.n_jobs = n_jobs
+
+    def setup(self, trainer, pl_module, stage):
+        """Pin the process of the local rank."""
+        cores = split_cores(trainer.num_devices, self.n_jobs)[trainer.local_rank]
+        pin_process(cores)
+        if cores:
+            print(f"Rank {trainer.global_rank}: {len(cores)} cores ({min(cores)}-{max(cores)})")
+
+
+class FileRendezvousDDPStrategy(DDPStrategy):
+    """DDP strategy initializing the process group through a shared file.
+
+    All processes of all nodes open the same file (on a filesystem every node
+    can reach) instead of connecting to ``MASTER_ADDR:MASTER_PORT``. The file
+    must not exist when the run starts: use a fresh path per run.
+    """
+
+    def __init__(self, rendezvous_file: Optional[str] = None, **kwargs):
+        """Initialize strategy.
+
+        Args:
+            rendezvous_file: Shared rendezvous file (None uses the main address
+                and port as usual)
+            **kwargs: Arguments of ``DDPStrategy``
+        """
+        super().__init__(**kwargs)
+        self.rendezvous_file = os.path.abspath(rendezvous_file) if rendezvous_file else None
+
+    def setup_distributed(self) -> None:
+        """Initialize the process group from the rendezvous file, then set up DDP."""
+        if self.rendezvous_file and not dist.is_initialized():
+            self.set_world_ranks()
+            dist.init_process_group(
+                self._process_group_backend or "gloo",
+                init_method=f"file://{self.rendezvous_file}",
+                rank=self.global_rank,
+                world_size=self.world_size,
+                timeout=self._timeout,
+            )
+        # The process group is already initialized, so only the DDP setup runs
+        super().setup_distributed()
+
+
+def cpu_ddp_strategy(rendezvous_file: Optional[str] = None, start_method: str = "spawn") -> DDPStrategy:
+    """Create a gloo DDP strategy for CPU training.
+
+    Args:
+        rendezvous_file: Shared file to rendezvous through (optional)
+        start_method: How local processes are started. ``spawn`` only runs
+            ``fit`` in the new processes; ``popen`` reruns the script
+            (faster startup, but everything before ``fit`` runs on every rank)
+
+    Returns:
+        DDP strategy for ``pl.Trainer(accelerator="cpu", devices=N, strategy=...)``
+    """
+    return FileRendezvousDDPStrategy(
+        rendezvous_file=rendezvous_file,
+        process_group_backend="gloo",
+        start_method=start_method,
+    )
@@ -0,0 +1,326 @@
+"""
+Single-pass evaluation with per-sample outputs.
+
+This module provides:
+- Per-sample sufficient statistics (loss, stat scores or error sums) from
+  which dataset-level metrics can be recomputed for any subset of samples
+- A PredictionWriter callback that streams them to Parquet (or NPZ) shards
+  during ``trainer.test``, optionally with raw predictions and figures
+- Running the test loop with the writer attached and saving the metrics
+- Loading the shards back as NumPy columns for error analysis
+
+Metrics are aggregated by the task's torchmetrics during the same pass, so
+every test sample goes through the model exactly once.
+"""
+
+import glob
+import json
+import os
+import warnings
+from typing import Dict, List, Optional
+
+import lightning.pytorch as pl
+import numpy as np
+import torch
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+from {{cookiecutter.project_slug}}.visualization import VisualizationService
+
+SHARD_FORMATS = ("parquet", "npz")
+
+
+def sample_statistics(y_hat: torch.Tensor, y: torch.Tensor, loss_name: str, threshold: float = 0.5) -> Dict[str, torch.Tensor]:
+    """Compute per-sample sufficient statistics of the task's metrics.
+
+    Classification tasks (``ce``, ``bce``) get per-class true positive, false
+    positive and false negative counts per sample, plus the number of scored
+    elements (pixels for dense targets). Image-level targets also get the
+    target, predicted class and confidence. Regression tasks get the sum of
+    squared and absolute errors and the number of elements.
+
+    Args:
+        y_hat: Prediction batch (logits for classification)
+        y: Target batch
+        loss_name: Task loss (ce, bce, mse, huber)
+        threshold: Probability threshold for binary predictions
+
+    Returns:
+        Dictionary of tensors with the batch size as first dimension
+    """
+    n = y_hat.shape[0]
+    stats = {}
+    if loss_name == "ce":
+        num_classes = y_hat.shape[1]
+        probs = y_hat.float().softmax(dim=1)
+        confidence, predicted = probs.max(dim=1)
+        target = y.long().reshape(predicted.shape)
+    elif loss_name == "bce":
+        num_classes = 1
+        probs = y_hat.float().sigmoid()
+        predicted = (probs > threshold).long()
+        confidence = torch.where(predicted.bool(), probs, 1 - probs)
+        target = (y > 0.5).long().reshape(predicted.shape)
+    else:
+        diff = (y_hat.float() - y.float()).reshape(n, -1)
+        stats["sse"] = diff.pow(2).sum(dim=1)
+        stats["sae"] = diff.abs().sum(dim=1)
+        stats["count"] = torch.full((n,), diff.shape[1], dtype=torch.long, device=diff.device)
+        return stats
+
+    predicted = predicted.reshape(n, -1)
+    target = target.reshape(n, -1)
+    if num_classes == 1:
+        tp = (predicted & target).sum(dim=1, keepdim=True)
+        fp = (predicted & (1 - target)).sum(dim=1, keepdim=True)
+        fn = ((1 - predicted) & target).sum(dim=1, keepdim=True)
+    else:
+        # Per-sample confusion matrices in one bincount
+        offsets = torch.arange(n, device=y_hat.device).unsqueeze(1) * num_classes ** 2
+        confusion = torch.bincount(
+            (offsets + target * num_classes + predicted).reshape(-1),
+            minlength=n * num_classes ** 2,
+        ).reshape(n, num_classes, num_classes)
+        tp = confusion.diagonal(dim1=1, dim2=2)
+        fp = confusion.sum(dim=1) - tp
+        fn = confusion.sum(dim=2) - tp
+    stats.update({"tp": tp, "fp": fp, "fn": fn})
+    stats["count"] = torch.full((n,), predicted.shape[1], dtype=torch.long, device=y_hat.device)
+
+    if predicted.shape[1] == 1:
+        stats["target"] = target[:, 0]
+        stats["predicted"] = predicted[:, 0]
+        stats["confidence"] = confidence.reshape(n)
+    return stats
+
+
+class PredictionWriter(pl.Callback):
+    """Stream per-sample test outputs to columnar shards.
+
+    Expects ``test_step`` to return a dictionary with the batch ``prediction``
+    and per-sample ``loss``. Each row holds the sample index, path, loss and
+    the statistics of ``sample_statistics``; shards are written every
+    ``shard_size`` samples as ``part-r<rank>-<n>.<format>``.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        fmt: str = "parquet",
+        shard_size: int = 100_000,
+        save_arrays: bool = False,
+        visualizer=None,
+    ):
+        """Initialize callback.
+
+        Args:
+            output_dir: Directory to write shards to
+            fmt: Shard format, parquet or npz (npz is used if pyarrow is missing)
+            shard_size: Number of samples per shard
+            save_arrays: Also save raw predictions as float16 ``.npy`` shards
+            visualizer: VisualizationService to render figures with (optional)
+        """
+        super().__init__()
+        if fmt not in SHARD_FORMATS:
+            raise ValueError(f"Unsupported shard format: {fmt}")
+        if fmt == "parquet" and not PYARROW_AVAILABLE:
+            warnings.warn("pyarrow is not installed, writing NPZ shards instead of Parquet")
+            fmt = "npz"
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.shard_size = shard_size
+        self.save_arrays = save_arrays
+        self.visualizer = visualizer
+        self.shards: List[str] = []
+
+    def on_test_start(self, trainer, pl_module):
+        """Reset buffers and remove shards of a previous run."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.rank = trainer.global_rank
+        for path in glob.glob(os.path.join(self.output_dir, f"*-r{self.rank}-*")):
+            os.remove(path)
+        self.loss_name = pl_module.hparams.get("loss", "mse")
+        self.n_written = 0
+        self.shards = []
+        self._reset_buffer()
+
+    def _reset_buffer(self):
+        """Start a new shard."""
+        self.columns: Dict[str, list] = {}
+        self.arrays: List[np.ndarray] = []
+        self.n_buffered = 0
+
+    def on_test_batch_end(self, trainer, pl_module, outputs, batch, batch_idx, dataloader_idx=0):
+        """Buffer the per-sample outputs of a batch."""
+        if not isinstance(outputs, dict) or "prediction" not in outputs:
+            raise ValueError("PredictionWriter needs test_step to return the batch prediction and loss")
+        y_hat, y = outputs["prediction"], batch["target"]
+        n = y_hat.shape[0]
+
+        rows = {
+            "index": np.arange(self.n_written + self.n_buffered, self.n_written + self.n_buffered + n),
+            "path": np.asarray(batch.get("path", [""] * n), dtype=str),
+            "loss": outputs["loss"].float().cpu().numpy(),
+        }
+        for key, value in sample_statistics(y_hat, y, self.loss_name).items():
+            rows[key] = value.cpu().numpy()
+        for key, value in rows.items():
+            self.columns.setdefault(key, []).append(value)
+        if self.save_arrays:
+            self.arrays.append(y_hat.detach().to(torch.float16).cpu().numpy())
+        if self.visualizer is not None:
+            self.visualizer.submit(batch["image"], y, y_hat, "pred", batch_idx, block=True)
+
+        self.n_buffered += n
+        if self.n_buffered >= self.shard_size:
+            self._flush()
+
+    def on_test_end(self, trainer, pl_module):
+        """Write the last shard."""
+        self._flush()
+
+    def _flush(self):
+        """Write buffered rows to a shard."""
+        if self.n_buffered == 0:
+            return
+        columns = {key: np.concatenate(values) for key, values in self.columns.items()}
+        name = f"part-r{self.rank}-{len(self.shards):05d}"
+        path = os.path.join(self.output_dir, f"{name}.{self.fmt}")
+        if self.fmt == "parquet":
+            pq.write_table(_to_table(columns), path)
+        else:
+            np.savez(path, **columns)
+        if self.save_arrays:
+            np.save(os.path.join(self.output_dir, f"arrays-r{self.rank}-{len(self.shards):05d}.npy"),
+                    np.concatenate(self.arrays))
+        self.shards.append(path)
+        self.n_written += self.n_buffered
+        self._reset_buffer()
+
+
+def evaluate_task(
+    task,
+    datamodule,
+    output_dir,
+    trainer=None,
+    ckpt_path=None,
+    with_predictions=False,
+    fmt="parquet",
+    max_figures=40
+):
+    """Evaluate a task in a single pass over the test data.
+    
+    Metrics are aggregated during the test loop. Per-sample losses and metric
+    statistics are streamed to ``<output_dir>/predictions/`` in the same pass.
+    
+    Args:
+        task: LightningModule task
+        datamodule: DataModule with test data
+        output_dir: Directory to save evaluation results
+        trainer: Trainer to run the test loop with (a CPU/GPU trainer is created if None)
+        ckpt_path: Checkpoint to load into the task before testing (optional)
+        with_predictions: Also save raw predictions and prediction figures
+        fmt: Format of the per-sample shards (parquet or npz)
+        max_figures: Maximum number of figures to save
+        
+    Returns:
+        Dictionary of test metrics
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if trainer is None:
+        trainer = pl.Trainer(
+            accelerator="auto",
+            devices=1,
+            logger=False,
+            enable_checkpointing=False
+        )
+    
+    # Figures are rendered in a background process while inference continues
+    predictions_dir = os.path.join(output_dir, "predictions")
+    visualizer = None
+    if with_predictions:
+        visualizer = VisualizationService(
+            output_dir=predictions_dir,
+            max_figures_per_epoch=max_figures,
+            max_samples=4
+        )
+    writer = PredictionWriter(
+        predictions_dir,
+        fmt=fmt,
+        save_arrays=with_predictions,
+        visualizer=visualizer
+    )
+    
+    # Run evaluation
+    print("Running evaluation...")
+    trainer.callbacks.append(writer)
+    try:
+        results = trainer.test(task, datamodule=datamodule, ckpt_path=ckpt_path)[0]
+    finally:
+        trainer.callbacks.remove(writer)
+        if visualizer is not None:
+            visualizer.close()
+    
+    # Print results
+    print("\nEvaluation Results:")
+    for metric, value in results.items():
+        print(f"  {metric}: {value:.4f}")
+    
+    # Save results to file
+    result_file = os.path.join(output_dir, "evaluation_results.json")
+    with open(result_file, "w") as f:
+        json.dump(results, f, indent=2)
+    
+    print(f"Results saved to {result_file}")
+    print(f"Per-sample outputs saved to {predictions_dir}")
+    
+    return results
+
+
+def _to_table(columns: Dict[str, np.ndarray]):
+    """Convert NumPy columns to an Arrow table (2-D columns become fixed-size lists)."""
+    arrays = {}
+    for key, values in columns.items():
+        if values.ndim == 2:
+            arrays[key] = pa.FixedSizeListArray.from_arrays(pa.array(values.reshape(-1)), values.shape[1])
+        else:
+            arrays[key] = pa.array(values)
+    return pa.table(arrays)
+
+
+def load_predictions(output_dir: str, columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+    """Load per-sample outputs written by PredictionWriter.
+
+    Args:
+        output_dir: Directory containing the shards
+        columns: Columns to load (default: all)
+
+    Returns:
+        Dictionary of NumPy columns, ordered by rank and shard
+    """
+    paths = sorted(glob.glob(os.path.join(output_dir, "part-r*-*.parquet")))
+    paths += sorted(glob.glob(os.path.join(output_dir, "part-r*-*.npz")))
+    if not paths:
+        raise FileNotFoundError(f"No prediction shards found in {output_dir}")
+
+    parts: Dict[str, list] = {}
+    for path in paths:
+        if path.endswith(".parquet"):
+            table = pq.read_table(path, columns=columns)
+            for key in table.column_names:
+                column = table.column(key).combine_chunks()
+                if pa.types.is_fixed_size_list(column.type):
+                    values = column.flatten().to_numpy().reshape(len(column), column.type.list_size)
+                else:
+                    values = column.to_numpy(zero_copy_only=False)
+                parts.setdefault(key, []).append(values)
+        else:
+            with np.load(path) as shard:
+                for key in columns or shard.files:
+                    parts.setdefault(key, []).append(shard[key])
+    return {key: np.concatenate(values) for key, values in parts.items()}
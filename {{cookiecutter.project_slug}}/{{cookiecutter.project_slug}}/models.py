@@ -13,8 +13,11 @@ Examples of libraries you might want to use:
 - Timm: https://github.com/huggingface/pytorch-image-models
 """
 
+import warnings
+
 import torch
 import torch.nn as nn
+from torch.utils.checkpoint import checkpoint
 
 
 class CustomModel(nn.Module):
@@ -29,7 +32,7 @@ class CustomModel(nn.Module):
         super().__init__()
         # TODO: Initialize your model architecture
         self.example_conv = nn.Conv2d(
-            in_channels=config.in_channels, out_channels=64, kernel_size=3, padding=1
+            in_channels=config.in_channels, out_channels=config.out_channels, kernel_size=3, padding=1
         )
         # Add more layers as needed
 
@@ -61,8 +64,98 @@ def get_model(config):
     # based on config.model_name and other parameters
 
     if config.model_name == "custom":
-        return CustomModel(config)
+        model = CustomModel(config)
     else:
         raise ValueError(
             f"Model '{config.model_name}' not implemented. Add it to the get_model function."
         )
+
+    if getattr(config, "gradient_checkpointing", False):
+        enable_gradient_checkpointing(model, getattr(config, "gradient_checkpointing_modules", None))
+    return model
+
+
+def enable_gradient_checkpointing(model, modules=None):
+    """Trade compute for memory by recomputing activations in the backward pass.
+
+    Without ``modules``, uses the library's own switch for timm and Hugging
+    Face models, and otherwise checkpoints each top-level child. Models whose
+    memory sits in nested blocks (e.g. a ``backbone`` wrapping all stages)
+    should pass the blocks to checkpoint instead. Wrapping keeps parameter
+    names (and therefore checkpoints) unchanged.
+
+    Args:
+        model: Model to enable gradient checkpointing on
+        modules: Submodules to checkpoint, as modules, submodule names
+            (``"encoder.layer1"``), block types or block class names
+            (``"Bottleneck"``). Blocks nested in a selected block are not
+            wrapped again.
+
+    Returns:
+        The same model
+    """
+    if modules is None:
+        if hasattr(model, "set_grad_checkpointing"):
+            model.set_grad_checkpointing(True)
+            return model
+        if hasattr(model, "gradient_checkpointing_enable"):
+            model.gradient_checkpointing_enable()
+            return model
+        targets = list(model.children())
+    else:
+        targets = _select_modules(model, modules)
+
+    if not targets:
+        warnings.warn(
+            f"Gradient checkpointing is enabled but no submodule of {type(model).__name__} "
+            f"matched {modules!r}, so no activations will be recomputed"
+            if modules is not None else
+            f"Gradient checkpointing is enabled but {type(model).__name__} has no submodules "
+            "to checkpoint; pass the blocks to checkpoint explicitly"
+        )
+    for module in targets:
+        _checkpoint_forward(module)
+    return model
+
+
+def _select_modules(model, modules):
+    """Get the outermost submodules of ``model`` matching any of ``modules``."""
+    if isinstance(modules, (str, type, nn.Module)):
+        modules = [modules]
+    selected = []
+    for name, module in model.named_modules():
+        if any(not prefix or name.startswith(f"{prefix}.") for prefix, _ in selected):
+            continue
+        for target in modules:
+            if isinstance(target, str):
+                matched = name == target or type(module).__name__ == target
+            elif isinstance(target, type):
+                matched = isinstance(module, target)
+            else:
+                matched = module is target
+            if matched:
+                selected.append((name, module))
+                break
+    return [module for _, module in selected]
+
+
+def _checkpoint_forward(module):
+    """Make ``module`` recompute its activations during the backward pass."""
+    module.forward = _CheckpointedForward(module)
+
+
+class _CheckpointedForward:
+    """Checkpointed replacement for a module's ``forward``.
+
+    A module-level class rather than a closure, so ``copy.deepcopy`` and
+    pickling rebind it to the copied module instead of the original one.
+    """
+
+    def __init__(self, module):
+        self.module = module
+
+    def __call__(self, *args, **kwargs):
+        forward = type(self.module).forward
+        if self.module.training and torch.is_grad_enabled():
+            return checkpoint(forward, self.module, *args, use_reentrant=False, **kwargs)
+        return forward(self.module, *args, **kwargs)
@@ -0,0 +1,207 @@
+"""
+Offline preprocessing of image datasets.
+
+This module provides:
+- Splitting a transform chain into its deterministic prefix and the rest
+- Signatures identifying a (transform prefix, image files) combination
+- Running the deterministic prefix once over a process pool
+- Loading the preprocessed variant back when its signature matches
+
+Preprocessed variants are stored under ``<preprocessed_dir>/<signature>/`` as
+either PNG/WebP files at the target size or a single uint8 ``.npy`` memmap.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torchvision.transforms as T
+from torchvision.transforms import v2
+from PIL import Image
+
+MANIFEST_NAME = "manifest.json"
+MEMMAP_NAME = "images.npy"
+IMAGE_FORMATS = ("png", "webp")
+
+#: Transforms that always produce the same output for the same input.
+DETERMINISTIC_TRANSFORMS = (T.Resize, T.CenterCrop, T.Grayscale, v2.Resize, v2.CenterCrop, v2.Grayscale)
+
+
+def split_transforms(transforms: Optional[Callable]) -> Tuple[List[Callable], Callable]:
+    """Split a transform chain into its deterministic prefix and the remainder.
+
+    Args:
+        transforms: A ``T.Compose`` or ``v2.Compose`` (or single transform)
+
+    Returns:
+        Tuple of (deterministic prefix, remaining transforms as a Compose of
+        the same kind)
+    """
+    if transforms is None:
+        return [], T.Compose([])
+    if isinstance(transforms, (T.Compose, v2.Compose)):
+        steps = list(transforms.transforms)
+        compose = type(transforms)
+    else:
+        steps = [transforms]
+        compose = v2.Compose if isinstance(transforms, v2.Transform) else T.Compose
+
+    n_prefix = 0
+    for step in steps:
+        if type(step) not in DETERMINISTIC_TRANSFORMS:
+            break
+        n_prefix += 1
+    if compose is v2.Compose and n_prefix == len(steps):
+        # v2.Compose needs at least one transform
+        return steps, v2.Identity()
+    return steps[:n_prefix], compose(steps[n_prefix:])
+
+
+def transform_signature(prefix: Sequence[Callable], image_paths: Sequence[str]) -> str:
+    """Compute the signature of a deterministic prefix applied to a list of images.
+
+    Each image contributes its path, size and modification time, so replacing
+    an image in place (e.g. re-acquiring a changed item) invalidates the
+    variant instead of silently reusing stale pixels.
+
+    Args:
+        prefix: Deterministic transforms
+        image_paths: Source image paths, in dataset order
+
+    Returns:
+        Hex digest identifying the preprocessed variant
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps([repr(t) for t in prefix]).encode())
+    for path in image_paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode())
+    return digest.hexdigest()[:16]
+
+
+def _preprocess_chunk(job):
+    """Apply the deterministic prefix to a chunk of images (runs in a worker process)."""
+    prefix, items, fmt, out_dir, shape = job
+    pipeline = T.Compose(prefix)
+    if fmt == "memmap":
+        images = np.load(os.path.join(out_dir, MEMMAP_NAME), mmap_mode="r+")
+    for idx, src_path in items:
+        with Image.open(src_path) as image:
+            image = pipeline(image.convert("RGB"))
+        if fmt == "memmap":
+            array = np.asarray(image, dtype=np.uint8)
+            if array.shape != shape:
+                raise ValueError(
+                    f"{src_path} preprocessed to {array.shape}, expected {shape}. "
+                    "Memmap output requires a fixed (height, width) image size."
+                )
+            images[idx] = array
+        else:
+            image.save(os.path.join(out_dir, f"{idx:08d}.{fmt}"), lossless=True)
+    if fmt == "memmap":
+        images.flush()
+    return len(items)
+
+
+def preprocess_images(
+    image_paths: Sequence[str],
+    transforms: Callable,
+    preprocessed_dir: str,
+    fmt: str = "png",
+    num_workers: Optional[int] = None,
+    chunk_size: int = 64,
+) -> Optional[str]:
+    """Run the deterministic prefix of ``transforms`` once over all images.
+
+    Args:
+        image_paths: Source image paths, in dataset order
+        transforms: Full transform chain used by the dataset
+        preprocessed_dir: Root directory for preprocessed variants
+        fmt: Output format: png, webp or memmap
+        num_workers: Number of worker processes (defaults to the CPU count)
+        chunk_size: Number of images handled per worker task
+
+    Returns:
+        Directory of the preprocessed variant, or None if the chain has no
+        deterministic prefix to precompute
+    """
+    if fmt not in IMAGE_FORMATS + ("memmap",):
+        raise ValueError(f"Unsupported preprocessing format: {fmt}")
+
+    prefix, _ = split_transforms(transforms)
+    if not prefix:
+        return None
+
+    signature = transform_signature(prefix, image_paths)
+    out_dir = os.path.join(preprocessed_dir, signature)
+    if os.path.exists(os.path.join(out_dir, MANIFEST_NAME)):
+        return out_dir
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Probe the first image for the output mode (e.g. L after Grayscale)
+    # and, for memmaps, the fixed output shape
+    with Image.open(image_paths[0]) as image:
+        probe = T.Compose(prefix)(image.convert("RGB"))
+    mode = probe.mode
+    shape = None
+    if fmt == "memmap":
+        shape = np.asarray(probe).shape
+        np.lib.format.open_memmap(
+            os.path.join(out_dir, MEMMAP_NAME),
+            mode="w+",
+            dtype=np.uint8,
+            shape=(len(image_paths),) + shape,
+        ).flush()
+
+    items = list(enumerate(image_paths))
+    jobs = [
+        (prefix, items[i:i + chunk_size], fmt, out_dir, shape)
+        for i in range(0, len(items), chunk_size)
+    ]
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        list(executor.map(_preprocess_chunk, jobs))
+
+    # Written last, so an interrupted run is never picked up
+    manifest = {
+        "signature": signature,
+        "format": fmt,
+        "transforms": [repr(t) for t in prefix],
+        "count": len(image_paths),
+        "shape": list(shape) if shape is not None else None,
+        "mode": mode,
+        "sources": [os.path.abspath(p) for p in image_paths],
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return out_dir
+
+
+def find_preprocessed(
+    preprocessed_dir: Optional[str], transforms: Callable, image_paths: Sequence[str]
+) -> Optional[Tuple[dict, str, Callable]]:
+    """Find a preprocessed variant matching the transforms and images.
+
+    Args:
+        preprocessed_dir: Root directory for preprocessed variants (or None)
+        transforms: Full transform chain used by the dataset
+        image_paths: Source image paths, in dataset order
+
+    Returns:
+        Tuple of (manifest, variant directory, remaining transforms), or None
+    """
+    if not preprocessed_dir:
+        return None
+    prefix, rest = split_transforms(transforms)
+    if not prefix:
+        return None
+
+    out_dir = os.path.join(preprocessed_dir, transform_signature(prefix, image_paths))
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    return manifest, out_dir, rest
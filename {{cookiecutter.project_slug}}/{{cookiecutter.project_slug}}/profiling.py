@@ -0,0 +1,270 @@
+"""
+Step-time breakdown of the training loop.
+
+This module provides:
+- A StepTimeProfiler callback that attributes the wall time of every training
+  step to data loading, host-to-device transfer, forward, backward, optimizer
+  and everything else (callbacks, logging, schedulers)
+- Per-epoch reports with data-wait percentage, samples/sec and p50/p95/p99
+  step latency, written as JSON next to the TensorBoard logs
+- An optional ``torch.profiler`` trace of a window of training steps
+
+Phases are timed at Lightning's own profiling points: during fit, the
+callback wraps the trainer's profiler (forwarding every call to it), so the
+data fetch, ``batch_to_device``, ``training_step``, ``backward`` and
+``optimizer_step`` boundaries are exact. The cost is two ``perf_counter``
+calls per hook. CUDA kernels run asynchronously, so on GPU time is
+attributed to the phase that waits for it unless ``synchronize`` is set.
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence
+
+import lightning.pytorch as pl
+import numpy as np
+import torch
+from lightning.pytorch.profilers import Profiler
+
+PHASES = ("data", "transfer", "forward", "backward", "optimizer", "other")
+
+#: Profiling action name suffixes of each phase. Nested actions inherit the
+#: phase of the closest enclosing classified action.
+_PHASE_ACTIONS = (
+    ("data", ("train_dataloader_next",)),
+    ("transfer", (".batch_to_device", ".transfer_batch_to_device")),
+    ("forward", (".training_step",)),
+    ("backward", (".backward",)),
+    ("optimizer", (".optimizer_step", ".optimizer_zero_grad")),
+)
+
+
+def _classify(action_name: str) -> Optional[str]:
+    """Get the phase of a profiling action (None if it has none)."""
+    for phase, suffixes in _PHASE_ACTIONS:
+        if action_name.endswith(suffixes):
+            return phase
+    return None
+
+
+class _PhaseTimer(Profiler):
+    """Profiler wrapper reporting action boundaries to a StepTimeProfiler."""
+
+    def __init__(self, profiler: Profiler, owner: "StepTimeProfiler"):
+        super().__init__()
+        self.profiler = profiler
+        self.owner = owner
+
+    def start(self, action_name: str) -> None:
+        self.profiler.start(action_name)
+        self.owner._start_action(action_name)
+
+    def stop(self, action_name: str) -> None:
+        self.owner._stop_action(action_name)
+        self.profiler.stop(action_name)
+
+    def summary(self) -> str:
+        return self.profiler.summary()
+
+    def describe(self) -> None:
+        self.profiler.describe()
+
+    def setup(self, stage: str, local_rank: Optional[int] = None, log_dir: Optional[str] = None) -> None:
+        self.profiler.setup(stage, local_rank, log_dir)
+
+    def teardown(self, stage: Optional[str]) -> None:
+        self.profiler.teardown(stage)
+
+
+def summarize_steps(latencies: Sequence[float], phases: Dict[str, float], samples: int) -> Dict[str, float]:
+    """Summarize the step times of an epoch.
+
+    Args:
+        latencies: Wall time of every step in seconds
+        phases: Total time per phase in seconds
+        samples: Number of training samples processed
+
+    Returns:
+        Dictionary with steps, samples, time, samples/sec, data-wait
+        percentage, step latency percentiles (ms) and phase percentages
+    """
+    total = float(np.sum(latencies)) if len(latencies) else 0.0
+    summary = {
+        "steps": len(latencies),
+        "samples": samples,
+        "time_s": total,
+        "samples_per_sec": samples / total if total > 0 else 0.0,
+        "data_wait_pct": 100 * phases.get("data", 0.0) / total if total > 0 else 0.0,
+    }
+    if len(latencies):
+        p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+        summary.update({"step_ms_p50": p50, "step_ms_p95": p95, "step_ms_p99": p99})
+    for phase in PHASES:
+        summary[f"{phase}_s"] = phases.get(phase, 0.0)
+        summary[f"{phase}_pct"] = 100 * phases.get(phase, 0.0) / total if total > 0 else 0.0
+    return summary
+
+
+class StepTimeProfiler(pl.Callback):
+    """Time the phases of every training step and report them per epoch.
+
+    Reports are appended to ``<log_dir>/step_times.json`` after every epoch
+    and the headline numbers are logged as ``perf/*`` metrics. Validation
+    time is excluded from the step times and reported separately.
+    """
+
+    def __init__(
+        self,
+        filename: str = "step_times.json",
+        synchronize: bool = False,
+        trace_window: Optional[Sequence[int]] = None,
+    ):
+        """Initialize callback.
+
+        Args:
+            filename: Name of the JSON report in the trainer's log directory
+            synchronize: Synchronize CUDA at the end of every phase, so GPU
+                time is attributed to the phase that launched it (adds a
+                device sync per phase)
+            trace_window: (first step, number of steps) to capture with
+                ``torch.profiler``, counted in training batches from the
+                start of fit (None disables the trace)
+        """
+        super().__init__()
+        self.filename = filename
+        self.synchronize = synchronize
+        self.trace_window = tuple(trace_window) if trace_window else None
+        self.epochs: List[Dict[str, float]] = []
+        self._trace = None
+
+    def setup(self, trainer, pl_module, stage):
+        """Wrap the trainer's profiler during fit."""
+        if stage != "fit":
+            return
+        self._trainer = trainer
+        # A collective under DDP: read it on every rank, here, not only on rank 0
+        self._log_dir = trainer.log_dir
+        self._sync = self.synchronize and pl_module.device.type == "cuda"
+        self._stack: List[list] = []
+        self._step_phases: Dict[str, float] = {}
+        self._last_step_end: Optional[float] = None
+        self._batches = 0
+        trainer.profiler = _PhaseTimer(trainer.profiler, self)
+
+    def teardown(self, trainer, pl_module, stage):
+        """Restore the trainer's profiler."""
+        if isinstance(trainer.profiler, _PhaseTimer):
+            trainer.profiler = trainer.profiler.profiler
+        self._stop_trace(trainer)
+
+    def _start_action(self, action_name: str) -> None:
+        """Push an action (name, phase, start time, time spent in children)."""
+        phase = _classify(action_name)
+        if phase is None and self._stack:
+            phase = self._stack[-1][1]
+        now = time.perf_counter()
+        if phase == "data" and self._last_step_end is None:
+            # The first batch can be fetched before the epoch starts
+            self._last_step_end = now
+        self._stack.append([action_name, phase, now, 0.0])
+
+    def _stop_action(self, action_name: str) -> None:
+        """Pop an action and add its exclusive time to its phase."""
+        names = [action[0] for action in self._stack]
+        if action_name not in names:
+            # Started before the profiler was wrapped
+            return
+        index = len(names) - 1 - names[::-1].index(action_name)
+        del self._stack[index + 1:]
+        name, phase, start, children = self._stack.pop()
+        if self._sync and phase is not None:
+            torch.cuda.synchronize()
+        elapsed = time.perf_counter() - start
+        if self._stack:
+            self._stack[-1][3] += elapsed
+        if phase is not None and self._trainer.training and not self._trainer.sanity_checking:
+            self._step_phases[phase] = self._step_phases.get(phase, 0.0) + elapsed - children
+
+    def on_train_epoch_start(self, trainer, pl_module):
+        """Reset the epoch's accumulators."""
+        self._latencies: List[float] = []
+        self._phases = dict.fromkeys(PHASES, 0.0)
+        self._samples = 0
+        self._validation_time = 0.0
+        self._step_validation_time = 0.0
+        if self._last_step_end is None:
+            self._last_step_end = time.perf_counter()
+
+    def on_train_batch_start(self, trainer, pl_module, batch, batch_idx):
+        """Start the trace at the first step of the window."""
+        if self.trace_window and self._batches == self.trace_window[0] and trainer.is_global_zero:
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self._trace = torch.profiler.profile(activities=activities)
+            self._trace.__enter__()
+
+    def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx):
+        """Close the step: its latency runs from the end of the previous step."""
+        now = time.perf_counter()
+        latency = now - self._last_step_end - self._step_validation_time
+        self._last_step_end = now
+        self._step_validation_time = 0.0
+
+        covered = 0.0
+        for phase, seconds in self._step_phases.items():
+            self._phases[phase] += seconds
+            covered += seconds
+        self._phases["other"] += max(0.0, latency - covered)
+        self._step_phases = {}
+        self._latencies.append(latency)
+        self._samples += batch["image"].shape[0]
+
+        self._batches += 1
+        if self.trace_window and self._batches == sum(self.trace_window):
+            self._stop_trace(trainer)
+
+    def on_validation_start(self, trainer, pl_module):
+        """Exclude validation from the step times."""
+        if not trainer.sanity_checking:
+            self._validation_start = time.perf_counter()
+
+    def on_validation_end(self, trainer, pl_module):
+        """Exclude validation from the step times."""
+        if not trainer.sanity_checking and hasattr(self, "_validation_start"):
+            elapsed = time.perf_counter() - self._validation_start
+            self._validation_time += elapsed
+            self._step_validation_time += elapsed
+
+    def on_train_epoch_end(self, trainer, pl_module):
+        """Report the epoch and write the JSON file."""
+        summary = summarize_steps(self._latencies, self._phases, self._samples)
+        summary = {"epoch": trainer.current_epoch, **summary, "validation_s": self._validation_time}
+        self.epochs.append(summary)
+        self._last_step_end = None
+
+        for key in ("samples_per_sec", "data_wait_pct", "step_ms_p50", "step_ms_p95", "step_ms_p99"):
+            if key in summary:
+                pl_module.log(f"perf/{key}", float(summary[key]), on_epoch=True, sync_dist=True)
+        if trainer.is_global_zero and self._log_dir:
+            self._write(os.path.join(self._log_dir, self.filename))
+
+    def _write(self, path: str) -> None:
+        """Write all epoch reports atomically."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"epochs": self.epochs}, f, indent=2, default=float)
+        os.replace(tmp_path, path)
+
+    def _stop_trace(self, trainer) -> None:
+        """Stop the trace and export it as a Chrome trace next to the logs."""
+        if self._trace is None:
+            return
+        self._trace.__exit__(None, None, None)
+        first, count = self.trace_window
+        path = os.path.join(self._log_dir or ".", f"trace_steps_{first}-{first + count - 1}.json")
+        self._trace.export_chrome_trace(path)
+        self._trace = None
+        print(f"Profiler trace saved to {path}")
@@ -0,0 +1,396 @@
+"""
+Structured telemetry for long-running jobs.
+
+This module provides:
+- Counters, gauges and histograms in a small thread-safe registry
+- A local HTTP endpoint serving them in the Prometheus text format
+- Periodic snapshots (with per-interval rates) appended to a JSONL file
+- A Lightning callback exporting training progress the same way
+
+Every job also exports its resident memory and the time of its last
+progress (any counter increment), so a scheduler can detect stalled jobs by
+scraping ``<prefix>_last_progress_timestamp_seconds`` or tailing the JSONL
+file, without parsing logs or TensorBoard event files.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence
+
+import lightning.pytorch as pl
+
+#: Default histogram buckets in seconds (latencies from 1 ms to 1 min).
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def rss_bytes() -> int:
+    """Get the resident memory of this process in bytes."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Peak instead of current RSS outside Linux
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Counter:
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, registry: "Telemetry"):
+        self.name = name
+        self.help = help
+        self._registry = registry
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the counter (counts as progress)."""
+        with self._lock:
+            self._value += amount
+        self._registry.last_progress = time.time()
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """Value that can go up and down, set directly or read from a function."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help
+        self._fn = fn
+        self._value = 0.0
+
+    def set(self, value: float) -> None:
+        """Set the gauge."""
+        self._value = float(value)
+
+    @property
+    def value(self) -> float:
+        return float(self._fn()) if self._fn is not None else self._value
+
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record a value."""
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of a block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def state(self):
+        """Get (cumulative bucket counts, sum, count) consistently."""
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        cumulative, running = [], 0
+        for n in counts:
+            running += n
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+class Telemetry:
+    """Registry of a job's metrics with an HTTP endpoint and a JSONL sink.
+
+    Metric names are prefixed with ``prefix`` (e.g. ``infer_files_total``).
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        port: Optional[int] = None,
+        jsonl_path: Optional[str] = None,
+        interval: float = 10.0,
+        host: str = "127.0.0.1",
+    ):
+        """Initialize registry.
+
+        Args:
+            prefix: Prefix of all metric names (e.g. the script name)
+            port: Port of the Prometheus endpoint (None disables it, 0 picks a free port)
+            jsonl_path: File snapshots are appended to (None disables it)
+            interval: Seconds between JSONL snapshots
+            host: Interface the endpoint listens on (local only by default)
+        """
+        self.prefix = prefix
+        self.port = port
+        self.host = host
+        self.jsonl_path = jsonl_path
+        self.interval = interval
+        self.metrics: Dict[str, object] = {}
+        self.started = time.time()
+        self.last_progress = self.started
+        self._previous: Dict[str, float] = {}
+        self._previous_time = self.started
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+        self.gauge("rss_bytes", "Resident memory of the process", fn=rss_bytes)
+        self.gauge("uptime_seconds", "Seconds since the job started", fn=lambda: time.time() - self.started)
+        self.gauge("last_progress_timestamp_seconds", "Unix time of the last counter increment",
+                   fn=lambda: self.last_progress)
+
+    def _register(self, metric):
+        """Add a metric, or return the existing one of the same name."""
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        """Get or create a counter."""
+        return self._register(Counter(f"{self.prefix}_{name}", help, self))
+
+    def gauge(self, name: str, help: str = "", fn: Optional[Callable[[], float]] = None) -> Gauge:
+        """Get or create a gauge, optionally reading its value from ``fn``."""
+        return self._register(Gauge(f"{self.prefix}_{name}", help, fn))
+
+    def histogram(self, name: str, help: str = "", buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Get or create a histogram."""
+        return self._register(Histogram(f"{self.prefix}_{name}", help, buckets))
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Histogram):
+                cumulative, total, count = metric.state()
+                for bound, n in zip(list(metric.buckets) + ["+Inf"], cumulative):
+                    lines.append('%s_bucket{le="%s"} %d' % (metric.name, bound, n))
+                lines.append(f"{metric.name}_sum {total}")
+                lines.append(f"{metric.name}_count {count}")
+            else:
+                lines.append(f"{metric.name} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, object]:
+        """Get all metric values, with per-second rates of counters since the last snapshot."""
+        now = time.time()
+        elapsed = max(now - self._previous_time, 1e-9)
+        record = {"time": now}
+        for metric in list(self.metrics.values()):
+            if isinstance(metric, Histogram):
+                _, total, count = metric.state()
+                previous_total = self._previous.get(f"{metric.name}_sum", 0.0)
+                previous_count = self._previous.get(f"{metric.name}_count", 0)
+                record[f"{metric.name}_count"] = count
+                record[f"{metric.name}_sum"] = total
+                # Mean over the interval, so slowdowns are not averaged away
+                if count > previous_count:
+                    record[f"{metric.name}_mean"] = (total - previous_total) / (count - previous_count)
+                self._previous[f"{metric.name}_sum"] = total
+                self._previous[f"{metric.name}_count"] = count
+            else:
+                value = metric.value
+                record[metric.name] = value
+                if isinstance(metric, Counter):
+                    record[f"{metric.name}_rate"] = (value - self._previous.get(metric.name, 0.0)) / elapsed
+                    self._previous[metric.name] = value
+        self._previous_time = now
+        return record
+
+    def flush(self) -> None:
+        """Append a snapshot to the JSONL file."""
+        if self.jsonl_path is None:
+            return
+        record = self.snapshot()
+        with open(self.jsonl_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def start(self) -> "Telemetry":
+        """Start the HTTP endpoint and the JSONL flusher threads."""
+        self._stop = threading.Event()
+        if self.port is not None:
+            registry = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] not in ("/", "/metrics"):
+                        self.send_error(404)
+                        return
+                    body = registry.render().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self._server.daemon_threads = True
+            self.port = self._server.server_address[1]
+            threading.Thread(target=self._server.serve_forever, name="telemetry-http", daemon=True).start()
+            print(f"Telemetry endpoint: http://{self.host}:{self.port}/metrics")
+
+        if self.jsonl_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.jsonl_path)), exist_ok=True)
+
+            def flush_periodically():
+                while not self._stop.wait(self.interval):
+                    self.flush()
+
+            self._flusher = threading.Thread(target=flush_periodically, name="telemetry-jsonl", daemon=True)
+            self._flusher.start()
+        return self
+
+    def close(self) -> None:
+        """Write a last snapshot and stop the threads."""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "Telemetry":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class TelemetryCallback(pl.Callback):
+    """Export training progress through a Telemetry registry.
+
+    Exports steps, samples and epochs, the step latency and the time spent
+    waiting for each batch (excluding validation), the latest value of the
+    monitored metrics, the resident memory and the number of checkpoint
+    writes still in flight (with ``BackgroundCheckpointIO``). The endpoint and
+    file only run on the global rank 0.
+    """
+
+    def __init__(
+        self,
+        port: Optional[int] = None,
+        jsonl_path: Optional[str] = None,
+        interval: float = 10.0,
+        monitor: Sequence[str] = ("train_loss", "val_loss"),
+    ):
+        """Initialize callback.
+
+        Args:
+            port: Port of the Prometheus endpoint (None disables it)
+            jsonl_path: File snapshots are appended to (None disables it)
+            interval: Seconds between JSONL snapshots
+            monitor: Logged metrics exported as gauges
+        """
+        super().__init__()
+        self.port = port
+        self.jsonl_path = jsonl_path
+        self.interval = interval
+        self.monitor = tuple(monitor)
+        self.telemetry: Optional[Telemetry] = None
+
+    def setup(self, trainer, pl_module, stage):
+        """Create the registry in the training process (it holds threads and locks)."""
+        if self.telemetry is not None:
+            return
+        self.telemetry = Telemetry("train", port=self.port, jsonl_path=self.jsonl_path, interval=self.interval)
+        self.steps = self.telemetry.counter("steps_total", "Training steps")
+        self.samples = self.telemetry.counter("samples_total", "Training samples")
+        self.epochs = self.telemetry.counter("epochs_total", "Completed training epochs")
+        self.step_latency = self.telemetry.histogram(
+            "step_latency_seconds", "Wall time of a training step, from batch start to batch end"
+        )
+        self.data_wait = self.telemetry.histogram(
+            "data_wait_seconds", "Time from the end of a step until the next batch is ready"
+        )
+        self.metric_gauges = {
+            name: self.telemetry.gauge(f"last_{name}", f"Latest logged {name}") for name in self.monitor
+        }
+        checkpoint_io = getattr(trainer.strategy, "checkpoint_io", None)
+        self.telemetry.gauge(
+            "checkpoint_writes_pending", "Checkpoint writes and removals queued on the writer thread",
+            fn=lambda: getattr(checkpoint_io, "pending", 0)
+        )
+        self._step_start: Optional[float] = None
+        self._step_end: Optional[float] = None
+
+    def on_fit_start(self, trainer, pl_module):
+        """Start the endpoint and flusher on the global rank 0."""
+        if trainer.is_global_zero:
+            self.telemetry.start()
+
+    def on_train_batch_start(self, trainer, pl_module, batch, batch_idx):
+        self._step_start = time.perf_counter()
+        if self._step_end is not None:
+            self.data_wait.observe(self._step_start - self._step_end)
+
+    def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx):
+        self._step_end = time.perf_counter()
+        if self._step_start is not None:
+            self.step_latency.observe(self._step_end - self._step_start)
+        self.steps.inc()
+        self.samples.inc(batch["image"].shape[0])
+
+    def on_train_epoch_end(self, trainer, pl_module):
+        self.epochs.inc()
+        self._step_end = None
+        self._update_metrics(trainer)
+
+    def on_validation_start(self, trainer, pl_module):
+        self._step_end = None
+
+    def on_validation_end(self, trainer, pl_module):
+        if not trainer.sanity_checking:
+            self._update_metrics(trainer)
+
+    def _update_metrics(self, trainer) -> None:
+        """Copy the monitored metrics into their gauges."""
+        for name, gauge in self.metric_gauges.items():
+            value = trainer.callback_metrics.get(name)
+            if value is not None:
+                gauge.set(float(value))
+
+    def on_fit_end(self, trainer, pl_module):
+        """Write the last snapshot and stop the endpoint."""
+        if trainer.is_global_zero:
+            self.telemetry.close()
+
+    def on_exception(self, trainer, pl_module, exception):
+        """Stop the endpoint if training fails."""
+        if trainer.is_global_zero:
+            self.telemetry.close()
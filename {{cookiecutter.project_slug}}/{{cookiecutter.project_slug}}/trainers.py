@@ -13,6 +13,9 @@ Resources:
 - https://torchgeo.readthedocs.io/en/latest/api/trainers.html
 """
 
+import warnings
+from typing import Any, Sequence
+
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -24,6 +27,8 @@ from torchmetrics import MetricCollection
 from torchmetrics.classification import Precision, Recall, F1Score
 from torchmetrics.regression import MeanSquaredError, MeanAbsoluteError
 
+from {{cookiecutter.project_slug}}.visualization import VisualizationService
+
 
 class Task(pl.LightningModule):
     """Abstract base class for all TorchGeo trainers.
@@ -32,7 +37,7 @@ class Task(pl.LightningModule):
     """
 
     #: Parameters to ignore when saving hyperparameters.
-    ignore: Sequence[str] | str | None = "weights"
+    ignore: Sequence[str] | str | None = "model"
 
     #: Model to train.
     model: Any
@@ -43,24 +48,45 @@ class Task(pl.LightningModule):
     #: Whether the goal is to minimize or maximize the performance metric to monitor.
     mode = "min"
 
-    def __init__(self) -> None:
+    #: How often training metrics are computed: every "step", every
+    #: ``metrics_interval`` steps ("interval"), or only at "epoch" end.
+    metrics_modes = ("step", "interval", "epoch")
+
+    #: Optimizers with a fused implementation in PyTorch.
+    fused_optimizers = ("adam", "adamw", "sgd")
+
+    def __init__(self, model: Any = None, **kwargs: Any) -> None:
         """Initialize a new BaseTask instance.
 
         Args:
-            ignore: Arguments to skip when saving hyperparameters.
+            model: Model to train.
+            kwargs: Hyperparameters, saved to ``self.hparams``.
         """
         super().__init__()
         self.save_hyperparameters(ignore=self.ignore)
+        self.model = model
+        self.visualizer = None
         self.configure_models()
+        self.compile_model()
         self.configure_losses()
         self.configure_metrics()
 
-    @abstractmethod
     def configure_models(self) -> None:
-        """Initialize the model."""
+        """Initialize the model (when not passed to the constructor)."""
+
+    def compile_model(self) -> None:
+        """Compile the model in place with ``torch.compile`` if enabled.
+
+        Compiling in place keeps parameter names, so checkpoints stay loadable
+        with or without compilation.
+        """
+        if self.model is None or not self.hparams.get("compile", False):
+            return
+        self.model.compile(mode=self.hparams.get("compile_mode", "default"))
 
     def configure_losses(self) -> None:
         """Initialize the loss criterion."""
+        loss_name = self.hparams.get("loss", "mse")
         if loss_name == "mse":
             self.loss_fn = nn.MSELoss()
         elif loss_name == "bce":
@@ -73,22 +99,131 @@ class Task(pl.LightningModule):
             raise ValueError(f"Unsupported loss: {loss_name}")
 
     def configure_metrics(self) -> None:
-        """Initialize the performance metrics."""
+        """Initialize the performance metrics.
+
+        Metrics only accumulate their sufficient statistics (stat scores for
+        classification, error sums for regression) on device during steps.
+        Classification metrics share one set of stat scores through compute
+        groups, so each batch is a single vectorized update.
+        """
+        self.metrics_mode = self.hparams.get("metrics_mode", "epoch")
+        self.metrics_interval = self.hparams.get("metrics_interval", 50)
+        if self.metrics_mode not in self.metrics_modes:
+            raise ValueError(f"Unsupported metrics mode: {self.metrics_mode}")
+
+        loss_name = self.hparams.get("loss", "mse")
+        if loss_name in ("ce", "bce"):
+            num_classes = self.hparams.get("num_classes", 2)
+            task = "multiclass" if loss_name == "ce" else "binary"
+            metric_args = {"task": task, "num_classes": num_classes, "average": "macro"}
+            metrics = MetricCollection(
+                {
+                    "precision": Precision(**metric_args),
+                    "recall": Recall(**metric_args),
+                    "f1": F1Score(**metric_args),
+                },
+                compute_groups=True,
+            )
+        else:
+            metrics = MetricCollection(
+                {"mse": MeanSquaredError(), "mae": MeanAbsoluteError()}
+            )
+
+        self.train_metrics = metrics.clone(prefix="train_")
+        self.val_metrics = metrics.clone(prefix="val_")
+        self.test_metrics = metrics.clone(prefix="test_")
+
+    def per_sample_loss(self, y_hat, y):
+        """Compute the loss of each sample in a batch.
+
+        Args:
+            y_hat: Prediction batch
+            y: Target batch
+
+        Returns:
+            Tensor of shape (batch size,)
+        """
+        reduction = self.loss_fn.reduction
+        self.loss_fn.reduction = "none"
+        try:
+            loss = self.loss_fn(y_hat, y)
+        finally:
+            self.loss_fn.reduction = reduction
+        return loss.reshape(loss.shape[0], -1).mean(dim=1)
+
+    def prepare_target(self, y):
+        """Convert a batch of uint8 masks to the target format of the loss.
+
+        Datasets keep masks as uint8 until they are on the device: they become
+        class indices for ``ce`` and values in [0, 1] (pixel value / 255)
+        otherwise. Other targets are returned unchanged.
+        """
+        if y.dtype != torch.uint8:
+            return y
+        if self.hparams.get("loss", "mse") == "ce":
+            return y.long().squeeze(1)
+        return y.float().div_(255)
+
+    def on_after_batch_transfer(self, batch, dataloader_idx):
+        """Prepare targets once the batch is on the device."""
+        if isinstance(batch, dict) and isinstance(batch.get("target"), torch.Tensor):
+            batch["target"] = self.prepare_target(batch["target"])
+        return batch
+
+    def _metric_inputs(self, y_hat, y):
+        """Prepare predictions and targets for metric updates."""
+        if self.hparams.get("loss", "mse") == "bce":
+            return y_hat.detach().sigmoid(), y.long()
+        if self.hparams.get("loss", "mse") == "ce":
+            return y_hat.detach(), y.long()
+        return y_hat.detach(), y
+
+    def _should_compute_train_metrics(self, batch_idx):
+        """Whether to compute (and sync) training metrics on this step."""
+        if self.metrics_mode == "step":
+            return True
+        if self.metrics_mode == "interval":
+            return (batch_idx + 1) % self.metrics_interval == 0
+        return False
+
+    def _optimizer_impl_kwargs(self):
+        """Keyword arguments selecting the optimizer implementation.
+
+        ``optimizer_impl`` is one of "default" (let PyTorch choose), "foreach"
+        (multi-tensor kernels) or "fused" (single fused kernel, falls back to
+        foreach for optimizers without a fused implementation).
+        """
+        impl = self.hparams.get("optimizer_impl", "default")
+        if impl == "default":
+            return {}
+        if impl == "fused":
+            if self.hparams.optimizer in self.fused_optimizers:
+                return {"fused": True}
+            warnings.warn(
+                f"No fused implementation for '{self.hparams.optimizer}', using foreach"
+            )
+            return {"foreach": True}
+        if impl == "foreach":
+            return {"foreach": True}
+        raise ValueError(f"Unsupported optimizer implementation: {impl}")
 
     def configure_optimizers(self):
         """Configure optimizers and learning rate schedulers."""
+        impl_kwargs = self._optimizer_impl_kwargs()
 
         if self.hparams.optimizer == "adam":
             optimizer = torch.optim.Adam(
                 self.parameters(),
                 lr=self.hparams.learning_rate,
                 weight_decay=self.hparams.weight_decay,
+                **impl_kwargs,
             )
         elif self.hparams.optimizer == "adamw":
             optimizer = torch.optim.AdamW(
                 self.parameters(),
                 lr=self.hparams.learning_rate,
                 weight_decay=self.hparams.weight_decay,
+                **impl_kwargs,
             )
         elif self.hparams.optimizer == "sgd":
             optimizer = torch.optim.SGD(
@@ -96,12 +231,14 @@ class Task(pl.LightningModule):
                 lr=self.hparams.learning_rate,
                 weight_decay=self.hparams.weight_decay,
                 momentum=0.9,
+                **impl_kwargs,
             )
         elif self.hparams.optimizer == "rmsprop":
             optimizer = torch.optim.RMSprop(
                 self.parameters(),
                 lr=self.hparams.learning_rate,
                 weight_decay=self.hparams.weight_decay,
+                **impl_kwargs,
             )
         else:
             raise ValueError(f"Unsupported optimizer: {self.hparams.optimizer}")
@@ -162,14 +299,19 @@ class Task(pl.LightningModule):
         y_hat = self(x)
         loss = self.loss_fn(y_hat, y)
 
-        # Update and log metrics
-        self.train_metrics(y_hat, y)
-        self.log("train_loss", loss)
-        self.log_dict(self.train_metrics)
+        # Log the running loss: cheap, averaged on device, no cross-device sync
+        self.log("train_loss", loss.detach(), on_step=True, on_epoch=True, prog_bar=True)
+
+        # Accumulate metric statistics; compute them only when scheduled
+        self.train_metrics.update(*self._metric_inputs(y_hat, y))
+        if self._should_compute_train_metrics(batch_idx):
+            self.log_dict(self.train_metrics.compute(), on_step=True, on_epoch=False)
+            if self.metrics_mode == "step":
+                self.train_metrics.reset()
 
         # Visualize training examples occasionally
         if batch_idx % 100 == 0:
-            self.visualize_batch(x, y, y_hat, "train", batch_idx)
+            self.visualize_batch(x, y, y_hat, "train", self.global_step)
 
         return loss
 
@@ -180,25 +322,85 @@ class Task(pl.LightningModule):
         y_hat = self(x)
         loss = self.loss_fn(y_hat, y)
 
-        # Update and log metrics
-        self.val_metrics(y_hat, y)
-        self.log("val_loss", loss)
-        self.log_dict(self.val_metrics)
+        # Update metrics, they are computed once at epoch end
+        self.val_metrics.update(*self._metric_inputs(y_hat, y))
+        self.log("val_loss", loss, on_step=False, on_epoch=True, sync_dist=True)
 
         # Visualize validation examples occasionally
         if batch_idx == 0:
             self.visualize_batch(x, y, y_hat, "val", self.current_epoch)
 
     def test_step(self, batch, batch_idx):
-        # Update and log metrics
+        # Update metrics, they are computed once at epoch end
         x, y = batch["image"], batch["target"]
         y_hat = self(x)
-        self.test_metrics(y_hat, y)
-        self.log_dict(self.test_metrics)
+        self.test_metrics.update(*self._metric_inputs(y_hat, y))
+
+        # Per-sample outputs, e.g. for evaluation.PredictionWriter
+        loss = self.per_sample_loss(y_hat, y)
+        self.log("test_loss", loss.mean(), on_step=False, on_epoch=True, sync_dist=True)
+        return {"prediction": y_hat.detach(), "loss": loss.detach()}
+
+    def on_fit_start(self):
+        """Start the background visualization service on the main process."""
+        max_figures = self.hparams.get("viz_max_figures_per_epoch", 8)
+        if max_figures <= 0 or not self.trainer.is_global_zero or self.visualizer is not None:
+            return
+        log_dir = None
+        if isinstance(self.logger, pl_loggers.TensorBoardLogger):
+            log_dir = self.logger.log_dir
+        self.visualizer = VisualizationService(
+            output_dir=self.hparams.get("viz_dir"),
+            log_dir=log_dir,
+            max_figures_per_epoch=max_figures,
+            max_samples=self.hparams.get("viz_max_samples", 4),
+            max_size=self.hparams.get("viz_max_size", 256),
+        )
+
+    def on_fit_end(self):
+        """Flush pending figures and stop the visualization service."""
+        if self.visualizer is not None:
+            self.visualizer.close()
+            self.visualizer = None
+
+    def on_train_epoch_start(self):
+        """Reset the per-epoch figure budget."""
+        if self.visualizer is not None:
+            self.visualizer.new_epoch()
+
+    def on_train_epoch_end(self):
+        """Compute training metrics over the epoch and reset them."""
+        if self.metrics_mode != "step":
+            self.log_dict(self.train_metrics.compute())
+        self.train_metrics.reset()
+
+    def on_validation_epoch_end(self):
+        """Compute validation metrics over the epoch and reset them."""
+        self.log_dict(self.val_metrics.compute())
+        self.val_metrics.reset()
+
+    def on_test_epoch_end(self):
+        """Compute test metrics over the epoch and reset them."""
+        self.log_dict(self.test_metrics.compute())
+        self.test_metrics.reset()
 
     def visualize_batch(self, x, y, y_hat, stage, idx):
-        # Customize this method based on your task/data
-        pass
+        """Queue a few samples for rendering in the background.
+
+        Samples are detached, downsampled and copied to CPU; rendering and
+        writing happen in a separate process. Customize the figures by passing
+        another ``render_fn`` to the VisualizationService.
+
+        Args:
+            x: Input batch
+            y: Target batch
+            y_hat: Prediction batch
+            stage: Stage name used as figure tag (train, val)
+            idx: Step or epoch the figures belong to
+        """
+        if self.visualizer is None:
+            return
+        self.visualizer.submit(x, y, y_hat, stage, idx)
 
 
 def get_task(task_type, model, **kwargs):
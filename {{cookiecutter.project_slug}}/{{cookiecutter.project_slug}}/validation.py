@@ -0,0 +1,231 @@
+"""
+Validation scheduling for large validation splits.
+
+This module provides:
+- A ValidationSchedule callback running intermediate validations on a fixed,
+  stratified subsample of the validation split and full validations only at
+  checkpoint epochs
+- A BackgroundValidator callback validating every new ``last*.ckpt`` on the
+  whole split in a separate process, concurrently with training, so full
+  metrics are also available between checkpoint epochs
+- ``validate_checkpoint`` to validate a checkpoint from its hparams sidecar
+
+Intermediate metrics are estimates from the subsample: they are logged with
+``val_full`` = 0, full validations with ``val_full`` = 1. Checkpoint epochs
+always validate on the whole split in the training loop, also with a
+BackgroundValidator, so top-k checkpoints are ranked on full validations.
+"""
+
+import glob
+import json
+import multiprocessing as mp
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import lightning.pytorch as pl
+import torch
+
+from {{cookiecutter.project_slug}}.checkpoints import load_task
+from {{cookiecutter.project_slug}}.datamodules import get_datamodule
+
+
+class ValidationSchedule(pl.Callback):
+    """Validate on the ``val_subsample`` except at checkpoint epochs.
+
+    Requires a datamodule with ``set_full_validation`` (``BaseDataModule``).
+    Validations inside an epoch (``val_check_interval``) and the sanity check
+    always use the subsample.
+    """
+
+    def __init__(self, full_every_n_epochs: int = 1):
+        """Initialize callback.
+
+        Args:
+            full_every_n_epochs: Validate on the whole split at the end of
+                every N-th epoch and of the last epoch (use the checkpoint
+                interval, so checkpoints are selected on full validations)
+        """
+        super().__init__()
+        self.full_every_n_epochs = max(1, full_every_n_epochs)
+        self._full = True
+
+    def _set_full(self, trainer, full: bool) -> None:
+        self._full = full
+        if trainer.datamodule is not None and hasattr(trainer.datamodule, "set_full_validation"):
+            trainer.datamodule.set_full_validation(full)
+
+    def on_sanity_check_start(self, trainer, pl_module):
+        self._set_full(trainer, False)
+
+    def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx):
+        """Select the split of the validation that may follow this batch."""
+        epoch = trainer.current_epoch + 1
+        last_epoch = trainer.max_epochs is not None and 0 < trainer.max_epochs <= epoch
+        checkpoint_epoch = epoch % self.full_every_n_epochs == 0 or last_epoch
+        is_last_batch = trainer.fit_loop.epoch_loop.batch_progress.is_last_batch
+        self._set_full(trainer, is_last_batch and checkpoint_epoch)
+
+    def on_validation_epoch_end(self, trainer, pl_module):
+        pl_module.log("val_full", float(self._full))
+
+    def on_fit_end(self, trainer, pl_module):
+        """Let later ``validate`` calls see the whole split."""
+        self._set_full(trainer, True)
+
+
+def validate_checkpoint(checkpoint_path: str, device: str = "cpu") -> Dict[str, float]:
+    """Validate a checkpoint on the whole validation split of its config.
+
+    The task, config and data split are rebuilt from the hparams sidecar
+    written with the checkpoint.
+
+    Args:
+        checkpoint_path: Path to the checkpoint
+        device: Device to validate on (e.g. cpu, cuda:1)
+
+    Returns:
+        Dictionary with the validation metrics, epoch and global step
+    """
+    checkpoint = torch.load(checkpoint_path, map_location="cpu", mmap=True, weights_only=True)
+    task, config = load_task(checkpoint_path, map_location=device)
+    datamodule = get_datamodule(config)
+    datamodule.setup("fit")
+
+    device = torch.device(device)
+    trainer = pl.Trainer(
+        accelerator="gpu" if device.type == "cuda" else "cpu",
+        devices=[device.index or 0] if device.type == "cuda" else 1,
+        logger=False,
+        enable_checkpointing=False,
+        enable_progress_bar=False,
+        enable_model_summary=False,
+    )
+    metrics = trainer.validate(task, dataloaders=datamodule.val_dataloader(), verbose=False)[0]
+    return {
+        "epoch": checkpoint.get("epoch"),
+        "global_step": checkpoint.get("global_step"),
+        **{name: float(value) for name, value in metrics.items()},
+    }
+
+
+def _latest_checkpoint(directory: str, pattern: str) -> Optional[Tuple[str, int, int]]:
+    """Get (path, mtime, size) of the newest checkpoint matching ``pattern`` (None if there is none)."""
+    latest = None
+    for path in glob.glob(os.path.join(directory, pattern)):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if latest is None or stat.st_mtime_ns > latest[1]:
+            latest = (path, stat.st_mtime_ns, stat.st_size)
+    return latest
+
+
+def _validation_worker(directory, pattern, output_path, log_dir, device, poll_interval, stop):
+    """Validate new checkpoints until ``stop`` is set (runs in a separate process)."""
+    writer = None
+    if log_dir is not None:
+        try:
+            from torch.utils.tensorboard import SummaryWriter
+
+            writer = SummaryWriter(log_dir=log_dir)
+        except ImportError:
+            writer = None
+
+    validated = None
+    seen = None
+    while True:
+        stopping = stop.wait(poll_interval)
+        latest = _latest_checkpoint(directory, pattern)
+        # Only read checkpoints that did not change since the previous poll
+        # (Lightning does not write them atomically), or the final one
+        if latest is not None and latest != validated and (latest == seen or stopping):
+            try:
+                metrics = validate_checkpoint(latest[0], device)
+            except Exception as e:
+                print(f"Background validation of {latest[0]} failed: {e}")
+            else:
+                record = {"time": time.time(), "checkpoint": latest[0], **metrics}
+                with open(output_path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+                if writer is not None:
+                    for name, value in metrics.items():
+                        if name not in ("epoch", "global_step"):
+                            writer.add_scalar(f"background/{name}", value, metrics["global_step"])
+                    writer.flush()
+                validated = latest
+        seen = latest
+        if stopping:
+            break
+
+    if writer is not None:
+        writer.close()
+
+
+class BackgroundValidator(pl.Callback):
+    """Validate the newest checkpoint on the whole split in a separate process.
+
+    Results are appended to ``<directory>/background_validation.jsonl`` (and
+    written to TensorBoard as ``background/*``) with the epoch and step of
+    the checkpoint. At the end of fit, the final checkpoint is validated
+    before ``fit`` returns.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        pattern: str = "last*.ckpt",
+        log_dir: Optional[str] = None,
+        device: str = "cpu",
+        poll_interval: float = 10.0,
+    ):
+        """Initialize callback.
+
+        Args:
+            directory: Checkpoint directory
+            pattern: Glob of the checkpoints to validate; the newest is used
+            log_dir: TensorBoard log directory (optional)
+            device: Device of the validation process (e.g. cpu, cuda:1)
+            poll_interval: Seconds between checks for a new checkpoint
+        """
+        super().__init__()
+        self.directory = directory
+        self.pattern = pattern
+        self.log_dir = log_dir
+        self.device = device
+        self.poll_interval = poll_interval
+        self.output_path = os.path.join(directory, "background_validation.jsonl")
+        self.process = None
+
+    def on_fit_start(self, trainer, pl_module):
+        """Start the validation process on the global rank 0."""
+        if not trainer.is_global_zero or self.process is not None:
+            return
+        ctx = mp.get_context("spawn")
+        self.stop = ctx.Event()
+        self.process = ctx.Process(
+            target=_validation_worker,
+            args=(
+                self.directory, self.pattern, self.output_path, self.log_dir,
+                self.device, self.poll_interval, self.stop,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Validate the final checkpoint and stop the validation process."""
+        if self.process is None:
+            return
+        self.stop.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
+
+    def on_fit_end(self, trainer, pl_module):
+        self.close()
+
+    def on_exception(self, trainer, pl_module, exception):
+        self.close(timeout=0)
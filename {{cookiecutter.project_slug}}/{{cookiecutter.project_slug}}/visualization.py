@@ -0,0 +1,212 @@
+"""
+Asynchronous visualization of model inputs, targets and predictions.
+
+This module provides:
+- A snapshot helper that copies a few detached, downsampled samples to CPU
+- A default matplotlib renderer for (input, target, prediction) figures
+- A VisualizationService that renders figures in a separate process and
+  writes them to disk and/or TensorBoard without blocking the caller
+
+By default figures are dropped (never waited for) when the per-epoch budget
+is spent or the render queue is full, so plotting can never stall the
+training loop.
+"""
+
+import multiprocessing as mp
+import os
+import queue
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+
+def _downsample(tensor: torch.Tensor, max_size: int, mode: str) -> torch.Tensor:
+    """Downsample a (N, C, H, W) tensor so that its longest side is at most ``max_size``."""
+    if tensor.ndim != 4 or max(tensor.shape[-2:]) <= max_size:
+        return tensor
+    scale = max_size / max(tensor.shape[-2:])
+    size = [max(1, int(s * scale)) for s in tensor.shape[-2:]]
+    if mode == "nearest":
+        return F.interpolate(tensor.float(), size=size, mode="nearest")
+    return F.interpolate(tensor.float(), size=size, mode="bilinear", antialias=True)
+
+
+def snapshot(x, y, y_hat, max_samples: int = 4, max_size: int = 256) -> Dict[str, Optional[np.ndarray]]:
+    """Copy the first few samples of a batch to CPU for plotting.
+
+    Args:
+        x: Input batch
+        y: Target batch (or None)
+        y_hat: Prediction batch (or None)
+        max_samples: Maximum number of samples to keep
+        max_size: Maximum spatial size of the kept samples
+
+    Returns:
+        Dictionary of small float32 NumPy arrays
+    """
+    snap = {}
+    for key, tensor, mode in (("image", x, "bilinear"), ("target", y, "nearest"), ("prediction", y_hat, "bilinear")):
+        if tensor is None:
+            snap[key] = None
+            continue
+        tensor = _downsample(tensor[:max_samples].detach(), max_size, mode)
+        snap[key] = tensor.float().cpu().numpy()
+    return snap
+
+
+def _to_displayable(array: np.ndarray) -> np.ndarray:
+    """Convert a single (C, H, W) or (H, W) array to something ``imshow`` can display."""
+    if array.ndim == 3:
+        if array.shape[0] >= 3:
+            array = array[:3].transpose(1, 2, 0)
+            low, high = array.min(), array.max()
+            return (array - low) / (high - low + 1e-8)
+        array = array[0] if array.shape[0] == 1 else array.argmax(axis=0)
+    return array
+
+
+def render_prediction(sample: Dict[str, Optional[np.ndarray]], title: str):
+    """Render one (input, target, prediction) figure.
+
+    Args:
+        sample: Dictionary with ``image``, ``target`` and ``prediction`` arrays
+            for a single sample (entries may be None)
+        title: Figure title
+
+    Returns:
+        Matplotlib figure
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(1, 3, figsize=(15, 5))
+    for axis, key, name in zip(ax, ("image", "target", "prediction"), ("Input", "Ground Truth", "Prediction")):
+        axis.axis("off")
+        array = sample.get(key)
+        if array is None:
+            continue
+        if array.ndim >= 2:
+            axis.imshow(_to_displayable(array), cmap=None if key == "image" else "viridis")
+            axis.set_title(name)
+        else:
+            # Scalar or vector outputs (e.g. classification) are shown as text
+            axis.set_title(f"{name}: {np.array2string(array, precision=3)}")
+    fig.suptitle(title)
+    fig.tight_layout()
+    return fig
+
+
+def _render_worker(jobs, output_dir, log_dir, render_fn):
+    """Render snapshots until a ``None`` sentinel is received (runs in a separate process)."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    writer = None
+    if log_dir is not None:
+        try:
+            from torch.utils.tensorboard import SummaryWriter
+
+            writer = SummaryWriter(log_dir=log_dir)
+        except ImportError:
+            writer = None
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        tag, step, snap = job
+        n_samples = len(snap["image"])
+        for j in range(n_samples):
+            sample = {k: (v[j] if v is not None else None) for k, v in snap.items()}
+            fig = render_fn(sample, f"{tag} step {step} sample {j}")
+            if output_dir is not None:
+                name = f"{tag.replace('/', '_')}_{step:06d}_sample{j}.png"
+                fig.savefig(os.path.join(output_dir, name))
+            if writer is not None:
+                writer.add_figure(f"{tag}/sample{j}", fig, global_step=step, close=False)
+            plt.close(fig)
+
+    if writer is not None:
+        writer.close()
+
+
+class VisualizationService:
+    """Render figures in a background process with a per-epoch budget."""
+
+    def __init__(
+        self,
+        output_dir: Optional[str] = None,
+        log_dir: Optional[str] = None,
+        max_figures_per_epoch: int = 8,
+        max_samples: int = 4,
+        max_size: int = 256,
+        queue_size: int = 8,
+        render_fn: Callable = render_prediction,
+    ):
+        """Initialize and start the render process.
+
+        Args:
+            output_dir: Directory to save PNG figures to (optional)
+            log_dir: TensorBoard log directory to write figures to (optional)
+            max_figures_per_epoch: Maximum number of figures per epoch
+            max_samples: Maximum number of samples snapshotted per call
+            max_size: Maximum spatial size of snapshotted samples
+            queue_size: Maximum number of pending snapshots
+            render_fn: Picklable function rendering one sample to a figure
+        """
+        self.max_figures_per_epoch = max_figures_per_epoch
+        self.max_samples = max_samples
+        self.max_size = max_size
+        self.figures_this_epoch = 0
+
+        ctx = mp.get_context("spawn")
+        self.jobs = ctx.Queue(maxsize=queue_size)
+        self.process = ctx.Process(
+            target=_render_worker,
+            args=(self.jobs, output_dir, log_dir, render_fn),
+            daemon=True,
+        )
+        self.process.start()
+
+    def new_epoch(self) -> None:
+        """Reset the per-epoch figure budget."""
+        self.figures_this_epoch = 0
+
+    def submit(self, x, y, y_hat, tag: str, step: int, block: bool = False) -> bool:
+        """Queue a batch for rendering.
+
+        Args:
+            x: Input batch
+            y: Target batch (or None)
+            y_hat: Prediction batch (or None)
+            tag: Figure tag (e.g. train, val)
+            step: Step or epoch the figures belong to
+            block: Wait for room in the queue instead of dropping the batch
+
+        Returns:
+            True if the snapshot was queued, False if it was dropped
+        """
+        budget = self.max_figures_per_epoch - self.figures_this_epoch
+        if budget <= 0 or not self.process.is_alive():
+            return False
+
+        snap = snapshot(x, y, y_hat, min(self.max_samples, budget), self.max_size)
+        try:
+            self.jobs.put((tag, step, snap), block=block)
+        except queue.Full:
+            return False
+        self.figures_this_epoch += len(snap["image"])
+        return True
+
+    def close(self, timeout: Optional[float] = 60) -> None:
+        """Wait for pending figures to be rendered and stop the render process."""
+        if self.process.is_alive():
+            self.jobs.put(None)
+            self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()